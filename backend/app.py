@@ -1,54 +1,400 @@
-from flask import Flask, jsonify, request
+import hashlib
+import os
+import threading
+import time
+import numpy as np
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
-from cpdb_api import request as cpdb_request
-from simulation_logic import handle_simulation
+from simulation_logic import (
+    handle_batch_simulation, handle_score, handle_simulation, handle_simulation_stream, handle_sweep, warm_up_clients
+)
+from optimizer import optimize_policies
+from policy_store import CPDB_BACKGROUND_REFRESH, FILTER_FIELDS, normalize_filter_value, policy_store
+from http_cache import (
+    COMPRESSIBLE_MIMETYPES, GZIP_MIN_SIZE, StreamCompressor, cache_headers, compress, etag_matches,
+    negotiate_encoding, request_etag, response_cache
+)
+from fast_json import FastJSONProvider, dataframe_records, dumps
+from metrics import exposition, finish_request_spans, observe_request, span, start_request_spans
+from policy_results import PRECOMPUTE_POLICIES, cacheable_result, policy_result, precomputer, row_version
 
 app = Flask(__name__)
-CORS(app)  # Enable CORS to allow requests from the React frontend
+app.json = FastJSONProvider(app)
+CORS(app, expose_headers=['X-Total-Count', 'X-Next-Cursor', 'ETag'])  # Enable CORS to allow requests from the React frontend
+
+# Page sizes for /api/policies
+DEFAULT_PAGE_SIZE = 15
+MAX_PAGE_SIZE = 1000
+
+# Rows serialized at a time when streaming policy lists
+STREAM_CHUNK_SIZE = 500
+
+# Largest number of simulations in one /simulate/batch request
+BATCH_MAX_SIZE = 500
+
+# Policy lists with more rows than this are streamed instead of being kept in the response cache
+RESPONSE_CACHE_MAX_ROWS = int(os.getenv("RESPONSE_CACHE_MAX_ROWS", 10000))
+
+# How long the simulation part of a policy's details is reused (seconds); it includes the live temperature and the AI analysis
+POLICY_DETAIL_TTL = int(os.getenv("POLICY_DETAIL_TTL", 60 * 60))
+
+# Load the CPDB snapshot during warm_up, so the first policy request does not wait for it
+CPDB_PRELOAD = os.getenv("CPDB_PRELOAD", "1") == "1"
+
+# Create the Gemini and HTTP clients during warm_up, so the first simulation does not import them
+WARM_UP_CLIENTS = os.getenv("WARM_UP_CLIENTS", "1") == "1"
+
+_warmed_up = False
+_warm_up_lock = threading.Lock()
+
+def warm_up(preload=CPDB_PRELOAD, clients=WARM_UP_CLIENTS):
+    """
+    Purpose: Gets the worker ready to serve. Nothing slow happens when the app is imported; the ASGI server calls this
+    before reporting ready, and the Flask server on its first request. Only the first call does anything.
+
+    Inputs:
+        - preload: Also load the CPDB snapshot, downloading it if there is no local copy.
+        - clients: Also create the Gemini and HTTP clients of the simulations.
+    """
+    global _warmed_up
+    with _warm_up_lock:
+        if _warmed_up:
+            return
+        _warmed_up = True
+
+        # Load the local copy of the CPDB, if one was saved by a previous run
+        policy_store.open_local()
+
+        # Simulate every policy of each new snapshot in the background, so policy details are a lookup
+        if PRECOMPUTE_POLICIES:
+            policy_store.add_listener(precomputer.schedule)
+
+        # Keep the CPDB up to date in the background instead of inside requests
+        if CPDB_BACKGROUND_REFRESH:
+            policy_store.start_refresher()
+
+    if clients:
+        warm_up_clients()
+    if preload:
+        try:
+            policy_store.snapshot()
+        except Exception as e:
+            # Policy requests load it on demand instead
+            print(f"Could not preload the CPDB: {e}")
+
+@app.before_request
+def warm_up_on_first_request():
+    """
+    Purpose: Starts the background jobs when the app is served without calling warm_up first (e.g. flask run).
+    The request loads what it needs itself, so nothing is preloaded here.
+    """
+    if not _warmed_up:
+        warm_up(preload=False, clients=False)
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.request_spans = start_request_spans()
+
+@app.after_request
+def record_request_metrics(response):
+    """
+    Purpose: Records the latency and status of every request (see metrics.py) and, if SERVER_TIMING is on,
+    sends the timings of its stages in a Server-Timing header.
+    """
+    if 'request_started' not in g:
+        return response
+    seconds = time.perf_counter() - g.request_started
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    observe_request(route, request.method, response.status_code, seconds)
+    server_timing = finish_request_spans(g.request_spans, seconds)
+    if server_timing:
+        response.headers['Server-Timing'] = server_timing
+    return response
+
+@app.after_request
+def compress_response(response):
+    """
+    Purpose: Compresses JSON and NDJSON responses with the best content coding the client accepts (Brotli or gzip).
+    Streamed responses are compressed chunk by chunk, so their first rows still arrive before the rest are ready.
+    """
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES or response.status_code == 304:
+        return response
+    response.vary.add('Accept-Encoding')
+    if 'Content-Encoding' in response.headers or response.direct_passthrough:
+        return response
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = StreamCompressor(encoding).stream(response.response)
+    else:
+        body = response.get_data()
+        if len(body) < GZIP_MIN_SIZE:
+            return response
+        response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def parse_policy_filters(args):
+    """
+    Purpose: Reads the CPDB filters from the query string.
+    Multiple values can be given comma-separated, e.g. sector=Buildings,Transport
+
+    Input:
+        - args: The request query parameters.
+
+    Output: A dictionary mapping each filter that was given to its list of values.
+    """
+    filters = {}
+    for field in FILTER_FIELDS:
+        value = args.get(field)
+        if value:
+            filters[field] = [v.strip() for v in value.split(',') if v.strip()]
+
+    if 'decision_date' in filters:
+        try:
+            filters['decision_date'] = [int(d) for d in filters['decision_date']]
+        except ValueError:
+            raise ValueError('decision_date must be a year')
+    return filters
+
+def parse_page_params(args, columns):
+    """
+    Purpose: Reads the pagination and projection parameters from the query string.
+
+    Inputs:
+        - args: The request query parameters.
+        - columns: The columns available in the CPDB snapshot.
+
+    Output: A tuple (page, limit, cursor, fields). limit is None when every row is requested,
+            cursor is the (snapshot fingerprint, policy_id) to resume after (or None), and fields is None for all columns.
+    """
+    try:
+        page = int(args.get('page', 1))
+        limit = int(args['limit']) if 'limit' in args else None
+    except ValueError:
+        raise ValueError('page and limit must be integers')
+
+    cursor = None
+    if args.get('cursor'):
+        fingerprint, _, policy_id = args['cursor'].partition('.')
+        if not fingerprint or not policy_id:
+            raise ValueError('Invalid cursor')
+        cursor = (fingerprint, policy_id)
+
+    if page < 1:
+        raise ValueError('page must be at least 1')
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    if 'page' in args and limit is None:
+        limit = DEFAULT_PAGE_SIZE
+
+    fields = None
+    if args.get('fields'):
+        fields = [f.strip() for f in args['fields'].split(',') if f.strip()]
+        unknown = [f for f in fields if f not in columns]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return page, limit, cursor, fields
+
+def stream_records(df, positions, fields, ndjson):
+    """
+    Purpose: Serializes the selected rows chunk by chunk, so the first rows are sent before the
+    rest are converted and memory use does not grow with the size of the result.
+
+    Inputs:
+        - df: The CPDB snapshot DataFrame.
+        - positions: The row positions to send, in order.
+        - fields: The columns to include, or None for all of them.
+        - ndjson: Emit one JSON object per line instead of a JSON array.
+
+    Output: A generator of response body chunks (bytes).
+    """
+    if not ndjson:
+        yield b'['
+    first = True
+    for start in range(0, len(positions), STREAM_CHUNK_SIZE):
+        chunk = df.iloc[positions[start:start + STREAM_CHUNK_SIZE]]
+        if fields is not None:
+            chunk = chunk[fields]
+        records = dataframe_records(chunk)
+        if ndjson:
+            yield b''.join(dumps(record) + b'\n' for record in records)
+        elif records:
+            # The chunk is encoded as one array, whose brackets are dropped to splice it into the response
+            yield (b'' if first else b',') + dumps(records)[1:-1]
+            first = False
+    if not ndjson:
+        yield b']'
+
+def filters_key(filters):
+    """
+    Purpose: Normalizes a set of filters for use in cache keys, so that requests that select the same policies
+    (e.g. sector=transport,Buildings and sector=Buildings,Transport) share their cached response.
+
+    Output: A tuple of (field, values) pairs, sorted.
+    """
+    return tuple(sorted(
+        (field, tuple(sorted({normalize_filter_value(field, v) for v in values})))
+        for field, values in filters.items() if values
+    ))
+
+def set_cache_headers(response, etag):
+    """
+    Purpose: Adds the ETag and Cache-Control headers, keeping the Vary values other parts of the app add (e.g. Flask-CORS).
+    """
+    for name, value in cache_headers(etag).items():
+        if name == 'Vary':
+            response.vary.add(value)
+        else:
+            response.headers[name] = value
+
+def not_modified(etag):
+    """
+    Purpose: Answers a request whose If-None-Match matched the current entity tag.
+    """
+    response = Response(status=304)
+    set_cache_headers(response, etag)
+    return response
+
+def cached_response(entry):
+    """
+    Purpose: Builds the response of a cached body, compressed if the client accepts gzip.
+    """
+    body, encoding = entry.select(request.headers.get('Accept-Encoding'))
+    response = Response(body, mimetype=entry.mimetype)
+    response.headers.update(entry.headers)
+    set_cache_headers(response, entry.etag)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+def policy_detail_key(snapshot, policy_id):
+    """
+    Purpose: The response cache key of the details of a policy in a snapshot. It only depends on the policy's own
+    CPDB row, so cached details are kept across refreshes that do not change the policy.
+    """
+    return (row_version(snapshot, policy_id), 'policy', str(policy_id))
+
+def store_policy_detail(cache_key, policy_data):
+    """
+    Purpose: Serializes the details of a policy, merged with its simulation results, into the response cache.
+    Results that fell back because an upstream API was too slow are not worth keeping and are not stored.
+    The entity tag is a digest of the body: the stored results of a policy expire (POLICY_RESULT_TTL) and are
+    simulated again with new weather and Gemini text, which must not be answered with 304 for the old tag.
+
+    Output: The CachedBody, or None if the results were not stored.
+    """
+    if not cacheable_result(policy_data):
+        return None
+    with span('serialization'):
+        body = (app.json.dumps(policy_data) + '\n').encode('utf-8')
+    etag = request_etag(cache_key[0], hashlib.sha1(body).hexdigest())
+    return response_cache.put(cache_key, etag, body, 'application/json', ttl=POLICY_DETAIL_TTL)
 
 @app.route('/api/policies', methods=['GET'])
 def get_policies():
     """
     Returns a list of all climate policies, with optional filtering.
+
+    Query parameters (besides the filters):
+        - page, limit: 1-based page number and page size. Without them every matching policy is returned.
+        - cursor: Resume after the last policy of the previous page, as given by its X-Next-Cursor header.
+          A cursor from an older CPDB snapshot gets a 409, and the list has to be loaded again from the start.
+        - fields: Comma-separated list of columns to include, e.g. fields=policy_id,policy_name
+        - format: "ndjson" for newline-delimited JSON, otherwise a JSON array.
+
+    Responses carry an ETag derived from the CPDB snapshot, and a request with a matching If-None-Match gets a 304.
     """
     try:
-        req = cpdb_request.Request()
-
-        # Get query parameters from the request
-        decision_date = request.args.get('decision_date')
-        policy_status = request.args.get('policy_status')
-        sector = request.args.get('sector')
-        country_iso = request.args.get('country_iso')
-        policy_instrument = request.args.get('policy_instrument')
-        mitigation_area = request.args.get('mitigation_area')
-
-        # Apply filters if 
-        if country_iso:
-            # Case-insensitive filter
-            req.set_country(country_iso)
-        if decision_date:
-            req.set_decision_date(int(decision_date))
-        if policy_status:
-            req.set_policy_status(policy_status)
-        if sector:
-            # Handle multiple sectors if comma-separated
-            for s in sector.split(','):
-                req.add_sector(s.strip())
-        if policy_instrument:
-            # Handle multiple instruments if comma-separated
-            for pi in policy_instrument.split(','):
-                req.add_policy_instrument(pi.strip())
-        if mitigation_area:
-            # Handle multiple mitigation areas if comma-separated
-            for ma in mitigation_area.split(','):
-                req.add_mitigation_area(ma.strip())
-        
-        # Issue the request to get dataframe
-        policies_df = req.issue()
-        
-        # Convert the DataFrame to a list of dictionaries
-        policies_data = policies_df.to_dict(orient='records')
-        return jsonify(policies_data)
+        filters = parse_policy_filters(request.args)
+        snapshot = policy_store.snapshot()
+        page, limit, cursor, fields = parse_page_params(request.args, snapshot.df.columns)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Row positions are only meaningful within one snapshot; after a refresh rows may have moved
+    if cursor is not None:
+        if cursor[0] != snapshot.fingerprint:
+            return jsonify({'error': 'The policy list changed since this cursor was issued, load it again from the start'}), 409
+        if cursor[1] not in snapshot.id_index:
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+    try:
+        ndjson = request.args.get('format') == 'ndjson'
+        key = (
+            'policies', filters_key(filters), page if limit is not None and cursor is None else 1, limit, cursor,
+            tuple(fields) if fields is not None else None, ndjson
+        )
+        etag = request_etag(snapshot.fingerprint, key)
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return not_modified(etag)
+        entry = response_cache.get((snapshot.fingerprint,) + key)
+        if entry is not None:
+            return cached_response(entry)
+
+        # Resolve the filters against the local CPDB snapshot
+        with span('policy_filter'):
+            positions = snapshot.positions(filters)
+        total = len(positions)
+
+        # Select the requested page
+        if cursor is not None:
+            start = int(np.searchsorted(positions, snapshot.id_index[cursor[1]], side='right'))
+        elif limit is not None:
+            start = (page - 1) * limit
+        else:
+            start = 0
+        stop = total if limit is None else min(total, start + limit)
+        page_positions = positions[start:stop]
+
+        mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+        headers = {'X-Total-Count': str(total)}
+        if stop < total and len(page_positions):
+            last_id = snapshot.df['policy_id'].iat[int(page_positions[-1])]
+            headers['X-Next-Cursor'] = f"{snapshot.fingerprint}.{last_id}"
+
+        # Pages are serialized once per snapshot and kept, compressed, for the next request
+        if len(page_positions) <= RESPONSE_CACHE_MAX_ROWS:
+            with span('serialization'):
+                body = b''.join(stream_records(snapshot.df, page_positions, fields, ndjson))
+            return cached_response(response_cache.put((snapshot.fingerprint,) + key, etag, body, mimetype, headers))
+
+        response = Response(stream_records(snapshot.df, page_positions, fields, ndjson), mimetype=mimetype)
+        response.headers.update(headers)
+        set_cache_headers(response, etag)
+        return response
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/policies/facets', methods=['GET'])
+def get_policy_facets():
+    """
+    Returns the distinct values and policy counts of every filterable field, for building filter controls.
+    Accepts the same filters as /api/policies; the counts of each field then reflect the other filters.
+    """
+    try:
+        filters = parse_policy_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        snapshot = policy_store.snapshot()
+        key = ('facets', filters_key(filters))
+        etag = request_etag(snapshot.fingerprint, key)
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return not_modified(etag)
+        entry = response_cache.get((snapshot.fingerprint,) + key)
+        if entry is None:
+            with span('policy_filter'):
+                facets = {'total': len(snapshot.positions(filters)), 'facets': snapshot.facet_counts(filters)}
+            with span('serialization'):
+                body = app.json.dumps(facets) + '\n'
+            entry = response_cache.put((snapshot.fingerprint,) + key, etag, body.encode('utf-8'), 'application/json')
+        return cached_response(entry)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -56,104 +402,219 @@ def get_policies():
 @app.route('/api/policy/<string:policy_id>', methods=['GET'])
 def get_policy(policy_id):
     """
-    Returns the details of a specific climate policy.
+    Returns the details of a specific climate policy, with its simulation results.
+    Responses are cached for POLICY_DETAIL_TTL and carry an ETag derived from their body.
     
     Args:
         policy_id: The ID of the policy to retrieve.
     """
     try:
-        # First get the policy from CPDB
-        req = cpdb_request.Request()
-        policies_df = req.issue()
-        
-        # Find the specific policy in the dataframe
-        policy = policies_df[policies_df['policy_id'] == policy_id]
-        
-        # if policy.empty:
-        #     return jsonify({'error': 'Policy not found'}), 404
-        
-        # Extract basic policy details from CPDB
-        policy_data = policy.iloc[0].to_dict()
+        # Look the policy up in the in-memory CPDB snapshot
+        snapshot = policy_store.snapshot()
+        policy_data = snapshot.get_policy(policy_id)
         
-        # Now use the simulation logic to generate additional climate impact details
-        # Create input data structure for handle_simulation
-        # Dynamically set policy simulation parameters based on policy data
-        description = str(policy_data.get("description", "")).lower()
-        sector = str(policy_data.get("sector", "")).lower()
-        policy_instrument = str(policy_data.get("policy_instrument", "")).lower()
-
-        # Example of more dynamic/conditional logic for simulation parameters
-        carbon_tax_rate = 50 if "carbon tax" in description else 20
-        renewable_subsidy = 70 if "renewable" in sector else 30
-        fossil_fuel_phaseout = "fast" if "phase out" in description else "medium"
-        deforestation_ban = True
-        education_campaigns = 80 if "education" in policy_instrument or "education" in description else 50
-        green_jobs_initiative = 10 if "jobs" in description or "employment" in description else 5
-        industry_regulations = "high" if "regulation" in policy_instrument else "medium"
-        justice_lens_strength = 80 if "justice" in description else 60
-        adaptation_investment = 10 if ("adaptation" in sector or "adaptation" in description) else 5
-        carbon_capture_randd = 8 if "carbon capture" in description else 3
-
-        sy = 0
-        if policy_data.get("start_date"):
-            sy = int(policy_data["start_date"]) 
-        elif policy_data.get("decision_date"):
-            sy = int(policy_data["decision_date"])
-        else:
-            sy = 2000
-
-
-        input_data = {
-            "policyName": policy_data.get("policy_name", ""),
-            "description": policy_data.get("policy_description", ""),
-            # "policy_status": policy_data.get("policy_status", "None"),
-            # "policy_type": policy_data.get("policy_type", "None"),
-            # "policy_instrument": policy_data.get("policy_instrument", "None"),
-            # "sector": policy_data.get("sector", "None"),
-            "location": policy_data.get("country", "Global"),
-            "startYear":sy,
-            "endYear": int(policy_data.get("end_date", 2100)) if policy_data.get("end_date") else 2100,
-            "policies": {
-            "carbonTaxRate": carbon_tax_rate,
-            "renewableSubsidy": renewable_subsidy,
-            "fossilFuelPhaseout": fossil_fuel_phaseout,
-            "deforestationBan": deforestation_ban,
-            "educationCampaigns": education_campaigns,
-            "greenJobsInitiative": green_jobs_initiative,
-            "industryRegulations": industry_regulations,
-            "justiceLensStrength": justice_lens_strength,
-            "adaptationInvestment": adaptation_investment,
-            "carbonCaptureRAndD": carbon_capture_randd
-            }
-        }
-        
-        # Get simulation results
-        simulation_results = handle_simulation(input_data)
-        
-        # Merge CPDB data with simulation results
-        policy_data.update(simulation_results)
-        return jsonify(policy_data)
+        if policy_data is None:
+            return jsonify({'error': 'Policy not found'}), 404
+
+        cache_key = policy_detail_key(snapshot, policy_id)
+        entry = response_cache.get(cache_key)
+        if entry is None:
+            # Get the simulation results, normally precomputed when the snapshot was loaded
+            simulation_results = policy_result(snapshot, policy_id, policy_data)
+
+            # Merge CPDB data with simulation results
+            policy_data.update(simulation_results)
+            entry = store_policy_detail(cache_key, policy_data)
+            if entry is None:
+                response = jsonify(policy_data)
+                response.headers['Cache-Control'] = 'no-store'
+                return response
+
+        if etag_matches(request.headers.get('If-None-Match'), entry.etag):
+            return not_modified(entry.etag)
+        return cached_response(entry)
         
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def simulation_input(input_data):
+    """
+    Purpose: Fills in the optional fields of a simulation request.
+    """
+    if 'policyName' not in input_data:
+        input_data['policyName'] = ''
+    if 'description' not in input_data:
+        input_data['description'] = ''
+    return input_data
+
+def stream_event(event, data, ndjson=False):
+    """
+    Purpose: Serializes one event of a streamed simulation, as a Server-Sent Event
+    ("event: <name>\ndata: <json>\n\n") or as a line of NDJSON ({"event": <name>, ...}).
+    """
+    if ndjson:
+        return dumps({'event': event, **data}) + b'\n'
+    return b'event: ' + event.encode('utf-8') + b'\ndata: ' + dumps(data) + b'\n\n'
+
+# Response headers of streamed simulations. Proxies such as nginx must not buffer them, or nothing arrives early.
+STREAM_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
 @app.route('/simulate', methods=['POST'])
 def simulate():
     """
-    Handles policy simulation requests.
-    This endpoint remains unchanged as requested.
+    Handles policy simulation requests: the scores, badge and suggestions, the temperature trajectory, the AI
+    analysis and the timings of each stage.
+    The body holds startYear, endYear, location and policies, and optionally:
+        - policyName, description: Used by the AI analysis (empty if missing).
+        - seed: Seed of the climate variability, for a reproducible trajectory.
+        - ensemble, ensembleStep: Size of a Monte Carlo ensemble, whose uncertainty bands are added to the result.
+        - format: "compact" to get startYear and the trajectory as a base64 float32 array instead of years and
+          temperatureTrajectory.
+    Geocoding, weather and Gemini answers are reused from their caches; an upstream that fails, is too slow or has
+    an open circuit breaker is replaced by its fallback value, marked in the timings. Invalid input gives {"error": ...}.
     """
     try:
-        input_data = request.get_json()  # Gets the JSON data
-        if 'policyName' not in input_data:
-            input_data['policyName'] = ''
-        if 'description' not in input_data:
-            input_data['description'] = ''
+        input_data = simulation_input(request.get_json())  # Gets the JSON data
         results = handle_simulation(input_data)
         return jsonify(results)  # Convert the results to JSON
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/simulate/stream', methods=['POST'])
+def simulate_stream():
+    """
+    Handles policy simulation requests like /simulate, but sends the results in parts as soon as they are ready:
+        - scores: policyName, the scores, badge and suggestions (right away).
+        - trajectory: the temperature trajectory, once the weather is known.
+        - analysis: AI fields (description, aiComment, strength, weakness), as each Gemini call finishes.
+        - done: the timings.
+        - error: {"error": ...}, if the simulation failed.
+    Events are sent as Server-Sent Events, or as NDJSON lines with ?format=ndjson.
+    """
+    ndjson = request.args.get('format') == 'ndjson'
+    try:
+        input_data = simulation_input(request.get_json())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        try:
+            for event, data in handle_simulation_stream(input_data):
+                yield stream_event(event, data, ndjson)
+        except Exception as e:
+            yield stream_event('error', {'error': str(e)}, ndjson)
+
+    mimetype = 'application/x-ndjson' if ndjson else 'text/event-stream'
+    return Response(generate(), mimetype=mimetype, headers=STREAM_HEADERS)
+
+@app.route('/score', methods=['POST'])
+def score():
+    """
+    Returns only the scores, badge, name and suggestions of a set of policy settings.
+    Takes the same body as /simulate but makes no network calls, so it is fast enough to follow the sliders live.
+    """
+    try:
+        return jsonify(handle_score(request.get_json(silent=True)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/simulate/batch', methods=['POST'])
+def simulate_batch():
+    """
+    Handles many policy simulations in one request.
+
+    The body is either a list of simulation inputs (as for /simulate) or an object with:
+        - simulations: The list of simulation inputs.
+        - includeAnalysis: Also run the Gemini analysis of every simulation (default false).
+        - seed: Seed for the climate variability of simulations without their own seed.
+        - stream: Send each result as a line of NDJSON ({"index": ..., ...}) as soon as it is ready.
+    Without streaming, the results are returned as a list in the order of the inputs.
+    """
+    body = request.get_json(silent=True)
+    options = body if isinstance(body, dict) else {}
+    simulations = body if isinstance(body, list) else options.get('simulations')
+
+    if not isinstance(simulations, list):
+        return jsonify({'error': 'Expected a list of simulations'}), 400
+    if len(simulations) > BATCH_MAX_SIZE:
+        return jsonify({'error': f'At most {BATCH_MAX_SIZE} simulations per batch'}), 400
+    seed = options.get('seed')
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool) or seed < 0):
+        return jsonify({'error': 'seed must be an integer at least 0'}), 400
+
+    try:
+        results = handle_batch_simulation(simulations, bool(options.get('includeAnalysis')), seed)
+
+        if options.get('stream') or request.args.get('format') == 'ndjson':
+            def generate():
+                for index, result in results:
+                    yield app.json.dumps({'index': index, **result}, separators=(',', ':')) + '\n'
+            return Response(generate(), mimetype='application/x-ndjson')
+
+        ordered = [None] * len(simulations)
+        for index, result in results:
+            ordered[index] = result
+        return jsonify(ordered)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/sweep', methods=['POST'])
+def sweep():
+    """
+    Handles parameter sweeps over the policy levers.
+    Evaluates the scores and mean temperature trajectory over the Cartesian product of the given lever values,
+    e.g. {"location": "Kenya", "sweep": {"carbonTaxRate": {"min": 0, "max": 200, "steps": 41}, "fossilFuelPhaseout": null}},
+    and returns the grid together with one-at-a-time and Sobol-style sensitivity indices.
+    """
+    try:
+        return jsonify(handle_sweep(request.get_json(silent=True)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/optimize', methods=['POST'])
+def optimize():
+    """
+    Searches for the policy settings that meet score targets with the lowest economic pressure.
+
+    The body is an object with:
+        - targets: e.g. {"carbonScore": {"min": 85}, "justiceScore": {"min": 85}, "economicPressure": {"max": 50}}
+        - fixed: Levers to keep at a given setting (optional).
+        - startYear, endYear: The simulated period, for temperatureIncrease targets (default 2020 - 2100).
+        - maxResults: The number of configurations returned (default 20).
+        - seed: Seed for the random search (optional).
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    start_year = body.get('startYear', 2020)
+    end_year = body.get('endYear', 2100)
+    seed = body.get('seed')
+    if not all(isinstance(y, int) and not isinstance(y, bool) for y in (start_year, end_year)):
+        return jsonify({'error': 'startYear and endYear must be integers'}), 400
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool) or seed < 0):
+        return jsonify({'error': 'seed must be an integer at least 0'}), 400
+
+    try:
+        return jsonify(optimize_policies(
+            body.get('targets'), body.get('fixed'), start_year, end_year, body.get('maxResults', 20), seed
+        ))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Returns the latency histograms and the request, error and fallback counters of this worker process
+    in the Prometheus text format.
+    """
+    return Response(exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
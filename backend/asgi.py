@@ -0,0 +1,415 @@
+import asyncio
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from app import (
+    STREAM_HEADERS, app as flask_app, policy_detail_key, simulation_input, store_policy_detail, stream_event, warm_up
+)
+from async_simulation import aclose_clients, handle_simulation_async, handle_simulation_stream_async
+from http_cache import (
+    COMPRESSIBLE_MIMETYPES, GZIP_MIN_SIZE, cache_headers, compress, etag_matches, negotiate_encoding, response_cache
+)
+from metrics import finish_request_spans, observe_request, span, start_request_spans
+from policy_results import policy_simulation_input, store_result, stored_result
+from policy_store import policy_store
+
+# ASGI entry point for production:
+#
+#     cd backend
+#     uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+#
+# The routes that wait on upstream APIs (POST /simulate, POST /simulate/stream and GET /api/policy/<id>) are handled natively with async
+# HTTP clients, so a slow Google, Open-Meteo or Gemini request does not hold a thread. Every other route only uses
+# local data (the CPDB snapshot, the scoring kernel) and is served by the Flask app on a bounded thread pool, so
+# both serving modes share the same routes and behaviour.
+
+# Threads serving the Flask routes
+WSGI_WORKERS = int(os.getenv("WSGI_WORKERS", 16))
+wsgi_executor = ThreadPoolExecutor(max_workers=WSGI_WORKERS)
+
+# Simulations handled at the same time by one worker; beyond this, requests are turned away with a 503
+MAX_CONCURRENT_SIMULATIONS = int(os.getenv("MAX_CONCURRENT_SIMULATIONS", 256))
+_active_simulations = 0
+
+# Response headers exposed to the frontend, as configured for Flask-CORS in app.py
+CORS_EXPOSE_HEADERS = b"X-Next-Cursor, X-Total-Count, ETag"
+
+POLICY_ROUTE = re.compile(r"^/api/policy/([^/]+)$")
+
+
+async def app(scope, receive, send):
+    """
+    Purpose: The ASGI application.
+    """
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    path, method = scope["path"], scope["method"]
+    policy_match = POLICY_ROUTE.match(path)
+    if method == "POST" and path == "/simulate":
+        send = metrics_send(scope, "/simulate", send)
+        await simulate(receive, cors_send(scope, compress_send(scope, send)))
+    elif method == "POST" and path == "/simulate/stream":
+        send = metrics_send(scope, "/simulate/stream", send)
+        await simulate_stream(scope, receive, cors_send(scope, send))
+    elif method == "GET" and policy_match:
+        send = metrics_send(scope, "/api/policy/<string:policy_id>", send)
+        await get_policy(policy_match.group(1), scope, cors_send(scope, compress_send(scope, send)))
+    else:
+        await call_flask(scope, receive, send)
+
+
+async def lifespan(receive, send):
+    """
+    Purpose: Handles server startup and shutdown.
+    """
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Start the background jobs, load the CPDB and create the upstream clients before taking requests
+            await asyncio.to_thread(warm_up)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await aclose_clients()
+            wsgi_executor.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+def metrics_send(scope, route, send):
+    """
+    Purpose: Wraps send so that the native routes record their latency and status, and send a Server-Timing header
+    if SERVER_TIMING is on, like record_request_metrics in app.py. Must be called in the task serving the request.
+    """
+    started = time.perf_counter()
+    token = start_request_spans()
+
+    async def send_with_metrics(message):
+        if message["type"] == "http.response.start":
+            seconds = time.perf_counter() - started
+            observe_request(route, scope["method"], message["status"], seconds)
+            server_timing = finish_request_spans(token, seconds)
+            if server_timing:
+                message = {**message, "headers": [*message["headers"], (b"server-timing", server_timing.encode("latin-1"))]}
+        await send(message)
+    return send_with_metrics
+
+
+def cors_send(scope, send):
+    """
+    Purpose: Wraps send so that responses carry the same CORS headers Flask-CORS adds to the Flask routes:
+    any origin is allowed and echoed back.
+    """
+    origin = request_header(scope, b"origin")
+    if origin is None:
+        return send
+
+    async def send_with_cors(message):
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": [
+                *message["headers"],
+                (b"access-control-allow-origin", origin),
+                (b"access-control-expose-headers", CORS_EXPOSE_HEADERS),
+                (b"vary", b"Origin"),
+            ]}
+        await send(message)
+    return send_with_cors
+
+
+def compress_send(scope, send):
+    """
+    Purpose: Wraps send so that the JSON responses of the native routes are compressed like those of the Flask
+    routes (see compress_response in app.py). Bodies that are already encoded, such as cached ones, are left alone.
+    """
+    accept_encoding = request_header(scope, b"accept-encoding")
+    encoding = negotiate_encoding(accept_encoding.decode("latin-1") if accept_encoding else None)
+    response_start = None
+
+    async def send_compressed(message):
+        nonlocal response_start
+        if message["type"] == "http.response.start":
+            # Held back until the body is known
+            response_start = message
+            return
+        if message["type"] == "http.response.body" and response_start is not None:
+            headers = list(response_start["headers"])
+            content_type = next((value for name, value in headers if name == b"content-type"), b"")
+            if content_type.split(b";")[0].decode("latin-1") in COMPRESSIBLE_MIMETYPES and response_start["status"] != 304:
+                if not any(name == b"vary" and b"accept-encoding" in value.lower() for name, value in headers):
+                    headers.append((b"vary", b"Accept-Encoding"))
+                body = message.get("body", b"")
+                already_encoded = any(name == b"content-encoding" for name, _ in headers)
+                if encoding and not already_encoded and not message.get("more_body") and len(body) >= GZIP_MIN_SIZE:
+                    body = compress(body, encoding)
+                    headers = [(name, value) for name, value in headers if name != b"content-length"]
+                    headers += [(b"content-length", str(len(body)).encode("latin-1")), (b"content-encoding", encoding.encode("latin-1"))]
+                    message = {**message, "body": body}
+            await send({**response_start, "headers": headers})
+            response_start = None
+        await send(message)
+    return send_compressed
+
+
+def request_header(scope, name):
+    """
+    Purpose: Returns the first value of a request header (name in lower case), or None.
+    """
+    return next((value for header, value in scope.get("headers", []) if header == name), None)
+
+
+def encoded_headers(headers):
+    return [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()]
+
+
+async def read_body(receive):
+    """
+    Purpose: Reads the whole request body.
+    """
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+async def send_json(send, data, status=200, headers=()):
+    """
+    Purpose: Sends a JSON response, serialized like Flask's jsonify.
+    """
+    with span("serialization"):
+        body = (flask_app.json.dumps(data) + "\n").encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_cached(send, entry, accept_encoding):
+    """
+    Purpose: Sends a cached body, compressed if the client accepts gzip, like cached_response in app.py.
+    """
+    body, encoding = entry.select(accept_encoding.decode("latin-1") if accept_encoding else None)
+    headers = {"Content-Type": entry.mimetype, "Content-Length": str(len(body)), **entry.headers, **cache_headers(entry.etag)}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    await send({"type": "http.response.start", "status": 200, "headers": encoded_headers(headers)})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_not_modified(send, etag):
+    await send({"type": "http.response.start", "status": 304, "headers": encoded_headers(cache_headers(etag))})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def run_simulation(send, input_data, respond=None):
+    """
+    Purpose: Runs a simulation under the concurrency limit and sends its result.
+
+    Inputs:
+        - send: The ASGI send function.
+        - input_data: The simulation input.
+        - respond: An async function called with the results to send them instead of send_json
+                   (e.g. merged with the CPDB fields).
+    """
+    global _active_simulations
+    if _active_simulations >= MAX_CONCURRENT_SIMULATIONS:
+        await send_json(send, {"error": "Too many simulations in progress, try again shortly"}, 503, [(b"retry-after", b"1")])
+        return
+
+    _active_simulations += 1
+    try:
+        results = await handle_simulation_async(input_data)
+    except Exception as e:
+        await send_json(send, {"error": str(e)}, 500)
+        return
+    finally:
+        _active_simulations -= 1
+
+    if respond is not None:
+        await respond(results)
+        return
+    await send_json(send, results)
+
+
+async def send_policy_detail(send, policy_data, results, cache_key, if_none_match, accept_encoding):
+    """
+    Purpose: Sends the details of a policy merged with its simulation results, through the response cache.
+    """
+    policy_data.update(results)
+    entry = store_policy_detail(cache_key, policy_data)
+    if entry is not None:
+        await send_policy_entry(send, entry, if_none_match, accept_encoding)
+        return
+    await send_json(send, policy_data, headers=[(b"cache-control", b"no-store")])
+
+
+async def send_policy_entry(send, entry, if_none_match, accept_encoding):
+    """
+    Purpose: Sends the cached details of a policy, or 304 Not Modified if the client has the same body.
+    """
+    if etag_matches(if_none_match.decode("latin-1") if if_none_match else None, entry.etag):
+        await send_not_modified(send, entry.etag)
+        return
+    await send_cached(send, entry, accept_encoding)
+
+
+async def simulate(receive, send):
+    """
+    Handles policy simulation requests, like the /simulate route of app.py.
+    """
+    try:
+        input_data = simulation_input(flask_app.json.loads(await read_body(receive)))
+    except Exception as e:
+        await send_json(send, {'error': str(e)}, 500)
+        return
+    await run_simulation(send, input_data)
+
+
+async def simulate_stream(scope, receive, send):
+    """
+    Handles streamed policy simulation requests, like the /simulate/stream route of app.py.
+    Streams are sent uncompressed, so every event reaches the client as soon as it is sent.
+    """
+    global _active_simulations
+    query = scope.get("query_string", b"").decode("latin-1")
+    ndjson = "format=ndjson" in query.split("&")
+    try:
+        input_data = simulation_input(flask_app.json.loads(await read_body(receive)))
+    except Exception as e:
+        await send_json(send, {'error': str(e)}, 400)
+        return
+    if _active_simulations >= MAX_CONCURRENT_SIMULATIONS:
+        await send_json(send, {"error": "Too many simulations in progress, try again shortly"}, 503, [(b"retry-after", b"1")])
+        return
+
+    mimetype = "application/x-ndjson" if ndjson else "text/event-stream"
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": encoded_headers({"Content-Type": f"{mimetype}; charset=utf-8", **STREAM_HEADERS}),
+    })
+    _active_simulations += 1
+    try:
+        async for event, data in handle_simulation_stream_async(input_data):
+            await send({"type": "http.response.body", "body": stream_event(event, data, ndjson), "more_body": True})
+    except Exception as e:
+        await send({"type": "http.response.body", "body": stream_event("error", {"error": str(e)}, ndjson), "more_body": True})
+    finally:
+        _active_simulations -= 1
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def get_policy(policy_id, scope, send):
+    """
+    Returns the details of a specific climate policy, like the /api/policy/<id> route of app.py,
+    including its stored results, response cache and ETag handling.
+    """
+    accept_encoding = request_header(scope, b"accept-encoding")
+    try:
+        # Looking the policy up may refresh the CPDB snapshot, which is a blocking download
+        snapshot = await asyncio.to_thread(policy_store.snapshot)
+        policy_data = snapshot.get_policy(policy_id)
+        if policy_data is None:
+            await send_json(send, {'error': 'Policy not found'}, 404)
+            return
+
+        cache_key = policy_detail_key(snapshot, policy_id)
+        if_none_match = request_header(scope, b"if-none-match")
+        entry = response_cache.get(cache_key)
+        if entry is not None:
+            await send_policy_entry(send, entry, if_none_match, accept_encoding)
+            return
+
+        # Results are normally precomputed (see policy_results.py); only a policy without them is simulated here.
+        # The result store is SQLite, so it is read and written off the event loop.
+        results = await asyncio.to_thread(stored_result, snapshot, policy_id)
+        if results is not None:
+            await send_policy_detail(send, policy_data, results, cache_key, if_none_match, accept_encoding)
+            return
+        input_data = policy_simulation_input(policy_data)
+    except Exception as e:
+        await send_json(send, {'error': str(e)}, 500)
+        return
+
+    async def respond(results):
+        await asyncio.to_thread(store_result, snapshot, policy_id, results)
+        await send_policy_detail(send, policy_data, results, cache_key, if_none_match, accept_encoding)
+    await run_simulation(send, input_data, respond)
+
+
+def wsgi_environ(scope, body):
+    """
+    Purpose: Builds the WSGI environ of an ASGI HTTP request.
+    """
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_LENGTH":
+            continue
+        key = name if name == "CONTENT_TYPE" else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def call_flask(scope, receive, send):
+    """
+    Purpose: Serves a request with the Flask app on the thread pool. Streamed responses are forwarded chunk by chunk.
+    """
+    loop = asyncio.get_running_loop()
+    environ = wsgi_environ(scope, await read_body(receive))
+    response_start = {}
+
+    def start_response(status, headers, exc_info=None):
+        response_start["status"] = int(status.split(" ", 1)[0])
+        response_start["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+        return lambda data: None
+
+    result = await loop.run_in_executor(wsgi_executor, flask_app, environ, start_response)
+    chunks = iter(result)
+    try:
+        chunk = await loop.run_in_executor(wsgi_executor, next, chunks, None)
+        await send({"type": "http.response.start", "status": response_start["status"], "headers": response_start["headers"]})
+        while chunk is not None:
+            if chunk:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            chunk = await loop.run_in_executor(wsgi_executor, next, chunks, None)
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        if hasattr(result, "close"):
+            await loop.run_in_executor(wsgi_executor, result.close)
@@ -0,0 +1,434 @@
+import asyncio
+import os
+import time
+import httpx
+import numpy as np
+from cache import MISSING
+from circuit_breaker import fallback_reason
+from climate_model import climate_ensemble
+from metrics import count_fallback, observe_stage, record_fallbacks, span, track_fallbacks
+from scoring import evaluate_policy
+from simulation_logic import (
+    ANALYSIS_SCHEMA, GEMINI_BATCHED, GEMINI_MODEL, GEOCODE_DEADLINE, LLM_TIMEOUT, OPEN_METEO_DEADLINE, OPEN_METEO_URL,
+    WEATHER_TIMEOUT, api_key, climate_api, combined_analysis_prompt, compact_results, fallback_analysis, gemini_breaker,
+    genai_client, genai_types, geocode_breaker, geocode_cache, geocode_result, llm_cache, llm_request, mark_fallbacks,
+    normalize_address, parse_combined_analysis, retry_analysis_separately, score_fields, start_separate_analysis,
+    store_generated_text, stream_separate_analysis, temperature_cache, temperature_key, temperature_lock, timed_call,
+    trajectory_fields, validate_simulation_input, weather_breaker, weather_params
+)
+
+# Async versions of the upstream calls of a simulation, used by the ASGI server (asgi.py).
+# They share their caches, prompts and response handling with simulation_logic, so both serving modes give the
+# same results. Each upstream has a limit on its concurrent requests; a request waiting for a slot counts against
+# the simulation's deadline, so under overload simulations fall back instead of queueing without bound.
+GEOCODE_CONCURRENCY = int(os.getenv("GEOCODE_CONCURRENCY", 16))
+WEATHER_CONCURRENCY = int(os.getenv("WEATHER_CONCURRENCY", 16))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", 8))
+geocode_slots = asyncio.Semaphore(GEOCODE_CONCURRENCY)
+weather_slots = asyncio.Semaphore(WEATHER_CONCURRENCY)
+llm_slots = asyncio.Semaphore(LLM_CONCURRENCY)
+
+# Open-Meteo requests are retried like the retry_requests session of the synchronous client, except for the probe of a
+# half-open circuit breaker
+WEATHER_RETRIES = 5
+WEATHER_BACKOFF = 0.2
+WEATHER_RETRY_STATUSES = (500, 502, 504)
+
+# Shared HTTP client, created on first use inside the event loop
+_http_client = None
+
+# Requests in flight per cache key, so concurrent simulations of the same location share one upstream request
+_geocode_requests = {}
+_temperature_requests = {}
+
+
+def http_client():
+    """
+    Purpose: Returns the shared async HTTP client, so connections are reused across simulations.
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            timeout=WEATHER_TIMEOUT,
+            limits=httpx.Limits(max_connections=GEOCODE_CONCURRENCY + WEATHER_CONCURRENCY)
+        )
+    return _http_client
+
+
+async def aclose_clients():
+    """
+    Purpose: Closes the shared HTTP client. Called when the server shuts down.
+    """
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def single_flight(requests_in_flight, key, make_request):
+    """
+    Purpose: Awaits the request in flight for key, starting it with make_request() if there is none.
+    The task is shielded, so a simulation that gives up waiting does not cancel the request others are waiting for.
+    The fallbacks the request used are recorded for every simulation that waited for it.
+
+    Output: The result of the request.
+    """
+    task = requests_in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(tracked_request(make_request))
+        requests_in_flight[key] = task
+        task.add_done_callback(lambda _: requests_in_flight.pop(key, None))
+    result, fallbacks = await asyncio.shield(task)
+    record_fallbacks(fallbacks)
+    return result
+
+
+async def tracked_request(make_request):
+    # Runs in the task's own copy of the context, so its fallbacks are kept apart from the simulation that started it
+    fallbacks = track_fallbacks()
+    return await make_request(), fallbacks
+
+
+async def cache_get(cache, key):
+    """
+    Purpose: Reads a TieredCache entry without blocking the event loop: the in-memory tier is checked on the loop,
+    the SQLite tier on a worker thread.
+
+    Output: The cached value, or MISSING.
+    """
+    value = cache.get_memory(key)
+    if value is MISSING:
+        value = await asyncio.to_thread(cache.get, key)
+    return value
+
+
+async def extract_lat_lng_async(input_address, data_type='json'):
+    """
+    Purpose: Async version of extract_lat_lng, sharing its cache.
+
+    Output:
+        A dictionary with "lat", "lon" and "name", or None if the address could not be geocoded.
+    """
+    key = normalize_address(input_address)
+    if not key:
+        return None
+
+    cached = await cache_get(geocode_cache, key)
+    if cached is MISSING:
+        cached = await single_flight(_geocode_requests, key, lambda: fetch_location(key, input_address, data_type))
+    if cached is None:
+        return None
+    return {"lat": cached["lat"], "lon": cached["lon"], "name": input_address}
+
+
+async def fetch_location(key, input_address, data_type):
+    """
+    Purpose: Requests the coordinates of an address from the Google Geocoding API and caches the outcome.
+
+    Output: A dictionary with "lat" and "lon", or None if the address could not be geocoded.
+    """
+    endpoint = f"https://maps.googleapis.com/maps/api/geocode/{data_type}"
+    params = {
+        "address": input_address,
+        "key": api_key
+    }
+
+    try:
+        async with geocode_slots:
+            with geocode_breaker.call(), span("geocode"):
+                response = await http_client().get(endpoint, params=params, timeout=GEOCODE_DEADLINE)
+                response.raise_for_status()
+                # Quota and key errors raise here, so they count against the circuit breaker
+                location = await asyncio.to_thread(geocode_result, key, input_address, response.json())
+        if location is None:
+            return None
+        return {"lat": location["lat"], "lon": location["lon"]}
+
+    except Exception as e:
+        print(f"Geocoding failed for {input_address}: {e}")
+        count_fallback("geocode", fallback_reason(e))
+        return None
+
+
+async def fetch_temperature(key):
+    """
+    Purpose: Requests the current temperature at the coordinates of a temperature cache key from Open-Meteo
+    and caches it. Failures return 0.0 and are not cached, like get_real_temperature.
+    """
+    try:
+        with weather_breaker.call() as probe:
+            current_temperature = await request_temperature(key, 0 if probe else WEATHER_RETRIES)
+    except Exception as e:
+        print(f"Open-Meteo request failed: {e}")
+        count_fallback("weather", fallback_reason(e))
+        return 0.0
+
+    with temperature_lock:
+        temperature_cache[key] = current_temperature
+    return current_temperature
+
+
+async def request_temperature(key, retries):
+    """
+    Purpose: Requests the current temperature at the coordinates of a temperature cache key from Open-Meteo,
+    retrying transport errors and server errors up to the given number of times with exponential backoff.
+
+    Output: The temperature. Raises an exception if the last attempt failed.
+    """
+    lat, lon, _ = key
+    for attempt in range(retries + 1):
+        try:
+            async with weather_slots:
+                with span("open_meteo"):
+                    response = await http_client().get(
+                        OPEN_METEO_URL, params=weather_params(lat, lon), timeout=OPEN_METEO_DEADLINE
+                    )
+        except httpx.TransportError:
+            if attempt < retries:
+                await asyncio.sleep(WEATHER_BACKOFF * 2 ** attempt)
+                continue
+            raise
+        if response.status_code in WEATHER_RETRY_STATUSES and attempt < retries:
+            await asyncio.sleep(WEATHER_BACKOFF * 2 ** attempt)
+            continue
+        response.raise_for_status()
+        return float(response.json()["current"]["temperature_2m"])
+
+
+async def get_real_temperature_async(location):
+    """
+    Purpose: Async version of get_real_temperature, sharing its cache.
+
+    Inputs:
+        - location: The address
+
+    Output:
+        Current temperature at the specified location
+    """
+    location_data = await extract_lat_lng_async(location)
+    if location_data is None:
+        # Without coordinates there is nothing to ask Open-Meteo for
+        return 0.0
+
+    key = temperature_key(location_data)
+    with temperature_lock:
+        if key in temperature_cache:
+            return temperature_cache[key]
+
+    # Only one request per key goes upstream, the other simulations await the same task
+    return await single_flight(_temperature_requests, key, lambda: fetch_temperature(key))
+
+
+async def generate_text_async(prompt, max_output_tokens=1024, temperature=0.2, response_schema=None):
+    """
+    Purpose: Async version of generate_text, sharing the LLM response cache.
+
+    Output:
+        The stripped response text. Raises an exception if Gemini fails, or CircuitOpenError if its circuit
+        breaker is open.
+    """
+    key, config = llm_request(prompt, max_output_tokens, temperature, response_schema)
+    cached = await cache_get(llm_cache, key)
+    if cached is not MISSING:
+        return cached
+
+    async with llm_slots:
+        with gemini_breaker.call(), span("gemini"):
+            response = await genai_client().aio.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=prompt,
+                config=genai_types().GenerateContentConfig(**config)
+            )
+    return await asyncio.to_thread(store_generated_text, key, response.text, response_schema)
+
+
+async def gemini_combined_analysis_async(title, description, summary, scores, location):
+    """
+    Purpose: Async version of gemini_combined_analysis.
+
+    Output:
+        A dictionary with "description", "aiComment", "strength" and "weakness", or None if the request failed
+        or the answer was incomplete.
+    """
+    prompt, has_description = combined_analysis_prompt(title, description, summary, scores, location)
+    try:
+        text = await generate_text_async(prompt, max_output_tokens=2048, response_schema=ANALYSIS_SCHEMA)
+        return parse_combined_analysis(text, has_description, summary)
+    except Exception as e:
+        print(f"Combined Gemini analysis failed: {e}")
+        count_fallback("analysis", fallback_reason(e))
+        return None
+
+
+async def timed_async(timings, name, awaitable):
+    """
+    Purpose: Awaits a call and records how long it took in timings[name] (milliseconds) and in the stage metrics.
+    """
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        seconds = time.perf_counter() - start
+        observe_stage(name, seconds)
+        if timings.get(name) != "timeout":
+            timings[name] = round(seconds * 1000, 1)
+
+
+async def await_until(task, deadline, fallback, timings, name):
+    """
+    Purpose: Async version of wait_for: awaits a task until the given deadline.
+    Unlike a worker thread, a task that is given up on is cancelled, which frees its upstream slot.
+
+    Output: The result of the task, or the fallback value.
+    """
+    try:
+        return await asyncio.wait_for(task, timeout=max(0.0, deadline - time.perf_counter()))
+    except asyncio.TimeoutError:
+        print(f"{name} did not finish in time, using the fallback")
+        count_fallback(name, "timeout")
+        timings[name] = "timeout"
+        return fallback()
+
+
+async def calculate_results_async(input_data):
+    """
+    Purpose: Async version of calculate_results.
+
+    Input:
+        - input_data: A dictionary containing the input parameters from the frontend.
+
+    Output: A dictionary containing the simulation results.
+    """
+    results = {}
+    async for _, data in stream_results_async(input_data):
+        results.update(data)
+    return results
+
+
+async def stream_results_async(input_data):
+    """
+    Purpose: Async version of stream_results. The geocoding, weather and combined Gemini requests are awaited
+    on the event loop instead of holding a thread each. The per-call Gemini pipeline (GEMINI_BATCHED=0, or when the
+    combined analysis fails) still runs on the thread pool of simulation_logic.
+
+    Input:
+        - input_data: A dictionary containing the input parameters from the frontend.
+
+    Output: An async generator of (event, data) pairs, as described in stream_results.
+    """
+    start_year = input_data["startYear"]
+    end_year = input_data["endYear"]
+    location = input_data["location"]
+    policies = input_data["policies"]
+    policy_naming = input_data["policyName"]
+    description = input_data["description"]
+
+    started = time.perf_counter()
+    timings = {}
+    fallbacks = track_fallbacks()
+    weather_task = asyncio.ensure_future(timed_async(timings, "weather", get_real_temperature_async(location)))
+
+    # Scores, badge, name, summary and suggestions are pure functions of the policy settings
+    evaluation = evaluate_policy(policies)
+    if policy_naming == "" or policy_naming == "None":
+        policy_name = evaluation["policyName"]
+    else:
+        policy_name = policy_naming
+    summary = evaluation["summary"]
+    scores = {
+        "carbon_score": round(evaluation["carbonScore"]),
+        "justice_score": round(evaluation["justiceScore"]),
+        "economic_pressure": round(evaluation["economicPressure"])
+    }
+    scoring_seconds = time.perf_counter() - started
+    timings["scoring"] = round(scoring_seconds * 1000, 1)
+    observe_stage("scoring", scoring_seconds)
+
+    analysis_task = None
+    pending_analysis = None
+    if GEMINI_BATCHED:
+        analysis_task = asyncio.ensure_future(timed_async(
+            timings, "analysis", gemini_combined_analysis_async(policy_name, description, summary, scores, location)
+        ))
+    else:
+        pending_analysis = start_separate_analysis(policy_name, description, timings)
+    yield "scores", score_fields(policy_name, evaluation)
+
+    # Temperature trajectory
+    base_temperature = await await_until(weather_task, started + WEATHER_TIMEOUT, lambda: 0.0, timings, "weather")
+    rng = np.random.default_rng(input_data.get("seed"))
+    temperature_traj, years = timed_call(
+        timings, "trajectory", climate_api, start_year, end_year, location, policies, base_temperature, rng
+    )
+
+    # Monte Carlo uncertainty bands, if requested. Large ensembles take tens of milliseconds, so they run off the loop.
+    ensemble = None
+    if input_data.get("ensemble"):
+        ensemble = await asyncio.to_thread(
+            timed_call, timings, "ensemble", climate_ensemble, start_year, end_year, base_temperature, policies,
+            input_data["ensemble"], input_data.get("ensembleStep", 1), rng
+        )
+    yield "trajectory", trajectory_fields(years, temperature_traj, ensemble)
+
+    # AI analysis
+    analysis = None
+    if analysis_task is not None:
+        analysis_deadline = started + LLM_TIMEOUT
+        analysis = await await_until(analysis_task, analysis_deadline, lambda: None, timings, "analysis")
+        if analysis is None:
+            if retry_analysis_separately(timings, analysis_deadline):
+                pending_analysis = start_separate_analysis(policy_name, description, timings, analysis_deadline)
+            else:
+                analysis = fallback_analysis(description, summary, scores, timings)
+    if analysis is not None:
+        yield "analysis", analysis
+    else:
+        # Each field is waited for on a worker thread and sent as soon as its call finishes
+        fields = stream_separate_analysis(pending_analysis, description, summary, scores, location, timings)
+        while True:
+            field = await asyncio.to_thread(next, fields, None)
+            if field is None:
+                break
+            yield "analysis", {field[0]: field[1]}
+    total = time.perf_counter() - started
+    timings["total"] = round(total * 1000, 1)
+    observe_stage("simulation", total)
+    mark_fallbacks(timings, fallbacks)
+    yield "done", {"timings": dict(timings)}
+
+
+async def handle_simulation_async(input_data):
+    """
+    Purpose: Async version of handle_simulation.
+
+    Returns:
+        A dictionary containing the results of the simulation.
+    """
+    error = validate_simulation_input(input_data)
+    if error:
+        print(error)
+        return {"error": error}
+
+    results = await calculate_results_async(input_data)
+    if input_data.get("format") == "compact":
+        compact_results(results, input_data["startYear"])
+    return results
+
+
+async def handle_simulation_stream_async(input_data):
+    """
+    Purpose: Async version of handle_simulation_stream.
+
+    Returns:
+        An async generator of (event, data) pairs. Invalid input gives a single "error" event.
+    """
+    error = validate_simulation_input(input_data)
+    if error:
+        print(error)
+        yield "error", {"error": error}
+        return
+
+    async for event, data in stream_results_async(input_data):
+        if event == "trajectory" and input_data.get("format") == "compact":
+            compact_results(data, input_data["startYear"])
+        yield event, data
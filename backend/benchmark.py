@@ -0,0 +1,713 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+# Offline benchmarks of the backend. The CPDB, Google Geocoding, Open-Meteo and Gemini are replaced by local
+# stand-ins with configurable latency and failure rates, injected where the app creates its clients, so results
+# are reproducible and no API key or network access is needed:
+#
+#     cd backend
+#     python benchmark.py                                   # micro-benchmarks and load tests, both serving modes
+#     python benchmark.py --only load --server asgi --requests 500 --concurrency 64
+#     python benchmark.py --latency gemini=1.5 --failure-rate gemini=0.2
+#     python benchmark.py --json bench.json                 # save the results...
+#     python benchmark.py --baseline bench.json             # ...and report regressions against them later
+#
+# Recorded upstream responses can be replayed with --recordings (a JSON file, see Recordings) and a recorded CPDB
+# with --cpdb (an Arrow file, such as the data/cpdb_snapshot.arrow saved by the app). Anything not recorded is
+# generated deterministically from the --seed.
+
+# Simulated latency of each upstream (seconds)
+DEFAULT_LATENCY = {"cpdb": 1.0, "geocode": 0.08, "weather": 0.06, "gemini": 0.8}
+
+# Each simulated latency varies by up to this fraction around its value
+LATENCY_JITTER = 0.2
+
+# A benchmark whose p95 grows, or whose throughput drops, by more than this fraction of its baseline is a regression
+REGRESSION_THRESHOLD = float(os.getenv("BENCH_REGRESSION_THRESHOLD", 0.15))
+
+# Locations used by the simulations, cycled when more are requested
+LOCATIONS = [
+    "Kenya", "France", "Germany", "India", "Brazil", "Canada", "Japan", "Mexico", "Nigeria", "Australia",
+    "Indonesia", "Egypt", "Chile", "Norway", "Viet Nam", "South Africa", "Argentina", "Spain", "Poland", "Peru",
+]
+
+# Columns and values of the synthetic CPDB
+CPDB_COUNTRIES = [("France", "FRA"), ("Germany", "DEU"), ("India", "IND"), ("Brazil", "BRA"), ("Kenya", "KEN"),
+                  ("Canada", "CAN"), ("Japan", "JPN"), ("Mexico", "MEX"), ("Chile", "CHL"), ("Norway", "NOR")]
+CPDB_SECTORS = ["Electricity and heat", "Industry", "Buildings", "Transport", "Agriculture", "General"]
+CPDB_INSTRUMENTS = ["Strategic planning", "Feed-in tariffs or premiums", "Energy efficiency obligations",
+                    "Carbon tax", "Grants and subsidies", "Building codes and standards"]
+CPDB_TYPES = ["Energy efficiency", "Renewables", "Non energy use", "Energy service demand reduction"]
+CPDB_STATUSES = ["In force", "Planned", "Ended", "Superseded"]
+
+
+class UpstreamError(Exception):
+    """
+    Purpose: A simulated upstream failure.
+    """
+
+
+class Upstream:
+    """
+    Purpose: The simulated latency and failure rate of one upstream API.
+
+    Input:
+        - name: The upstream, one of DEFAULT_LATENCY.
+        - latency: The latency of a call (seconds).
+        - failure_rate: The fraction of calls that fail, after their latency.
+        - seed: Seed of the random draws.
+    """
+
+    def __init__(self, name, latency, failure_rate, seed):
+        self.name = name
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self.failures = 0
+        self._rng = random.Random(f"{seed}-{name}")
+        self._lock = threading.Lock()
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency * self._rng.uniform(1 - LATENCY_JITTER, 1 + LATENCY_JITTER)
+            failed = self._rng.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+        return delay, failed
+
+    def wait(self):
+        """
+        Purpose: Simulates a call: sleeps for its latency, then raises UpstreamError if it fails.
+        """
+        delay, failed = self._draw()
+        time.sleep(delay)
+        if failed:
+            raise UpstreamError(f"Simulated {self.name} failure")
+
+    async def wait_async(self):
+        delay, failed = self._draw()
+        await asyncio.sleep(delay)
+        if failed:
+            raise UpstreamError(f"Simulated {self.name} failure")
+
+
+class Recordings:
+    """
+    Purpose: Upstream responses replayed by the stand-ins. A recordings file is a JSON object with any of:
+        - geocode: {address: Google Geocoding API response}
+        - weather: {"<lat>,<lon>" (2 decimals): current temperature}
+        - gemini: [text, ...], replayed in turn for plain prompts
+        - analysis: [{"description", "aiComment", "strength", "weakness"}, ...], replayed in turn for the combined analysis
+    Anything not recorded is generated deterministically.
+
+    Input:
+        - path: The recordings file, or None.
+    """
+
+    def __init__(self, path=None):
+        data = {}
+        if path:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        self.geocode = {address.strip().lower(): response for address, response in data.get("geocode", {}).items()}
+        self.weather = data.get("weather", {})
+        self.gemini = data.get("gemini", [])
+        self.analysis = data.get("analysis", [])
+        self._turn = 0
+        self._lock = threading.Lock()
+
+    def _next(self, items):
+        with self._lock:
+            self._turn += 1
+            return items[self._turn % len(items)]
+
+    def geocode_response(self, address):
+        recorded = self.geocode.get(str(address).strip().lower())
+        if recorded is not None:
+            return recorded
+        digest = zlib.crc32(str(address).strip().lower().encode("utf-8"))
+        lat = -55 + (digest % 12000) / 100
+        lon = -180 + (digest // 12000 % 36000) / 100
+        return {"status": "OK", "results": [{"geometry": {"location": {"lat": lat, "lng": lon}}}]}
+
+    def temperature(self, lat, lon):
+        recorded = self.weather.get(f"{float(lat):.2f},{float(lon):.2f}")
+        if recorded is not None:
+            return float(recorded)
+        return round(30 - abs(float(lat)) * 0.45, 1)
+
+    def gemini_text(self, prompt, structured):
+        if structured:
+            if self.analysis:
+                return json.dumps(self._next(self.analysis))
+            return json.dumps({
+                "description": "A concise description of the policy and its main measures.",
+                "aiComment": "The policy balances emission cuts with economic pressure; adaptation funding could be raised.",
+                "strength": ["Clear carbon price signal", "Supports renewable deployment"],
+                "weakness": ["Limited support for low-income households", "Slow fossil fuel phase-out"],
+            })
+        if self.gemini:
+            return self._next(self.gemini)
+        return f"Benchmark analysis of a {len(prompt)}-character prompt: the policy is effective but could go further."
+
+
+def cpdb_frame(path=None, rows=2000, seed=0):
+    """
+    Purpose: The CPDB served by the CPDB stand-in: a recorded snapshot, or a synthetic one with the same columns.
+
+    Inputs:
+        - path: An Arrow file with a recorded CPDB (e.g. data/cpdb_snapshot.arrow), or None.
+        - rows: The number of synthetic policies.
+        - seed: Seed of the synthetic values.
+
+    Output: A DataFrame.
+    """
+    import pandas as pd
+    import pyarrow.feather as feather
+    if path:
+        return feather.read_table(path).to_pandas()
+
+    rng = random.Random(seed)
+    records = []
+    for i in range(rows):
+        country, iso = rng.choice(CPDB_COUNTRIES)
+        start = rng.randint(2000, 2024)
+        records.append({
+            "policy_id": str(1000 + i),
+            "policy_name": f"Policy {i}",
+            "policy_description": rng.choice(["", f"Policy {i} introduces a carbon tax", f"Policy {i} funds renewable jobs"]),
+            "country": country,
+            "country_iso": iso,
+            "policy_status": rng.choice(CPDB_STATUSES),
+            "sector": ", ".join(rng.sample(CPDB_SECTORS, rng.randint(1, 2))),
+            "policy_instrument": ", ".join(rng.sample(CPDB_INSTRUMENTS, rng.randint(1, 2))),
+            "policy_type": ", ".join(rng.sample(CPDB_TYPES, rng.randint(1, 2))),
+            "decision_date": start - rng.randint(0, 3),
+            "start_date": start,
+            "end_date": rng.choice([2030, 2050, 2100]),
+        })
+    return pd.DataFrame.from_records(records)
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+class FakeGeocodeSession:
+    """
+    Purpose: Stand-in for the requests session of the Google Geocoding API.
+    """
+
+    def __init__(self, upstream, recordings):
+        self.upstream = upstream
+        self.recordings = recordings
+
+    def get(self, endpoint, params=None, timeout=None):
+        self.upstream.wait()
+        return FakeResponse(self.recordings.geocode_response(params["address"]))
+
+
+class FakeWeatherVariable:
+    def __init__(self, value):
+        self._value = value
+
+    def Value(self):
+        return self._value
+
+
+class FakeWeatherResponse:
+    def __init__(self, temperature):
+        self._temperature = temperature
+
+    def Current(self):
+        return self
+
+    def Variables(self, index):
+        return FakeWeatherVariable(self._temperature)
+
+
+class FakeOpenMeteo:
+    """
+    Purpose: Stand-in for the openmeteo_requests client.
+    """
+
+    def __init__(self, upstream, recordings):
+        self.upstream = upstream
+        self.recordings = recordings
+
+    def weather_api(self, url, params=None, timeout=None):
+        self.upstream.wait()
+        return [FakeWeatherResponse(self.recordings.temperature(params["latitude"], params["longitude"]))]
+
+
+class FakeGenerated:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGeminiModels:
+    def __init__(self, upstream, recordings):
+        self.upstream = upstream
+        self.recordings = recordings
+
+    def generate_content(self, model, contents, config=None):
+        self.upstream.wait()
+        return FakeGenerated(self.recordings.gemini_text(contents, getattr(config, "response_schema", None) is not None))
+
+
+class FakeAsyncGeminiModels(FakeGeminiModels):
+    async def generate_content(self, model, contents, config=None):
+        await self.upstream.wait_async()
+        return FakeGenerated(self.recordings.gemini_text(contents, getattr(config, "response_schema", None) is not None))
+
+
+class FakeGemini:
+    """
+    Purpose: Stand-in for the google.genai client, with its synchronous and async (aio) interfaces.
+    """
+
+    def __init__(self, upstream, recordings):
+        self.models = FakeGeminiModels(upstream, recordings)
+        self.aio = type("FakeAio", (), {})()
+        self.aio.models = FakeAsyncGeminiModels(upstream, recordings)
+
+
+def fake_http_client(upstreams, recordings):
+    """
+    Purpose: Stand-in for the httpx client of async_simulation, answering geocoding and weather requests.
+    """
+    import httpx
+
+    async def handle(request):
+        if request.url.host == "maps.googleapis.com":
+            upstream = upstreams["geocode"]
+            data = lambda: recordings.geocode_response(request.url.params["address"])
+        else:
+            upstream = upstreams["weather"]
+            data = lambda: {"current": {"temperature_2m": recordings.temperature(
+                request.url.params["latitude"], request.url.params["longitude"]
+            )}}
+        try:
+            await upstream.wait_async()
+        except UpstreamError as e:
+            raise httpx.ConnectError(str(e), request=request)
+        return httpx.Response(200, json=data())
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handle))
+
+
+def configure_environment(workdir):
+    """
+    Purpose: Points the caches and the CPDB snapshot at a scratch directory, and turns off the background jobs,
+    so a benchmark neither reads nor changes the app's data. Must run before the app is imported.
+    """
+    os.environ["CACHE_DB_PATH"] = os.path.join(workdir, "cache.sqlite")
+    os.environ["CPDB_SNAPSHOT_PATH"] = os.path.join(workdir, "cpdb_snapshot.arrow")
+    os.environ["PRECOMPUTE_POLICIES"] = "0"
+    os.environ["CPDB_BACKGROUND_REFRESH"] = "0"
+    os.environ.setdefault("GEN_API", "benchmark")
+    os.environ.setdefault("API_KEY", "benchmark")
+
+
+def install_fakes(upstreams, recordings, frame):
+    """
+    Purpose: Replaces the upstream clients of the app with the stand-ins.
+    """
+    import simulation_logic
+    from policy_store import policy_store
+
+    simulation_logic._clients["genai"] = FakeGemini(upstreams["gemini"], recordings)
+    simulation_logic._clients["geocode"] = FakeGeocodeSession(upstreams["geocode"], recordings)
+    simulation_logic._clients["openmeteo"] = FakeOpenMeteo(upstreams["weather"], recordings)
+    simulation_logic._clients["openmeteo_probe"] = simulation_logic._clients["openmeteo"]
+
+    def fetch():
+        upstreams["cpdb"].wait()
+        return frame.copy()
+    policy_store._fetch = fetch
+
+
+@contextlib.contextmanager
+def without_latency(upstreams):
+    """
+    Purpose: Turns off the simulated latency and failures, so micro-benchmarks only measure the backend itself.
+    """
+    saved = {name: (upstream.latency, upstream.failure_rate) for name, upstream in upstreams.items()}
+    for upstream in upstreams.values():
+        upstream.latency, upstream.failure_rate = 0.0, 0.0
+    try:
+        yield
+    finally:
+        for name, (latency, failure_rate) in saved.items():
+            upstreams[name].latency, upstreams[name].failure_rate = latency, failure_rate
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, wall_seconds, errors=0):
+    """
+    Purpose: Summarizes the latencies of a benchmark.
+
+    Output: A dictionary with the count, errors, rps and the mean, p50, p95 and p99 latencies in milliseconds.
+    """
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "rps": round(len(values) / wall_seconds, 1) if wall_seconds > 0 else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+    }
+
+
+def time_calls(func, inputs):
+    """
+    Purpose: Calls func on every input in turn and summarizes the latencies. One untimed call is made first, so
+    lazy imports and client creation are not counted.
+    """
+    func(inputs[0])
+    latencies = []
+    started = time.perf_counter()
+    for item in inputs:
+        start = time.perf_counter()
+        func(item)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def random_policies(rng):
+    return {
+        "carbonTaxRate": rng.randint(0, 200),
+        "renewableSubsidy": rng.randint(0, 100),
+        "fossilFuelPhaseout": rng.choice(["slow", "medium", "fast"]),
+        "deforestationBan": rng.random() < 0.5,
+        "educationCampaigns": rng.randint(0, 100),
+        "greenJobsInitiative": rng.randint(0, 10),
+        "industryRegulations": rng.choice(["low", "medium", "high"]),
+        "justiceLensStrength": rng.randint(0, 100),
+        "adaptationInvestment": rng.randint(0, 10),
+        "carbonCaptureRAndD": rng.randint(0, 10),
+    }
+
+
+def simulation_inputs(count, locations, seed):
+    """
+    Purpose: Distinct simulation inputs, so Gemini answers are not served from the LLM cache. Locations repeat
+    from a pool of the given size, like real traffic.
+    """
+    rng = random.Random(f"{seed}-simulate")
+    pool = [LOCATIONS[i % len(LOCATIONS)] + ("" if i < len(LOCATIONS) else f" {i}") for i in range(locations)]
+    return [{
+        "location": rng.choice(pool),
+        "startYear": 2020,
+        "endYear": 2100,
+        "policyName": f"Benchmark policy {seed}-{i}",
+        "description": f"Benchmark policy {seed}-{i} combines a carbon tax with renewable subsidies.",
+        "policies": random_policies(rng),
+    } for i in range(count)]
+
+
+def policy_requests(count, frame, seed):
+    """
+    Purpose: Paged /api/policies requests, some of them filtered like the policy list page.
+    """
+    rng = random.Random(f"{seed}-policies")
+    sectors = [sector.lower() for sector in CPDB_SECTORS]
+    paths = []
+    for _ in range(count):
+        path = f"/api/policies?page={rng.randint(1, 20)}&limit=15"
+        if rng.random() < 0.5:
+            path += f"&sector={rng.choice(sectors)}"
+        paths.append(path)
+    return paths
+
+
+def policy_detail_requests(count, frame, seed):
+    rng = random.Random(f"{seed}-detail")
+    ids = frame["policy_id"].astype(str).tolist()
+    return [f"/api/policy/{rng.choice(ids)}" for _ in range(count)]
+
+
+def run_micro_benchmarks(upstreams, iterations, seed):
+    """
+    Purpose: Times the simulation kernels without upstream latency.
+
+    Output: A dictionary mapping each benchmark to its summary.
+    """
+    import numpy as np
+    from policy_store import policy_store
+    from simulation_logic import calculate_results, climate_api
+
+    rng = random.Random(f"{seed}-micro")
+    policies = [random_policies(rng) for _ in range(iterations)]
+    results = {}
+    results["micro climate_api"] = time_calls(
+        lambda p: climate_api(2020, 2100, "Kenya", p, 20.0, np.random.default_rng(0)), policies
+    )
+
+    inputs = simulation_inputs(iterations, len(LOCATIONS), f"{seed}-micro")
+    with without_latency(upstreams):
+        results["micro calculate_results"] = time_calls(calculate_results, inputs)
+
+    snapshot = policy_store.snapshot()
+    filters = [{"sector": [rng.choice(CPDB_SECTORS).lower()], "policy_status": ["in force"]} for _ in range(iterations)]
+    results["micro policy_filter"] = time_calls(snapshot.positions, filters)
+    return results
+
+
+def run_wsgi_load(flask_app, requests, concurrency):
+    """
+    Purpose: Sends requests to the Flask app from concurrent threads, each with its own test client.
+
+    Input:
+        - requests: A list of (method, path, json body or None).
+
+    Output: The summary.
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    queue = iter(requests)
+
+    def worker():
+        nonlocal errors
+        client = flask_app.test_client()
+        while True:
+            with lock:
+                request = next(queue, None)
+            if request is None:
+                return
+            method, path, body = request
+            start = time.perf_counter()
+            try:
+                response = client.open(path, method=method, json=body, headers={"Accept-Encoding": "gzip"})
+                response.get_data()
+                failed = response.status_code >= 500
+            except Exception:
+                failed = True
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                errors += failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def run_asgi_load(asgi_app, requests, concurrency):
+    """
+    Purpose: Sends requests to the ASGI app from concurrent tasks.
+
+    Output: The summary.
+    """
+    import httpx
+
+    latencies = []
+    errors = 0
+    queue = iter(requests)
+    transport = httpx.ASGITransport(app=asgi_app)
+
+    async def worker(client):
+        nonlocal errors
+        for method, path, body in queue:
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body, headers={"Accept-Encoding": "gzip"})
+                failed = response.status_code >= 500
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+
+    started = time.perf_counter()
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+def load_scenarios(frame, count, locations, seed):
+    """
+    Purpose: The requests of each load test, as (method, path, json body) lists.
+    """
+    return {
+        "/api/policies": [("GET", path, None) for path in policy_requests(count, frame, seed)],
+        "/api/policy/<id>": [("GET", path, None) for path in policy_detail_requests(count, frame, seed)],
+        "/simulate": [("POST", "/simulate", body) for body in simulation_inputs(count, locations, seed)],
+    }
+
+
+def run_load_tests(servers, upstreams, recordings, frame, count, concurrency, locations, seed):
+    """
+    Purpose: Runs the load tests against the Flask app and/or the ASGI app.
+
+    Output: A dictionary mapping each benchmark to its summary.
+    """
+    import app as app_module
+    results = {}
+    if "wsgi" in servers:
+        for name, requests in load_scenarios(frame, count, locations, f"{seed}-wsgi").items():
+            results[f"wsgi {name}"] = run_wsgi_load(app_module.app, requests, concurrency)
+
+    if "asgi" in servers:
+        import async_simulation
+        import asgi
+
+        async def run_all():
+            async_simulation._http_client = fake_http_client(upstreams, recordings)
+            try:
+                for name, requests in load_scenarios(frame, count, locations, f"{seed}-asgi").items():
+                    results[f"asgi {name}"] = await run_asgi_load(asgi.app, requests, concurrency)
+            finally:
+                await async_simulation.aclose_clients()
+        asyncio.run(run_all())
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Purpose: Compares results with a baseline run.
+
+    Output: A list of regression messages (empty if there are none).
+    """
+    regressions = []
+    for name, summary in results.items():
+        before = baseline.get(name)
+        if not isinstance(before, dict) or "p95_ms" not in before:
+            continue
+        if before["p95_ms"] > 0 and summary["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.3f} ms -> {summary['p95_ms']:.3f} ms")
+        if before.get("rps", 0) > 0 and summary["rps"] < before["rps"] * (1 - threshold):
+            regressions.append(f"{name}: {before['rps']:.1f} -> {summary['rps']:.1f} requests/s")
+    return regressions
+
+
+def format_report(results, upstreams, regressions=None):
+    lines = [
+        "",
+        "Upstream stand-ins: " + ", ".join(
+            f"{name} {upstream.latency * 1000:.0f} ms / {upstream.failure_rate:.0%} failures ({upstream.calls} calls)"
+            for name, upstream in upstreams.items()
+        ),
+        "",
+        f"{'benchmark':<32} {'count':>6} {'errors':>6} {'rps':>9} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}",
+    ]
+    for name, s in results.items():
+        lines.append(
+            f"{name:<32} {s['count']:>6} {s['errors']:>6} {s['rps']:>9.1f} {s['mean_ms']:>10.3f} "
+            f"{s['p50_ms']:>10.3f} {s['p95_ms']:>10.3f} {s['p99_ms']:>10.3f}"
+        )
+    if regressions is not None:
+        lines.append("")
+        if regressions:
+            lines.append(f"Regressions (over {REGRESSION_THRESHOLD:.0%} worse than the baseline):")
+            lines.extend(f"    {regression}" for regression in regressions)
+        else:
+            lines.append("No regressions against the baseline.")
+    return "\n".join(lines)
+
+
+def parse_rates(text, allowed):
+    """
+    Purpose: Parses "gemini=0.8,geocode=0.05" into a dictionary.
+    """
+    values = {}
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        name, _, value = item.partition("=")
+        if name not in allowed:
+            raise ValueError(f"Unknown upstream: {name} (expected one of {', '.join(allowed)})")
+        values[name] = float(value)
+    return values
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the PolicySim backend.")
+    parser.add_argument("--only", choices=["micro", "load"], help="Run only the micro-benchmarks or the load tests.")
+    parser.add_argument("--server", choices=["wsgi", "asgi", "both"], default="both", help="Serving mode of the load tests.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per load test.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients per load test.")
+    parser.add_argument("--iterations", type=int, default=300, help="Calls per micro-benchmark.")
+    parser.add_argument("--locations", type=int, default=len(LOCATIONS), help="Distinct simulation locations.")
+    parser.add_argument("--latency", help="Upstream latencies in seconds, e.g. gemini=0.8,geocode=0.05.")
+    parser.add_argument("--failure-rate", help="Upstream failure rates, e.g. gemini=0.1.")
+    parser.add_argument("--recordings", help="JSON file of recorded upstream responses to replay.")
+    parser.add_argument("--cpdb", help="Arrow file of a recorded CPDB to serve instead of a synthetic one.")
+    parser.add_argument("--cpdb-rows", type=int, default=2000, help="Policies in the synthetic CPDB.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated data and simulated latencies.")
+    parser.add_argument("--json", help="Write the results to this file.")
+    parser.add_argument("--baseline", help="Compare with the results of an earlier run (--json) and report regressions.")
+    parser.add_argument("--verbose", action="store_true", help="Show the log output of the app.")
+    args = parser.parse_args(argv)
+
+    latency = {**DEFAULT_LATENCY, **parse_rates(args.latency, DEFAULT_LATENCY)}
+    failure_rate = parse_rates(args.failure_rate, DEFAULT_LATENCY)
+    upstreams = {
+        name: Upstream(name, latency[name], failure_rate.get(name, 0.0), args.seed) for name in DEFAULT_LATENCY
+    }
+    recordings = Recordings(args.recordings)
+
+    with tempfile.TemporaryDirectory(prefix="policysim-bench-") as workdir:
+        configure_environment(workdir)
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        log = sys.stdout if args.verbose else io.StringIO()
+        results = {}
+        with contextlib.redirect_stdout(log):
+            import app as app_module
+            frame = cpdb_frame(args.cpdb, args.cpdb_rows, args.seed)
+            install_fakes(upstreams, recordings, frame)
+
+            # Loading the CPDB is the first thing a worker does, so it is timed once
+            started = time.perf_counter()
+            app_module.warm_up(preload=True, clients=False)
+            results["cpdb load"] = summarize([time.perf_counter() - started], time.perf_counter() - started)
+
+            if args.only in (None, "micro"):
+                results.update(run_micro_benchmarks(upstreams, args.iterations, args.seed))
+            if args.only in (None, "load"):
+                servers = ("wsgi", "asgi") if args.server == "both" else (args.server,)
+                results.update(run_load_tests(
+                    servers, upstreams, recordings, frame, args.requests, args.concurrency, args.locations, args.seed
+                ))
+
+    regressions = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f))
+    print(format_report(results, upstreams, regressions))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from cachetools import LRUCache
+
+# SQLite file holding the persistent caches. WAL mode lets several worker processes share it.
+CACHE_DB_PATH = os.getenv(
+    "CACHE_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cache.sqlite")
+)
+
+# Returned by the caches on a miss, so that a cached None (e.g. a negative result) can be told apart
+MISSING = object()
+
+
+class DiskCache:
+    """
+    Purpose: A persistent key/value table with a per-entry expiry time, stored in SQLite.
+    Values are stored as JSON.
+
+    Inputs:
+        - table: The name of the table holding this cache's entries.
+        - path: The SQLite file.
+        - max_entries: If given, the least recently written entries are evicted beyond this size.
+    """
+
+    def __init__(self, table, path=CACHE_DB_PATH, max_entries=None):
+        self.table = table
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connect(self):
+        """
+        Purpose: Returns this thread's connection, creating it and the table on first use.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT, expires_at REAL, updated_at REAL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_updated ON {self.table} (updated_at)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """
+        Purpose: Reads an entry.
+
+        Input:
+            - key: The cache key.
+
+        Output: A tuple (value, expires_at), or (MISSING, None) if there is no live entry.
+        """
+        try:
+            row = self._connect().execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Cache read failed ({self.table}): {e}")
+            return MISSING, None
+        if row is None or row[1] < time.time():
+            return MISSING, None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, ttl):
+        """
+        Purpose: Writes an entry.
+
+        Inputs:
+            - key: The cache key.
+            - value: Any JSON-serializable value.
+            - ttl: How long the entry stays valid (seconds).
+        """
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, updated_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now)
+            )
+            self._writes += 1
+            # Housekeeping every 100 writes: drop expired entries and enforce the size bound
+            if self._writes % 100 == 0:
+                self.evict(conn)
+        except sqlite3.Error as e:
+            print(f"Cache write failed ({self.table}): {e}")
+
+    def evict(self, conn=None):
+        """
+        Purpose: Deletes expired entries and, if max_entries is set, the oldest entries beyond it.
+        """
+        conn = conn or self._connect()
+        conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (time.time(),))
+        if self.max_entries:
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+
+class TieredCache:
+    """
+    Purpose: An in-memory LRU in front of a DiskCache, so hot keys are served without touching SQLite.
+
+    Inputs:
+        - disk: The DiskCache backing this cache.
+        - maxsize: The number of entries kept in memory.
+    """
+
+    def __init__(self, disk, maxsize=1024):
+        self.disk = disk
+        self._memory = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Purpose: Reads an entry from memory, falling back to disk.
+
+        Input:
+            - key: The cache key.
+
+        Output: The cached value, or MISSING.
+        """
+        value = self.get_memory(key)
+        if value is not MISSING:
+            return value
+
+        value, expires_at = self.disk.get(key)
+        if value is not MISSING:
+            with self._lock:
+                self._memory[key] = (value, expires_at)
+        return value
+
+    def get_memory(self, key):
+        """
+        Purpose: Reads an entry from memory only, without touching SQLite (e.g. on an event loop).
+
+        Input:
+            - key: The cache key.
+
+        Output: The cached value, or MISSING.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at >= time.time():
+                return value
+        return MISSING
+
+    def set(self, key, value, ttl):
+        """
+        Purpose: Writes an entry to memory and disk.
+
+        Inputs:
+            - key: The cache key.
+            - value: Any JSON-serializable value.
+            - ttl: How long the entry stays valid (seconds).
+        """
+        with self._lock:
+            self._memory[key] = (value, time.time() + ttl)
+        self.disk.set(key, value, ttl)
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from metrics import count_circuit_transition
+
+# Circuit breakers of the upstream APIs. After CIRCUIT_FAILURE_THRESHOLD failed calls in a row a breaker opens, and
+# calls are rejected right away with CircuitOpenError, so simulations use their fallback values instead of waiting
+# on timeouts and retries. After CIRCUIT_RESET_TIMEOUT seconds one call is let through (half-open) to probe whether
+# the upstream recovered: if it succeeds the breaker closes, otherwise it opens again. Breakers are per worker process.
+
+# Failed calls in a row that open a breaker
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))
+
+# How long an open breaker rejects calls before probing the upstream again (seconds)
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", 30))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """
+    Purpose: Raised instead of calling an upstream whose circuit breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Purpose: The circuit breaker of one upstream API.
+
+    Input:
+        - name: The upstream, used in messages and metrics.
+        - deadline: The longest a call may take (seconds); slower calls count as failures, even if they succeed.
+        - failure_threshold: Failed calls in a row that open the breaker.
+        - reset_timeout: How long the breaker stays open before a probe call is let through (seconds).
+    """
+
+    def __init__(self, name, deadline, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.deadline = deadline
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        # Must be called with the lock held
+        if state != self.state:
+            self.state = state
+            count_circuit_transition(self.name, state)
+            if state != CLOSED:
+                print(f"Circuit breaker of {self.name} is {state.replace('_', '-')}")
+
+    def before_call(self):
+        """
+        Purpose: Admits a call, or rejects it if the breaker is open.
+
+        Output: True if the call is the probe of a half-open breaker, False otherwise.
+        Raises CircuitOpenError if the call is rejected.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            if self.state == OPEN and time.monotonic() >= self._opened_at + self.reset_timeout:
+                # Only the first call after the reset timeout probes; the others are rejected until it finishes
+                self._set_state(HALF_OPEN)
+                return True
+            raise CircuitOpenError(f"Circuit breaker of {self.name} is open")
+
+    def record(self, succeeded):
+        """
+        Purpose: Records the outcome of an admitted call.
+        """
+        with self._lock:
+            if succeeded:
+                self.failures = 0
+                self._set_state(CLOSED)
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    @contextmanager
+    def call(self):
+        """
+        Purpose: Guards the enclosed upstream call. An exception raised in it, or a call over the deadline, counts as
+        a failure. Cancelling an awaited call (e.g. when a simulation gives up on it) counts as a failure too.
+
+        Output: Yields True if the call is a half-open probe, which should not be retried.
+        Raises CircuitOpenError, without running the block, if the breaker is open.
+        """
+        probe = self.before_call()
+        start = time.perf_counter()
+        try:
+            yield probe
+        except BaseException:
+            self.record(False)
+            raise
+        self.record(time.perf_counter() - start <= self.deadline)
+
+
+def fallback_reason(error):
+    """
+    Purpose: The fallback metrics reason of a failed upstream call: "circuit_open" if its breaker rejected it,
+    "error" otherwise.
+    """
+    return "circuit_open" if isinstance(error, CircuitOpenError) else "error"
@@ -0,0 +1,241 @@
+import numpy as np
+
+# Vectorized version of the temperature model used by climate_api.
+# NOTE: This is a simplified model made after referencing few research papers and should be replaced with a trained and complex model in the future.
+
+# According to NASA's Earth Observatory, most of the global warming has occurred since 1975 at a rate of about 0.15 to 0.20°C per decade.
+# This translates to an approximate increase of 0.02°C per year, which is used as an estimated annual increase in temperature rate in this dataset.
+DEFAULT_ANNUAL_INCREASE = 0.02
+
+# Policies can cancel at most 90% of the default yearly increase
+MAX_MITIGATION_RATIO = 0.9
+
+# Share of the mitigation factor that is added to the cumulative mitigation every year
+MITIGATION_RAMP = 0.02
+
+# Random variation to simulate climate variability:
+# - Normal distribution adds realistic variability to the model
+# - The "0" in the mean indicates no bias towards warming or cooling
+# - The "0.34" in the standard deviation is chosen after referencing "https://www.soa.org/490646/globalassets/assets/files/resources/research-report/2024/cc212-actuarial-weather-extremes-2023-hottest-year.pdf"
+NOISE_SD = 0.34
+
+# Effect of the categorical levers on the mitigation factor
+FFP_MULTIPLIERS = {"fast": 0.05, "medium": 0.02}   # Any other fossil fuel phaseout speed counts as slow
+FFP_DEFAULT_MULTIPLIER = 0.01
+DEFORESTATION_BAN_MULTIPLIER = 0.03
+
+
+def mitigation_factors(carbon_tax_rate, renewable_subsidy, fossil_fuel_phaseout, deforestation_ban, carbon_capture_randd):
+    """
+    Purpose: Calculates how strongly a set of policies reduces the yearly temperature increase.
+    Every input can be a scalar or an array, so many policies are handled at once.
+
+    Inputs:
+        - carbon_tax_rate: The carbon tax rates.
+        - renewable_subsidy: The renewable subsidy levels.
+        - fossil_fuel_phaseout: The fossil fuel phaseout speeds ("fast", "medium", "slow", ...).
+        - deforestation_ban: Whether deforestation is banned.
+        - carbon_capture_randd: The carbon capture R&D levels.
+
+    Output: The mitigation factors, as a float array.
+    """
+    ffp_multiplier = np.array(
+        [FFP_MULTIPLIERS.get(speed, FFP_DEFAULT_MULTIPLIER) for speed in np.ravel(fossil_fuel_phaseout).tolist()]
+    ).reshape(np.shape(fossil_fuel_phaseout))
+    db_multiplier = np.where(np.asarray(deforestation_ban, dtype=bool), DEFORESTATION_BAN_MULTIPLIER, 0.00)
+
+    return (
+        np.asarray(carbon_tax_rate, dtype=float) * 0.002 +      # Carbon tax reduces emissions
+        np.asarray(renewable_subsidy, dtype=float) * 0.001 +    # Renewable subsidies encourages clean energy
+        ffp_multiplier +                                        # The speed of fossil fuel phaseout matters
+        db_multiplier +                                         # Forests are carbon sinks
+        np.asarray(carbon_capture_randd, dtype=float) * 0.004   # Carbon capture technology helps remove CO2
+    )
+
+
+def policy_mitigation_factors(policies_list):
+    """
+    Purpose: Calculates the mitigation factors of a list of policy settings dictionaries.
+
+    Input:
+        - policies_list: A list of policy settings, as sent by the frontend.
+
+    Output: A float array with one mitigation factor per policy settings dictionary.
+    """
+    return mitigation_factors(
+        [p["carbonTaxRate"] for p in policies_list],
+        [p["renewableSubsidy"] for p in policies_list],
+        [p["fossilFuelPhaseout"] for p in policies_list],
+        [bool(p["deforestationBan"]) for p in policies_list],
+        [p["carbonCaptureRAndD"] for p in policies_list],
+    )
+
+
+def yearly_increases(mitigation, n_years):
+    """
+    Purpose: Calculates the yearly temperature increase of every policy once the policies take effect.
+    Policies become more effective over time (cumulative effect), up to MAX_MITIGATION_RATIO.
+
+    Inputs:
+        - mitigation: The mitigation factors, shape (k,).
+        - n_years: The number of simulated years.
+
+    Output: An array of shape (k, n_years). The first column is unused, as the first year has no increase.
+    """
+    mitigation = np.atleast_1d(np.asarray(mitigation, dtype=float))
+    steps = np.repeat((mitigation * MITIGATION_RAMP)[:, None], n_years, axis=1)
+    steps[:, 0] = 0.0
+    cumulative_miti = np.cumsum(steps, axis=1)
+    return DEFAULT_ANNUAL_INCREASE - np.minimum(DEFAULT_ANNUAL_INCREASE * MAX_MITIGATION_RATIO, cumulative_miti)
+
+
+def project_temperatures(base_temperatures, mitigation, n_years, rng=None, noise=None):
+    """
+    Purpose: Generates temperature trajectories for many policies at once.
+
+    For the first year the trajectory starts with the observed current temperature plus a random variation.
+    Every following year adds the yearly increase (reduced by the policy mitigation) and a new random variation.
+    Like project_temperature_loop, every year is rounded to 4 decimals before the next one is added to it, so
+    the years are computed one after the other, each for all policies at once. For the same random numbers the
+    result equals the loop's, except where np.round and round disagree on a value halfway between two
+    4-decimal numbers, which changes that year (and the ones after it) by 0.0001.
+
+    Inputs:
+        - base_temperatures: The current temperature at the location of each policy, scalar or shape (k,).
+        - mitigation: The mitigation factors, shape (k,).
+        - n_years: The number of simulated years.
+        - rng: The np.random.Generator to draw the random variation from (a new unseeded one if None).
+        - noise: Pre-drawn random variation of shape (k, n_years), used instead of rng.
+
+    Output: An array of shape (k, n_years) with the projected temperatures.
+    """
+    mitigation = np.atleast_1d(np.asarray(mitigation, dtype=float))
+    k = len(mitigation)
+    if n_years <= 0:
+        return np.zeros((k, 0))
+    if noise is None:
+        rng = rng if rng is not None else np.random.default_rng()
+        noise = rng.normal(0, NOISE_SD, size=(k, n_years))
+
+    increases = yearly_increases(mitigation, n_years)
+    base = np.broadcast_to(np.asarray(base_temperatures, dtype=float), (k,))
+
+    # (previous + increase) + noise, rounded, in the same order as the loop
+    temperatures = np.empty((k, n_years))
+    temperatures[:, 0] = np.round(base + noise[:, 0], 4)
+    for i in range(1, n_years):
+        temperatures[:, i] = np.round(temperatures[:, i - 1] + increases[:, i] + noise[:, i], 4)
+    return temperatures
+
+
+def project_temperature_loop(base_temperature, mitigation, n_years, rng):
+    """
+    Purpose: Year-by-year reference implementation of project_temperatures for a single policy: the loop of the
+    original climate_api, including its rounding of every year. Kept for checking the vectorized engine and for
+    benchmarks.
+
+    Output: A list with the projected temperature of every year.
+    """
+    temperature_traj = []
+    cumulative_miti = 0
+    for i in range(n_years):
+        if i > 0:
+            cumulative_miti += mitigation * MITIGATION_RAMP
+        year_increase = DEFAULT_ANNUAL_INCREASE - min(DEFAULT_ANNUAL_INCREASE * MAX_MITIGATION_RATIO, cumulative_miti)
+        random_variation = rng.normal(0, NOISE_SD)
+        if i == 0:
+            temp = base_temperature + random_variation
+        else:
+            temp = temperature_traj[-1] + year_increase + random_variation
+        temperature_traj.append(round(temp, 4))
+    return temperature_traj
+
+
+def climate_trajectories(start_year, end_year, base_temperatures, policies_list, rng=None):
+    """
+    Purpose: Projects the temperature trajectories of many policy settings over the same years.
+
+    Inputs:
+        - start_year: The starting year for the simulation.
+        - end_year: The ending year for the simulation.
+        - base_temperatures: The current temperature for each policy, scalar or shape (k,).
+        - policies_list: A list of k policy settings dictionaries.
+        - rng: The np.random.Generator to draw the random variation from.
+
+    Output:
+        A tuple (trajectories, years): an array of shape (k, n_years) and the list of years.
+    """
+    years = list(range(start_year, end_year + 1))
+    mitigation = policy_mitigation_factors(policies_list)
+    return project_temperatures(base_temperatures, mitigation, len(years), rng=rng), years
+
+
+def ensemble_bands(base_temperature, mitigation, n_years, size, rng=None, percentiles=(5, 50, 95)):
+    """
+    Purpose: Runs a Monte Carlo ensemble of trajectories for one policy and summarizes it per year.
+
+    All members share the same deterministic path (base temperature plus the mitigated yearly increases),
+    so only the accumulated random variation is simulated, as one (n_years x size) float32 matrix.
+    Percentiles use the nearest rank, found with a partial sort instead of a full one.
+
+    Inputs:
+        - base_temperature: The current temperature at the location.
+        - mitigation: The mitigation factor of the policy.
+        - n_years: The number of simulated years.
+        - size: The number of trajectories in the ensemble.
+        - rng: The np.random.Generator to draw the random variation from.
+        - percentiles: The percentiles to report.
+
+    Output: A dictionary with a "mean" array and one "p<percentile>" array per percentile, each of length n_years.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+
+    increases = yearly_increases([mitigation], n_years)[0]
+    increases[0] = 0.0
+    deterministic = base_temperature + np.cumsum(increases)
+
+    # Accumulated random variation of every member, one row per year
+    noise = rng.standard_normal(size=(n_years, size), dtype=np.float32)
+    noise *= np.float32(NOISE_SD)
+    np.cumsum(noise, axis=0, out=noise)
+
+    bands = {"mean": deterministic + noise.mean(axis=1, dtype=np.float64)}
+    ranks = [int(round(p / 100 * (size - 1))) for p in percentiles]
+    noise.partition(sorted(set(ranks)), axis=1)
+    for p, rank in zip(percentiles, ranks):
+        bands[f"p{p}"] = deterministic + noise[:, rank].astype(np.float64)
+    return bands
+
+
+def climate_ensemble(start_year, end_year, base_temperature, policies, size, step=1, rng=None):
+    """
+    Purpose: Projects the uncertainty band of a policy's temperature trajectory.
+
+    Inputs:
+        - start_year: The starting year for the simulation.
+        - end_year: The ending year for the simulation.
+        - base_temperature: The current temperature at the location.
+        - policies: The policy settings.
+        - size: The number of trajectories in the ensemble.
+        - step: Only every step-th year is returned (the last year is always included).
+        - rng: The np.random.Generator to draw the random variation from.
+
+    Output:
+        A dictionary with the ensemble size, the returned years and the mean/p5/p50/p95 temperature of each of them.
+    """
+    n_years = end_year - start_year + 1
+    if n_years <= 0:
+        return {"size": size, "years": [], "mean": [], "p5": [], "p50": [], "p95": []}
+
+    mitigation = policy_mitigation_factors([policies])[0]
+    bands = ensemble_bands(base_temperature, mitigation, n_years, size, rng=rng)
+
+    # Downsample the years
+    indices = np.arange(0, n_years, step)
+    if indices[-1] != n_years - 1:
+        indices = np.append(indices, n_years - 1)
+
+    results = {"size": size, "years": (start_year + indices).tolist()}
+    for name, values in bands.items():
+        results[name] = np.round(values[indices], 4).tolist()
+    return results
@@ -0,0 +1,71 @@
+import numpy as np
+import orjson
+from flask.json.provider import DefaultJSONProvider
+from metrics import span
+
+# JSON encoding with orjson, which serializes dictionaries, lists and NumPy arrays natively instead of walking them in
+# Python. Keys are sorted and non-string keys allowed, like the json module under Flask's default provider. Unlike it,
+# NaN and infinite floats (e.g. empty CPDB cells) become null, so the output is always valid JSON for the browser.
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+
+
+def json_default(value):
+    """
+    Purpose: Serializes the values orjson does not handle itself, the same way Flask's default provider does.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    return DefaultJSONProvider.default(value)
+
+
+def dumps(obj):
+    """
+    Purpose: Serializes a value to JSON.
+
+    Output: The UTF-8 encoded JSON document.
+    """
+    return orjson.dumps(obj, default=json_default, option=OPTIONS)
+
+
+def dataframe_records(df):
+    """
+    Purpose: Converts a DataFrame into a list of row dictionaries. Faster than df.to_dict(orient="records"),
+    as every column is converted to Python values in one call.
+    """
+    columns = [str(column) for column in df.columns]
+    values = [df[column].tolist() for column in df.columns]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Purpose: Flask JSON provider backed by orjson, used by jsonify, request.get_json and app.json.
+    Calls with options orjson does not support (e.g. indent) and values it cannot encode (e.g. integers
+    beyond 64 bits) go through the default provider.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if set(kwargs) - {"separators"}:
+            return super().dumps(obj, **kwargs)
+        try:
+            return dumps(obj).decode("utf-8")
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = OPTIONS
+        # Indented in debug mode, like the default provider
+        if self.compact is False or (self.compact is None and self._app.debug):
+            option |= orjson.OPT_INDENT_2
+        try:
+            with span("serialization"):
+                body = orjson.dumps(obj, default=json_default, option=option) + b"\n"
+        except TypeError:
+            return super().response(obj)
+        return self._app.response_class(body, mimetype=self.mimetype)
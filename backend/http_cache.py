@@ -0,0 +1,249 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from cachetools import LRUCache
+
+# Brotli is preferred when installed; without it responses are negotiated down to gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Caching of serialized API responses. CPDB data only changes when a new snapshot is loaded, so responses derived
+# from it are identified by the snapshot fingerprint plus the normalized request, and can be revalidated with
+# If-None-Match (answered with 304 Not Modified) or served again from memory without serializing them again.
+
+# How long browsers and proxies may reuse a response without revalidating it (seconds)
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", 300))
+
+# Total size of the serialized bodies kept in memory (bytes)
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Bodies smaller than this are not worth compressing (bytes)
+GZIP_MIN_SIZE = 1024
+
+# Compression levels of responses compressed per request. Cached bodies are compressed once, so they use the
+# stronger CACHED_BROTLI_QUALITY.
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 5))
+CACHED_BROTLI_QUALITY = 9
+
+# Content codings the server can produce, in order of preference
+CONTENT_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Response types worth compressing
+COMPRESSIBLE_MIMETYPES = {"application/json", "application/x-ndjson", "text/event-stream"}
+
+
+def compress(body, encoding, brotli_quality=BROTLI_QUALITY):
+    """
+    Purpose: Compresses a response body with one of the CONTENT_ENCODINGS.
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class StreamCompressor:
+    """
+    Purpose: Compresses a streamed response chunk by chunk. Every chunk is flushed, so a client can decode each
+    line of an NDJSON stream as soon as it arrives.
+
+    Input:
+        - encoding: One of the CONTENT_ENCODINGS.
+    """
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, chunk):
+        if self.encoding == "br":
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+    def stream(self, chunks):
+        """
+        Purpose: Compresses an iterable of chunks (str or bytes).
+
+        Output: A generator of compressed chunks.
+        """
+        for chunk in chunks:
+            data = self.compress(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield self.finish()
+
+
+class CachedBody:
+    """
+    Purpose: A serialized response body, with its compressed versions and the headers that go with it.
+
+    Attributes:
+        - etag: The entity tag of the body (without quotes).
+        - body: The uncompressed body.
+        - encoded: A dictionary mapping each content coding to the compressed body. Empty if the body is too
+                   small to be worth compressing.
+        - mimetype: The content type of the body.
+        - headers: Extra response headers, e.g. {"X-Total-Count": "42"}.
+        - expires_at: The time.time() after which the entry is not served anymore, or None.
+    """
+    __slots__ = ("etag", "body", "encoded", "mimetype", "headers", "expires_at")
+
+    def __init__(self, etag, body, mimetype, headers=None, ttl=None):
+        self.etag = etag
+        self.body = body
+        self.encoded = {}
+        if len(body) >= GZIP_MIN_SIZE:
+            for encoding in CONTENT_ENCODINGS:
+                self.encoded[encoding] = compress(body, encoding, CACHED_BROTLI_QUALITY)
+        self.mimetype = mimetype
+        self.headers = dict(headers or {})
+        self.expires_at = time.time() + ttl if ttl is not None else None
+
+    def size(self):
+        return len(self.body) + sum(len(encoded) for encoded in self.encoded.values())
+
+    def select(self, accept_encoding):
+        """
+        Purpose: Picks the representation for a client.
+
+        Input:
+            - accept_encoding: The Accept-Encoding request header (may be None).
+
+        Output: A tuple (body, content_encoding), where content_encoding is None for the uncompressed body.
+        """
+        encoding = negotiate_encoding(accept_encoding, tuple(self.encoded))
+        if encoding is None:
+            return self.body, None
+        return self.encoded[encoding], encoding
+
+
+class ResponseCache:
+    """
+    Purpose: A thread-safe LRU of CachedBody entries, bounded by the total size of the bodies.
+
+    Input:
+        - max_bytes: The total size of the bodies kept in memory.
+    """
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self._entries = LRUCache(maxsize=max_bytes, getsizeof=lambda entry: entry.size())
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Purpose: Returns the live entry for key, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or (entry.expires_at is not None and entry.expires_at < time.time()):
+            return None
+        return entry
+
+    def put(self, key, etag, body, mimetype, headers=None, ttl=None):
+        """
+        Purpose: Compresses and stores a body. Bodies larger than the whole cache are not stored.
+
+        Output: The CachedBody.
+        """
+        entry = CachedBody(etag, body, mimetype, headers, ttl)
+        with self._lock:
+            try:
+                self._entries[key] = entry
+            except ValueError:
+                pass
+        return entry
+
+
+def request_etag(fingerprint, key):
+    """
+    Purpose: Builds the entity tag of a response derived from a CPDB snapshot.
+
+    Inputs:
+        - fingerprint: The fingerprint of the snapshot the response was built from.
+        - key: The normalized request, any JSON-serializable value.
+
+    Output: The entity tag (without quotes).
+    """
+    digest = hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+    return f"{fingerprint}-{digest}"
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Purpose: Checks an If-None-Match request header against an entity tag, using the weak comparison of RFC 9110.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag:
+            return True
+    return False
+
+
+def negotiate_encoding(accept_encoding, available=CONTENT_ENCODINGS):
+    """
+    Purpose: Picks the content coding for a client from its Accept-Encoding request header.
+    The coding with the highest quality value wins; on a tie the earlier one in available does.
+
+    Inputs:
+        - accept_encoding: The Accept-Encoding request header (may be None).
+        - available: The content codings to choose from, in order of preference.
+
+    Output: The chosen content coding, or None to send the body uncompressed.
+    """
+    if not accept_encoding or not available:
+        return None
+    qualities = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def cache_headers(etag, max_age=HTTP_CACHE_MAX_AGE):
+    """
+    Purpose: The validator and freshness headers of a cacheable response.
+
+    Output: A dictionary of response headers.
+    """
+    return {
+        "ETag": f'W/"{etag}"',
+        "Cache-Control": f"public, max-age={max_age}",
+        "Vary": "Accept-Encoding",
+    }
+
+
+# Shared cache of the CPDB-derived responses
+response_cache = ResponseCache()
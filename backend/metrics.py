@@ -0,0 +1,267 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency and error metrics, exported in the Prometheus text format on /metrics. Every stage of a request (CPDB
+# download, policy filter, geocoding, weather, each Gemini call, scoring, trajectory, serialization) is timed into
+# one histogram, and upstream failures and fallback values are counted. Metrics are kept per worker process.
+
+# Send the stage timings of each request in a Server-Timing header (they reveal which upstream calls were made)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+
+# Histogram buckets (seconds), up to the LLM timeout
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0)
+
+# Stage timings of the current request, as (stage, milliseconds), or None outside a request or without SERVER_TIMING
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+
+# Fallbacks used by the current simulation, as (stage, reason), or None outside a simulation
+_simulation_fallbacks = contextvars.ContextVar("simulation_fallbacks", default=None)
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """
+    Purpose: A Prometheus counter with labels.
+
+    Input:
+        - name: The metric name.
+        - documentation: The HELP text.
+        - labelnames: The label names; inc() takes their values as keyword arguments.
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Purpose: A Prometheus histogram with labels.
+
+    Input:
+        - name: The metric name.
+        - documentation: The HELP text.
+        - labelnames: The label names; observe() takes their values as keyword arguments.
+        - buckets: The upper bounds of the buckets, in increasing order (+Inf is added).
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket, then the sum
+                counts = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            counts[-1] += value
+
+    def count(self, **labels):
+        counts = self._values.get(tuple(str(labels[name]) for name in self.labelnames))
+        return sum(counts[:-1]) if counts else 0
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = sorted((key, list(counts)) for key, counts in self._values.items())
+        for key, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = format_labels(self.labelnames, key, [("le", format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REGISTRY = []
+
+STAGE_SECONDS = Histogram(
+    "policysim_stage_seconds", "Time spent in each stage of a request.", ["stage"]
+)
+STAGE_ERRORS = Counter(
+    "policysim_stage_errors_total", "Stages that raised an exception, e.g. failed upstream requests.", ["stage"]
+)
+FALLBACKS = Counter(
+    "policysim_fallbacks_total",
+    "Results replaced by a fallback value, by stage and reason (error, timeout or circuit_open).",
+    ["stage", "reason"]
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "policysim_circuit_transitions_total", "Circuit breaker state changes, by upstream and new state.",
+    ["upstream", "state"]
+)
+REQUEST_SECONDS = Histogram(
+    "policysim_request_seconds", "Time to the response of each route.", ["route"]
+)
+REQUESTS = Counter(
+    "policysim_requests_total", "Requests served, by route, method and status code.", ["route", "method", "status"]
+)
+
+
+def observe_stage(stage, seconds):
+    """
+    Purpose: Records how long a stage took, in its histogram and in the Server-Timing of the current request.
+    """
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds * 1000))
+
+
+@contextmanager
+def span(stage):
+    """
+    Purpose: Times the enclosed block as a stage. An exception raised in it is counted and re-raised.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def count_fallback(stage, reason):
+    """
+    Purpose: Counts a stage whose result was replaced by its fallback value.
+
+    Inputs:
+        - stage: The stage, e.g. "weather" or "aiComment".
+        - reason: "error" if the stage failed, "timeout" if it did not finish in time, "circuit_open" if its
+          upstream was not called because its circuit breaker is open.
+    """
+    FALLBACKS.inc(stage=stage, reason=reason)
+    fallbacks = _simulation_fallbacks.get()
+    if fallbacks is not None:
+        fallbacks.append((stage, reason))
+
+
+def track_fallbacks():
+    """
+    Purpose: Starts recording the fallbacks used by the current simulation, so results built from them are not
+    stored. Fallbacks on other threads are included when they are started with contextvars.copy_context().
+
+    Output: The list that count_fallback appends (stage, reason) pairs to.
+    """
+    fallbacks = []
+    _simulation_fallbacks.set(fallbacks)
+    return fallbacks
+
+
+def record_fallbacks(fallbacks):
+    """
+    Purpose: Adds fallbacks recorded elsewhere (e.g. by an upstream request shared with other simulations) to
+    the current simulation, without counting them again in the metrics.
+    """
+    current = _simulation_fallbacks.get()
+    if current is not None and current is not fallbacks:
+        current.extend(fallbacks)
+
+
+def count_circuit_transition(upstream, state):
+    """
+    Purpose: Counts a circuit breaker changing state ("open", "half_open" or "closed").
+    """
+    CIRCUIT_TRANSITIONS.inc(upstream=upstream, state=state)
+
+
+def observe_request(route, method, status, seconds):
+    """
+    Purpose: Records a served request.
+    """
+    REQUEST_SECONDS.observe(seconds, route=route)
+    REQUESTS.inc(route=route, method=method, status=status)
+
+
+def start_request_spans():
+    """
+    Purpose: Starts collecting the stage timings of the current request for its Server-Timing header, if enabled.
+    Stages run on other threads are included when they are started with contextvars.copy_context().
+
+    Output: The context token, to pass to finish_request_spans, or None.
+    """
+    if not SERVER_TIMING:
+        return None
+    return _request_spans.set([])
+
+
+def finish_request_spans(token, total_seconds):
+    """
+    Purpose: Stops collecting the stage timings of the current request.
+
+    Output: The value of its Server-Timing header, or None if SERVER_TIMING is off.
+    """
+    if token is None:
+        return None
+    spans = _request_spans.get()
+    _request_spans.reset(token)
+    entries = [f"{stage};dur={milliseconds:.1f}" for stage, milliseconds in spans]
+    entries.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def exposition():
+    """
+    Purpose: Renders every metric in the Prometheus text format (version 0.0.4).
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,275 @@
+import os
+import numpy as np
+from climate_model import mitigation_factors
+from scoring import LEVER_BOUNDS, LEVER_CHOICES, POLICY_LEVERS, determine_badge, score_policies
+from sweep import end_temperatures
+
+# Search for policy settings that meet score targets with the least economic pressure.
+# Candidates are rows of a (k x 10) matrix with one column per lever in POLICY_LEVERS order. Numeric levers hold
+# their value (whole numbers, like the sliders of the simulator) and categorical levers the index of their option,
+# which is ordered from weakest to strongest, so the same clipping and perturbation work for every column.
+
+# Random candidates per combination of the categorical options in the first round
+OPTIMIZE_SAMPLES = int(os.getenv("OPTIMIZE_SAMPLES", 2048))
+
+# Refinement rounds around the best candidates, and how many candidates are refined per round
+OPTIMIZE_ROUNDS = 4
+OPTIMIZE_ELITE = 256
+OPTIMIZE_CHILDREN = 16
+
+# Largest number of configurations returned
+OPTIMIZE_MAX_RESULTS = 100
+
+# The metrics targets can be set on. temperatureIncrease is the rise of the mean trajectory over the simulated period.
+TARGET_METRICS = ["carbonScore", "justiceScore", "economicPressure", "temperatureIncrease"]
+
+# Lower and upper bound of every column
+LOWER = np.array([LEVER_BOUNDS[l][0] if l in LEVER_BOUNDS else 0 for l in POLICY_LEVERS], dtype=float)
+UPPER = np.array([LEVER_BOUNDS[l][1] if l in LEVER_BOUNDS else len(LEVER_CHOICES[l]) - 1 for l in POLICY_LEVERS], dtype=float)
+
+
+def parse_targets(targets):
+    """
+    Purpose: Validates the targets, e.g. {"carbonScore": {"min": 85}, "economicPressure": {"max": 50}}.
+
+    Output: A dictionary mapping each metric to a (low, high) pair, with -inf/inf for a missing side.
+    """
+    if targets is None:
+        return {}
+    if not isinstance(targets, dict):
+        raise ValueError("targets must be an object")
+    bounds = {}
+    for metric, target in targets.items():
+        if metric not in TARGET_METRICS:
+            raise ValueError(f"Unknown target: {metric}. Targets can be set on {', '.join(TARGET_METRICS)}")
+        if not isinstance(target, dict) or not set(target) <= {"min", "max"}:
+            raise ValueError(f'{metric} target must be an object with "min" and/or "max"')
+        low, high = target.get("min", -np.inf), target.get("max", np.inf)
+        if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (low, high)):
+            raise ValueError(f"{metric} target limits must be numbers")
+        bounds[metric] = (low, high)
+    return bounds
+
+
+def fixed_columns(fixed):
+    """
+    Purpose: Turns the levers the caller wants to keep at a given setting into column values.
+
+    Output: A dictionary mapping column positions to their value.
+    """
+    if fixed is None:
+        return {}
+    if not isinstance(fixed, dict):
+        raise ValueError("fixed must be an object")
+    columns = {}
+    for lever, value in fixed.items():
+        if lever not in POLICY_LEVERS:
+            raise ValueError(f"Unknown policy lever: {lever}")
+        if lever in LEVER_CHOICES:
+            if value not in LEVER_CHOICES[lever]:
+                raise ValueError(f"{lever} must be one of {LEVER_CHOICES[lever]}")
+            value = LEVER_CHOICES[lever].index(value)
+        else:
+            low, high = LEVER_BOUNDS[lever]
+            if not isinstance(value, (int, float)) or isinstance(value, bool) or not low <= value <= high:
+                raise ValueError(f"{lever} must be a number between {low} and {high}")
+        columns[POLICY_LEVERS.index(lever)] = float(value)
+    return columns
+
+
+def candidate_levers(candidates):
+    """
+    Purpose: Converts a candidate matrix into the lever arrays expected by score_policies.
+    """
+    levers = {}
+    for column, lever in enumerate(POLICY_LEVERS):
+        if lever in LEVER_CHOICES:
+            options = np.array(LEVER_CHOICES[lever], dtype=object)
+            levers[lever] = options[candidates[:, column].astype(int)]
+        else:
+            levers[lever] = candidates[:, column]
+    return levers
+
+
+def evaluate_candidates(candidates, n_years):
+    """
+    Purpose: Scores every candidate. Makes no network calls.
+
+    Inputs:
+        - candidates: A (k x 10) candidate matrix.
+        - n_years: The number of simulated years, for the temperature increase.
+
+    Output: A dictionary mapping each TARGET_METRICS name to an array of length k.
+    """
+    levers = candidate_levers(candidates)
+    carbon_score, economic_pressure, justice_score = score_policies(levers)
+    mitigation = mitigation_factors(
+        levers["carbonTaxRate"], levers["renewableSubsidy"], levers["fossilFuelPhaseout"],
+        levers["deforestationBan"].astype(bool), levers["carbonCaptureRAndD"]
+    )
+    return {
+        "carbonScore": carbon_score,
+        "justiceScore": justice_score,
+        "economicPressure": economic_pressure,
+        "temperatureIncrease": end_temperatures(0.0, mitigation, n_years),
+    }
+
+
+def target_violation(metrics, bounds):
+    """
+    Purpose: Measures how far every candidate is from meeting the targets (0 when it meets all of them).
+    """
+    violation = np.zeros(len(metrics["carbonScore"]))
+    for metric, (low, high) in bounds.items():
+        values = metrics[metric]
+        violation += np.maximum(low - values, 0) + np.maximum(values - high, 0)
+    return violation
+
+
+def pareto_front(objectives):
+    """
+    Purpose: Finds the non-dominated rows of an objectives matrix, where every objective is minimized.
+    Rows are visited in lexicographic order, so a row can only be dominated by one visited before it.
+
+    Input:
+        - objectives: A (k x m) float array.
+
+    Output: The positions of the non-dominated rows, in lexicographic order of their objectives.
+    """
+    order = np.lexsort(objectives.T[::-1])
+    sorted_objectives = objectives[order]
+    keep = np.ones(len(order), dtype=bool)
+    for i in range(len(order)):
+        if not keep[i]:
+            continue
+        rest = sorted_objectives[i + 1:]
+        dominated = np.all(sorted_objectives[i] <= rest, axis=1) & np.any(sorted_objectives[i] < rest, axis=1)
+        keep[i + 1:] &= ~dominated
+    return order[keep]
+
+
+def sample_candidates(rng, size, fixed):
+    """
+    Purpose: Draws random candidates for every combination of the categorical options.
+    A quarter of the numeric values is put on each bound, as the scores are linear in the levers and optima sit on bounds.
+    """
+    combos = np.array(np.meshgrid(*[np.arange(len(LEVER_CHOICES[l])) for l in LEVER_CHOICES], indexing="ij")).reshape(len(LEVER_CHOICES), -1).T
+    candidates = rng.integers(LOWER, UPPER + 1, size=(len(combos) * size, len(POLICY_LEVERS))).astype(float)
+    pick = rng.random(candidates.shape)
+    candidates = np.where(pick < 0.25, LOWER, np.where(pick > 0.75, UPPER, candidates))
+    for i, lever in enumerate(LEVER_CHOICES):
+        candidates[:, POLICY_LEVERS.index(lever)] = np.repeat(combos[:, i], size)
+    return apply_fixed(candidates, fixed)
+
+
+def perturb_candidates(rng, parents, scale, fixed):
+    """
+    Purpose: Creates OPTIMIZE_CHILDREN neighbours of every parent by moving each lever by up to scale of its range.
+    """
+    children = np.repeat(parents, OPTIMIZE_CHILDREN, axis=0)
+    reach = np.maximum(np.round((UPPER - LOWER) * scale), 1)
+    children += np.round(rng.uniform(-reach, reach, size=children.shape))
+    return apply_fixed(np.clip(children, LOWER, UPPER), fixed)
+
+
+def apply_fixed(candidates, fixed):
+    for column, value in fixed.items():
+        candidates[:, column] = value
+    return candidates
+
+
+def candidate_policies(row):
+    """
+    Purpose: Converts one candidate row into a policy settings dictionary, as sent by the frontend.
+    """
+    policies = {}
+    for column, lever in enumerate(POLICY_LEVERS):
+        value = row[column]
+        if lever in LEVER_CHOICES:
+            policies[lever] = LEVER_CHOICES[lever][int(value)]
+        else:
+            policies[lever] = int(value) if float(value).is_integer() else float(value)
+    return policies
+
+
+def optimize_policies(targets=None, fixed=None, start_year=2020, end_year=2100, max_results=20, seed=None):
+    """
+    Purpose: Searches the bounded lever space for the settings that meet the targets with the lowest economic pressure.
+
+    The search starts from random candidates for every combination of the categorical options and then repeatedly
+    refines the best ones with smaller and smaller moves. The configurations that meet the targets are reduced to their
+    Pareto front over (economicPressure, carbonScore, justiceScore, temperatureIncrease), sorted by economic pressure.
+
+    Inputs:
+        - targets: The targets, e.g. {"carbonScore": {"min": 85}, "justiceScore": {"min": 85}, "economicPressure": {"max": 50}}.
+        - fixed: Levers to keep at a given setting, e.g. {"fossilFuelPhaseout": "medium"}.
+        - start_year, end_year: The simulated period, for the temperature increase.
+        - max_results: The number of configurations returned.
+        - seed: Seed for the random search, for reproducible results.
+
+    Output:
+        A dictionary with "feasible" (whether any configuration meets the targets), the number of configurations
+        evaluated, the size of the front and the best configurations with their scores. If nothing meets the targets,
+        the configurations closest to them are returned instead, with their "violation".
+    """
+    bounds = parse_targets(targets)
+    fixed = fixed_columns(fixed)
+    n_years = end_year - start_year + 1
+    if n_years < 1:
+        raise ValueError("endYear must not be before startYear")
+    if not isinstance(max_results, int) or isinstance(max_results, bool) or not 1 <= max_results <= OPTIMIZE_MAX_RESULTS:
+        raise ValueError(f"maxResults must be an integer between 1 and {OPTIMIZE_MAX_RESULTS}")
+
+    rng = np.random.default_rng(seed)
+    pool = np.empty((0, len(POLICY_LEVERS)))
+    candidates = sample_candidates(rng, OPTIMIZE_SAMPLES, fixed)
+    for round_number in range(OPTIMIZE_ROUNDS + 1):
+        pool = np.unique(np.concatenate([pool, candidates]), axis=0)
+        metrics = evaluate_candidates(pool, n_years)
+        violation = target_violation(metrics, bounds)
+
+        # Closest to the targets first, then the lowest pressure
+        ranking = np.lexsort((metrics["temperatureIncrease"], metrics["economicPressure"], violation))
+        if round_number < OPTIMIZE_ROUNDS:
+            candidates = perturb_candidates(rng, pool[ranking[:OPTIMIZE_ELITE]], 0.2 / 2 ** round_number, fixed)
+
+    feasible = np.flatnonzero(violation == 0)
+    if len(feasible):
+        objectives = np.column_stack([
+            metrics["economicPressure"][feasible],
+            -metrics["carbonScore"][feasible],
+            -metrics["justiceScore"][feasible],
+            metrics["temperatureIncrease"][feasible],
+        ]).round(6)
+        # Among configurations with the same scores, keep the one with the lightest settings
+        lightness = ((pool[feasible] - LOWER) / (UPPER - LOWER)).sum(axis=1)
+        by_lightness = np.argsort(lightness, kind="stable")
+        _, first = np.unique(objectives[by_lightness], axis=0, return_index=True)
+        distinct = by_lightness[first]
+        front = distinct[pareto_front(objectives[distinct])]
+        selected = feasible[front]
+    else:
+        selected = ranking
+
+    results = []
+    for position in selected[:max_results].tolist():
+        carbon_score = float(metrics["carbonScore"][position])
+        justice_score = float(metrics["justiceScore"][position])
+        result = {
+            "policies": candidate_policies(pool[position]),
+            "carbonScore": round(carbon_score, 2),
+            "justiceScore": round(justice_score, 2),
+            "economicPressure": round(float(metrics["economicPressure"][position]), 2),
+            "temperatureIncrease": round(float(metrics["temperatureIncrease"][position]), 4),
+            "badge": determine_badge(carbon_score, justice_score),
+        }
+        if not len(feasible):
+            result["violation"] = round(float(violation[position]), 4)
+        results.append(result)
+
+    return {
+        "feasible": bool(len(feasible)),
+        "evaluated": len(pool),
+        "frontSize": len(selected) if len(feasible) else 0,
+        "results": results,
+    }
@@ -0,0 +1,304 @@
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from cache import MISSING, DiskCache, TieredCache
+from simulation_logic import handle_simulation
+
+# Not available on Windows, where every worker process runs the job itself
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Materialized simulation results of the CPDB policies.
+# The simulation input of a policy is a pure function of its CPDB row, so its results are computed once, in the
+# background after every snapshot swap (or offline with `python policy_results.py`), and stored under the policy id
+# and a hash of its row. The detail endpoint then only looks them up. After a refresh only the new and changed
+# policies have a new key, so only they are recomputed.
+
+# How long a stored result is used (seconds). The key already changes with the policy, so this only bounds how
+# old the live temperature and the AI analysis in it can get.
+POLICY_RESULT_TTL = int(os.getenv("POLICY_RESULT_TTL", 7 * 24 * 60 * 60))
+
+# Compute the results of every policy in the background whenever a new snapshot is loaded
+PRECOMPUTE_POLICIES = os.getenv("PRECOMPUTE_POLICIES", "1") == "1"
+
+# Policies simulated at the same time by the background job. Each simulation waits on the weather API and Gemini.
+PRECOMPUTE_WORKERS = int(os.getenv("PRECOMPUTE_WORKERS", 4))
+
+# Lock file, so that only one worker process on the machine runs the job; the others read its results from SQLite
+PRECOMPUTE_LOCK_PATH = os.getenv(
+    "PRECOMPUTE_LOCK_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "precompute.lock")
+)
+
+result_cache = TieredCache(DiskCache("policy_results"), maxsize=4096)
+
+
+def policy_year(value):
+    """
+    Purpose: Reads a year from a CPDB date column, where a missing date is None or NaN.
+
+    Output: The year as an int, or None if the date is missing or not a year.
+    """
+    # Imported here like in policy_store.row_hashes; pandas is loaded with the snapshot anyway
+    import pandas as pd
+    if value is None or value == "" or pd.isna(value):
+        return None
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def policy_simulation_input(policy_data):
+    """
+    Purpose: Builds the simulation input of a CPDB policy, deriving the policy settings from its description,
+    sector and instrument.
+
+    Input:
+        - policy_data: A dictionary with the CPDB fields of the policy.
+
+    Output: A simulation input in the format accepted by handle_simulation. The seed is derived from the policy id,
+            so a policy always gets the same trajectory for the same temperature.
+    """
+    # Create input data structure for handle_simulation
+    # Dynamically set policy simulation parameters based on policy data
+    description = str(policy_data.get("description", "")).lower()
+    sector = str(policy_data.get("sector", "")).lower()
+    policy_instrument = str(policy_data.get("policy_instrument", "")).lower()
+
+    # Example of more dynamic/conditional logic for simulation parameters
+    carbon_tax_rate = 50 if "carbon tax" in description else 20
+    renewable_subsidy = 70 if "renewable" in sector else 30
+    fossil_fuel_phaseout = "fast" if "phase out" in description else "medium"
+    deforestation_ban = True
+    education_campaigns = 80 if "education" in policy_instrument or "education" in description else 50
+    green_jobs_initiative = 10 if "jobs" in description or "employment" in description else 5
+    industry_regulations = "high" if "regulation" in policy_instrument else "medium"
+    justice_lens_strength = 80 if "justice" in description else 60
+    adaptation_investment = 10 if ("adaptation" in sector or "adaptation" in description) else 5
+    carbon_capture_randd = 8 if "carbon capture" in description else 3
+
+    sy = policy_year(policy_data.get("start_date"))
+    if sy is None:
+        sy = policy_year(policy_data.get("decision_date"))
+    if sy is None:
+        sy = 2000
+    end_year = policy_year(policy_data.get("end_date"))
+    if end_year is None or end_year < sy:
+        end_year = 2100
+
+
+    input_data = {
+        "policyName": policy_data.get("policy_name", ""),
+        "description": policy_data.get("policy_description", ""),
+        # "policy_status": policy_data.get("policy_status", "None"),
+        # "policy_type": policy_data.get("policy_type", "None"),
+        # "policy_instrument": policy_data.get("policy_instrument", "None"),
+        # "sector": policy_data.get("sector", "None"),
+        "location": policy_data.get("country", "Global"),
+        "startYear":sy,
+        "endYear": end_year,
+        "seed": zlib.crc32(str(policy_data.get("policy_id", "")).encode("utf-8")),
+        "policies": {
+        "carbonTaxRate": carbon_tax_rate,
+        "renewableSubsidy": renewable_subsidy,
+        "fossilFuelPhaseout": fossil_fuel_phaseout,
+        "deforestationBan": deforestation_ban,
+        "educationCampaigns": education_campaigns,
+        "greenJobsInitiative": green_jobs_initiative,
+        "industryRegulations": industry_regulations,
+        "justiceLensStrength": justice_lens_strength,
+        "adaptationInvestment": adaptation_investment,
+        "carbonCaptureRAndD": carbon_capture_randd
+        }
+    }
+    return input_data
+
+
+def row_version(snapshot, policy_id):
+    """
+    Purpose: Identifies the version of a policy's CPDB row: the hash of the row, or the snapshot fingerprint if the
+    rows could not be hashed.
+
+    Output: A hex string.
+    """
+    position = snapshot.id_index.get(str(policy_id))
+    if position is None or snapshot.row_hashes is None:
+        return snapshot.fingerprint
+    return f"{int(snapshot.row_hashes[position]):016x}"
+
+
+def result_key(snapshot, policy_id):
+    """
+    Purpose: The key of a policy's stored results: its id and the version of its row.
+    """
+    return f"{policy_id}:{row_version(snapshot, policy_id)}"
+
+
+def cacheable_result(results):
+    """
+    Purpose: Checks whether simulation results are worth storing. Results that used a fallback value, because an
+    upstream API failed, was too slow or its circuit breaker was open, are not, so the policy is simulated again on
+    its next request instead of serving the fallback for POLICY_RESULT_TTL.
+    """
+    timings = results.get("timings", {}).values()
+    return "error" not in results and "timeout" not in timings and "fallback" not in timings
+
+
+def store_result(snapshot, policy_id, results):
+    """
+    Purpose: Stores the simulation results of a policy, if they are worth storing.
+    """
+    if cacheable_result(results):
+        result_cache.set(result_key(snapshot, policy_id), results, POLICY_RESULT_TTL)
+
+
+def stored_result(snapshot, policy_id):
+    """
+    Purpose: Looks up the stored simulation results of a policy.
+
+    Output: The results, or None if they were not computed yet.
+    """
+    results = result_cache.get(result_key(snapshot, policy_id))
+    return None if results is MISSING else results
+
+
+def policy_result(snapshot, policy_id, policy_data=None):
+    """
+    Purpose: Returns the simulation results of a policy, computing and storing them if they were not computed yet.
+
+    Inputs:
+        - snapshot: The PolicySnapshot the policy is in.
+        - policy_id: The ID of the policy.
+        - policy_data: The CPDB fields of the policy, if already looked up.
+
+    Output: A dictionary containing the simulation results.
+    """
+    results = stored_result(snapshot, policy_id)
+    if results is not None:
+        return results
+    if policy_data is None:
+        policy_data = snapshot.get_policy(policy_id)
+    results = handle_simulation(policy_simulation_input(policy_data))
+    store_result(snapshot, policy_id, results)
+    return results
+
+
+class PolicyPrecomputer:
+    """
+    Purpose: Computes the results of every policy of a snapshot in the background. Policies that changed since the
+    previous snapshot go first; the others normally already have stored results and are skipped. A job stops as soon
+    as a newer snapshot is scheduled, whose job takes over.
+
+    Input:
+        - workers: The number of policies simulated at the same time.
+    """
+
+    def __init__(self, workers=PRECOMPUTE_WORKERS):
+        self.workers = workers
+        self._snapshot = None
+        self._thread = None
+        self._condition = threading.Condition()
+
+    def schedule(self, snapshot):
+        """
+        Purpose: Schedules the results of a snapshot to be computed. Can be registered as a PolicyStore listener.
+        """
+        with self._condition:
+            self._snapshot = snapshot
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="policy-precompute", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        done = None
+        while True:
+            with self._condition:
+                while self._snapshot is done:
+                    self._condition.wait()
+                snapshot = self._snapshot
+            lock = acquire_job_lock()
+            if lock is None:
+                # Another worker process computes the results
+                done = snapshot
+                continue
+            try:
+                self.run(snapshot, lambda: self._snapshot is not snapshot)
+            except Exception as e:
+                print(f"Precomputing the policy results failed: {e}")
+            finally:
+                lock.close()
+            done = snapshot
+
+    def compute(self, snapshot, policy_id):
+        """
+        Purpose: Computes the results of one policy. A policy that fails is logged and skipped, so one bad CPDB
+        row does not stop the job; it is simulated again on its first request.
+
+        Output: True if the policy was simulated, False if it failed.
+        """
+        try:
+            policy_result(snapshot, policy_id)
+            return True
+        except Exception as e:
+            print(f"Precomputing the results of policy {policy_id} failed: {e}")
+            return False
+
+    def run(self, snapshot, cancelled=lambda: False):
+        """
+        Purpose: Computes the missing results of a snapshot.
+
+        Inputs:
+            - snapshot: The PolicySnapshot.
+            - cancelled: A function returning True when the job should stop.
+
+        Output: The number of policies simulated.
+        """
+        changed = snapshot.changed_ids if snapshot.changed_ids is not None else set()
+        policy_ids = sorted(snapshot.id_index, key=lambda policy_id: policy_id not in changed)
+        missing = [policy_id for policy_id in policy_ids if stored_result(snapshot, policy_id) is None]
+        if not missing:
+            return 0
+
+        print(f"Precomputing the results of {len(missing)} policies")
+        computed = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for start in range(0, len(missing), self.workers):
+                if cancelled():
+                    break
+                batch = missing[start:start + self.workers]
+                computed += sum(pool.map(lambda policy_id: self.compute(snapshot, policy_id), batch))
+        print(f"Precomputed the results of {computed} policies")
+        return computed
+
+
+def acquire_job_lock():
+    """
+    Purpose: Takes the lock file of the precompute job without waiting.
+
+    Output: The open lock file, released by closing it, or None if another process holds it.
+    """
+    os.makedirs(os.path.dirname(PRECOMPUTE_LOCK_PATH), exist_ok=True)
+    lock = open(PRECOMPUTE_LOCK_PATH, "a")
+    if fcntl is None:
+        return lock
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return None
+    return lock
+
+
+# Shared background job
+precomputer = PolicyPrecomputer()
+
+
+if __name__ == "__main__":
+    # Offline precomputation: python policy_results.py
+    from policy_store import policy_store
+    precomputer.run(policy_store.snapshot())
@@ -0,0 +1,559 @@
+import hashlib
+import os
+import random
+import threading
+import time
+import numpy as np
+import pyarrow.feather as feather
+from metrics import count_fallback, span
+
+# How long a loaded CPDB snapshot is served before it is fetched again (seconds)
+CPDB_MAX_AGE = int(os.getenv("CPDB_MAX_AGE", 6 * 60 * 60))
+
+# How long to keep serving the old snapshot after a failed refresh before trying again (seconds)
+CPDB_RETRY_DELAY = int(os.getenv("CPDB_RETRY_DELAY", 60))
+
+# Refresh the snapshot on a background thread, so requests never wait for the CPDB download
+CPDB_BACKGROUND_REFRESH = os.getenv("CPDB_BACKGROUND_REFRESH", "1") == "1"
+
+# Random delay added to every scheduled background refresh (seconds). Worker processes started together then do not
+# all download the CPDB at once: the later ones pick up the local copy saved by the first.
+CPDB_REFRESH_JITTER = int(os.getenv("CPDB_REFRESH_JITTER", 60))
+
+# Local columnar (Arrow IPC / Feather v2) copy of the CPDB, read at startup instead of downloading it
+CPDB_SNAPSHOT_PATH = os.getenv(
+    "CPDB_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cpdb_snapshot.arrow")
+)
+
+# Query-string filters supported by /api/policies mapped to (CPDB column, multi-valued).
+# Multi-valued columns hold comma-separated lists such as "Buildings, Transport".
+FILTER_FIELDS = {
+    "country_iso": ("country_iso", False),
+    "decision_date": ("decision_date", False),
+    "policy_status": ("policy_status", False),
+    "sector": ("sector", True),
+    "policy_instrument": ("policy_instrument", True),
+    "mitigation_area": ("policy_type", True),
+}
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def normalize_filter_value(field, value):
+    """
+    Purpose: Normalizes a filter value so that lookups are case and whitespace insensitive, like the CPDB API.
+
+    Inputs:
+        - field: One of the FILTER_FIELDS keys.
+        - value: The raw value, either from a CPDB cell or from the query string.
+
+    Output: The normalized string, or "" if the value is empty.
+    """
+    if _is_missing(value):
+        return ""
+    if field == "decision_date":
+        # Years can arrive as 2015, 2015.0 or "2015"
+        try:
+            return str(int(float(value)))
+        except (TypeError, ValueError):
+            return ""
+    return str(value).strip().lower()
+
+
+def _cell_items(value, multi):
+    """
+    Purpose: Splits a CPDB cell into the raw values it should be indexed under.
+    """
+    if _is_missing(value):
+        return []
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return list(value)
+    if multi:
+        return str(value).split(",")
+    return [value]
+
+
+def _row_items(field, cell, multi):
+    """
+    Purpose: Parses a CPDB cell into the (normalized value, display label) pairs it is indexed under.
+    """
+    items = []
+    for item in _cell_items(cell, multi):
+        value = normalize_filter_value(field, item)
+        if value:
+            items.append((value, str(item).strip() if field != "decision_date" else value))
+    return tuple(items)
+
+
+def row_hashes(df):
+    """
+    Purpose: Hashes every row of a CPDB DataFrame, so snapshots can be compared row by row.
+
+    Output: An array with one uint64 per row, or None if some cells cannot be hashed (e.g. lists).
+    """
+    import pandas as pd
+    try:
+        return pd.util.hash_pandas_object(df, index=False).to_numpy()
+    except (TypeError, ValueError):
+        return None
+
+
+def snapshot_fingerprint(df, hashes, version, loaded_at):
+    """
+    Purpose: Computes a short digest of the contents of a CPDB DataFrame.
+    Without row hashes it falls back to the load version and time, which are only unique per process.
+
+    Output: A hex string.
+    """
+    digest = hashlib.sha1(",".join(map(str, df.columns)).encode("utf-8"))
+    if hashes is not None:
+        digest.update(hashes.tobytes())
+    else:
+        digest.update(f"{version}-{loaded_at}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class PolicySnapshot:
+    """
+    Purpose: An immutable view of the CPDB at one point in time.
+
+    Attributes:
+        - df: The full CPDB DataFrame as returned by cpdb_api.
+        - id_index: A dictionary mapping policy_id (as a string) to its row position in df.
+        - filter_index: For every FILTER_FIELDS key, a dictionary mapping a normalized value to a
+                        boolean bitmap (one entry per row) of the policies that have that value.
+        - facets: For every FILTER_FIELDS key, a tuple (values, labels, matrix, counts) with the distinct
+                  normalized values, their display labels, their bitmaps and their unfiltered counts.
+        - country_names: A dictionary mapping a normalized country_iso to the country name.
+        - version: A number that increases every time a new snapshot is loaded.
+        - loaded_at: The time.time() at which the snapshot was loaded.
+        - row_hashes: One uint64 hash per row, or None if the rows could not be hashed.
+        - fingerprint: A digest of the snapshot's contents. Unlike version, it is the same in every worker
+                       process that loaded the same data, so it can be used in HTTP validators (ETags).
+        - row_items: For every FILTER_FIELDS key, the parsed (value, label) pairs of every row.
+        - changed_ids: The policy ids that are new or changed since the previous snapshot, or None if there
+                       was no previous snapshot to compare with (every policy is new).
+        - removed_ids: The policy ids of the previous snapshot that are gone.
+    """
+    __slots__ = (
+        "df", "id_index", "filter_index", "facets", "country_names", "version", "loaded_at", "row_hashes",
+        "fingerprint", "row_items", "changed_ids", "removed_ids"
+    )
+
+    def __init__(self, df, version, loaded_at=None, previous=None):
+        self.df = df
+        self.version = version
+        self.loaded_at = loaded_at if loaded_at is not None else time.time()
+        self.row_hashes = row_hashes(df)
+        self.fingerprint = snapshot_fingerprint(df, self.row_hashes, version, self.loaded_at)
+
+        # Hash index on policy_id. The first occurrence wins, which matches the old iloc[0] lookup.
+        self.id_index = {}
+        if "policy_id" in df.columns:
+            for position, policy_id in enumerate(df["policy_id"].tolist()):
+                self.id_index.setdefault(str(policy_id), position)
+
+        # Diff against the previous snapshot: rows with the same policy_id and contents keep their parsed index
+        # entries, so only new and changed rows are parsed again
+        reused = {}
+        self.changed_ids = None
+        self.removed_ids = set()
+        comparable = (
+            previous is not None and self.row_hashes is not None and previous.row_hashes is not None
+            and list(previous.df.columns) == list(df.columns)
+        )
+        if comparable:
+            self.changed_ids = set()
+            for policy_id, position in self.id_index.items():
+                old_position = previous.id_index.get(policy_id)
+                if old_position is not None and previous.row_hashes[old_position] == self.row_hashes[position]:
+                    reused[position] = old_position
+                else:
+                    self.changed_ids.add(policy_id)
+        if previous is not None:
+            self.removed_ids = set(previous.id_index) - set(self.id_index)
+
+        # Inverted indexes on the filterable columns. The bitmaps of a field are kept as the rows of a
+        # single (values x policies) matrix so that facet counts are one matrix reduction.
+        self.filter_index = {}
+        self.facets = {}
+        self.row_items = {}
+        for field, (column, multi) in FILTER_FIELDS.items():
+            column_items = []
+            if column in df.columns:
+                previous_items = previous.row_items[field] if reused else None
+                for position, cell in enumerate(df[column].tolist()):
+                    old_position = reused.get(position)
+                    if old_position is not None:
+                        column_items.append(previous_items[old_position])
+                    else:
+                        column_items.append(_row_items(field, cell, multi))
+            self.row_items[field] = column_items
+
+            postings = {}
+            labels = {}
+            for position, items in enumerate(column_items):
+                for value, label in items:
+                    postings.setdefault(value, []).append(position)
+                    labels.setdefault(value, label)
+
+            values = list(postings)
+            matrix = np.zeros((len(values), len(df)), dtype=bool)
+            for row, value in enumerate(values):
+                matrix[row, postings[value]] = True
+
+            self.filter_index[field] = {value: matrix[row] for row, value in enumerate(values)}
+            self.facets[field] = (values, [labels[v] for v in values], matrix, matrix.sum(axis=1))
+
+        # Display names for country codes, used as facet labels
+        self.country_names = {}
+        if "country_iso" in df.columns and "country" in df.columns:
+            for iso, country in zip(df["country_iso"].tolist(), df["country"].tolist()):
+                key = normalize_filter_value("country_iso", iso)
+                if key and not _is_missing(country):
+                    self.country_names.setdefault(key, str(country))
+
+    def get_policy(self, policy_id):
+        """
+        Purpose: Looks up a single policy by its id in O(1).
+
+        Input:
+            - policy_id: The ID of the policy to retrieve.
+
+        Output: A dictionary with the CPDB fields of the policy, or None if it does not exist.
+        """
+        position = self.id_index.get(str(policy_id))
+        if position is None:
+            return None
+        return self.df.iloc[position].to_dict()
+
+    def match(self, filters):
+        """
+        Purpose: Resolves a set of filters against the inverted indexes.
+        Values of the same field are OR-ed (a policy in any of the requested sectors matches), and
+        different fields are AND-ed, which is how the CPDB API combines them.
+
+        Input:
+            - filters: A dictionary mapping FILTER_FIELDS keys to a list of requested values.
+
+        Output: A boolean bitmap of the matching rows, or None if no filter was applied.
+        """
+        mask = None
+        for field, values in filters.items():
+            if not values:
+                continue
+            bitmaps = self.filter_index[field]
+            field_mask = np.zeros(len(self.df), dtype=bool)
+            for value in values:
+                bitmap = bitmaps.get(normalize_filter_value(field, value))
+                if bitmap is not None:
+                    field_mask |= bitmap
+            mask = field_mask if mask is None else mask & field_mask
+        return mask
+
+    def facet_counts(self, filters):
+        """
+        Purpose: Counts the policies per distinct value of every filterable field.
+        The counts of a field take every other filter into account but not the field's own filter,
+        so the options of a dropdown that is already in use are not narrowed down to the selection.
+
+        Input:
+            - filters: A dictionary mapping FILTER_FIELDS keys to a list of requested values.
+
+        Output: A dictionary mapping each FILTER_FIELDS key to a list of {"value", "label", "count"}
+                dictionaries, sorted by label. Values without any matching policy are left out.
+        """
+        active = {field: values for field, values in filters.items() if values}
+        results = {}
+        for field, (values, labels, matrix, counts) in self.facets.items():
+            others = {f: v for f, v in active.items() if f != field}
+            mask = self.match(others)
+            if mask is not None:
+                # Counts of the unfiltered snapshot are precomputed; filtered ones only look at the matching columns
+                counts = np.count_nonzero(matrix[:, mask], axis=1)
+
+            options = []
+            for value, label, count in zip(values, labels, counts.tolist()):
+                if count:
+                    option = {"value": label, "label": label, "count": count}
+                    if field == "country_iso":
+                        option["label"] = self.country_names.get(value, label)
+                    options.append(option)
+            options.sort(key=lambda option: option["label"].lower())
+            results[field] = options
+        return results
+
+    def positions(self, filters):
+        """
+        Purpose: Returns the row positions of the policies matching the given filters.
+
+        Input:
+            - filters: A dictionary mapping FILTER_FIELDS keys to a list of requested values.
+
+        Output: A sorted numpy array of row positions in df.
+        """
+        mask = self.match(filters)
+        if mask is None:
+            return np.arange(len(self.df))
+        return np.flatnonzero(mask)
+
+    def filter(self, filters):
+        """
+        Purpose: Returns the policies matching the given filters.
+
+        Input:
+            - filters: A dictionary mapping FILTER_FIELDS keys to a list of requested values.
+
+        Output: A DataFrame with the matching policies, in CPDB order.
+        """
+        mask = self.match(filters)
+        if mask is None:
+            return self.df
+        return self.df.iloc[np.flatnonzero(mask)]
+
+
+class PolicyStore:
+    """
+    Purpose: Keeps a loaded-once, refreshable copy of the whole CPDB in memory so that request
+    handlers do not download the database on every hit. Every downloaded copy is also written to a
+    local Arrow file so that a restarted worker can read it instead of going to the network.
+
+    With start_refresher, new copies are downloaded on a background thread and swapped in whole, so
+    requests never wait for the CPDB and always read one consistent snapshot.
+    """
+
+    def __init__(self, max_age=CPDB_MAX_AGE, path=CPDB_SNAPSHOT_PATH):
+        self.max_age = max_age
+        self.path = path
+        self._snapshot = None
+        self._expires_at = 0.0
+        self._version = 0
+        self._lock = threading.Lock()
+        self._refresher = None
+        self._stop = threading.Event()
+        self._listeners = []
+
+    def _fetch(self):
+        """
+        Purpose: Downloads the full, unfiltered CPDB.
+
+        Output: A DataFrame with every policy in the database.
+        """
+        # Imported here, as the client pulls in pandas and requests; workers with a local copy may never need it
+        from cpdb_api import request as cpdb_request
+        with span("cpdb_fetch"):
+            return cpdb_request.Request().issue()
+
+    def _set_snapshot(self, df, loaded_at=None):
+        """
+        Purpose: Indexes a new copy of the CPDB and swaps it in. Must be called with the lock held.
+        Rows that did not change since the current snapshot reuse its index entries. If nothing changed at all,
+        the current snapshot is kept, so everything derived from it (e.g. cached responses) stays valid.
+
+        Output: The current PolicySnapshot.
+        """
+        with span("cpdb_index"):
+            snapshot = PolicySnapshot(df, self._version + 1, loaded_at, previous=self._snapshot)
+        if self._snapshot is not None and snapshot.fingerprint == self._snapshot.fingerprint:
+            self._expires_at = snapshot.loaded_at + self.max_age
+            return self._snapshot
+
+        if snapshot.changed_ids is not None:
+            print(
+                f"CPDB snapshot {snapshot.version}: {len(snapshot.changed_ids)} new or changed and "
+                f"{len(snapshot.removed_ids)} removed policies out of {len(df)}"
+            )
+        self._version = snapshot.version
+        # Readers hold on to the snapshot they started with, so swapping the reference is atomic for them
+        self._snapshot = snapshot
+        self._expires_at = snapshot.loaded_at + self.max_age
+        for listener in self._listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                print(f"CPDB snapshot listener failed: {e}")
+        return snapshot
+
+    def add_listener(self, listener):
+        """
+        Purpose: Registers a function called with every new snapshot after it is swapped in (and with the current
+        one, if one is loaded). Listeners run with the store's lock held, so they should only hand work off.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+            current = self._snapshot
+        if current is not None:
+            listener(current)
+
+    def _save_local(self, df):
+        """
+        Purpose: Writes the DataFrame to the local Arrow file. The file is written uncompressed so that
+        reading it needs no decompression, and swapped in with os.replace so readers never see a partial file.
+
+        Output: The modification time of the written file, or None if it was not written.
+        """
+        if not self.path:
+            return None
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            feather.write_feather(df, tmp_path, compression="uncompressed")
+            os.replace(tmp_path, self.path)
+            return os.path.getmtime(self.path)
+        except Exception as e:
+            print(f"Could not save the CPDB snapshot to {self.path}: {e}")
+            return None
+
+    def _read_local(self):
+        """
+        Purpose: Reads the local Arrow copy of the CPDB. The snapshot is a pandas DataFrame, which copies the
+        data out of the Arrow table anyway, so the file is read normally rather than memory-mapped.
+
+        Output: A tuple (DataFrame, modification time), or None if no usable local copy exists.
+        """
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            loaded_at = os.path.getmtime(self.path)
+            return feather.read_table(self.path, memory_map=False).to_pandas(), loaded_at
+        except Exception as e:
+            print(f"Could not read the CPDB snapshot from {self.path}: {e}")
+            return None
+
+    def _load(self):
+        """
+        Purpose: Loads a new snapshot. Must be called with the lock held.
+        A fresh local copy saved by another worker process is used if there is one; otherwise the CPDB is
+        downloaded. If the download fails and a snapshot is already loaded, the old one keeps being served.
+
+        Output: The current PolicySnapshot.
+        """
+        current_time = self._snapshot.loaded_at if self._snapshot is not None else 0.0
+        if self.path and os.path.exists(self.path):
+            mtime = os.path.getmtime(self.path)
+            if current_time < mtime and time.time() < mtime + self.max_age:
+                local = self._read_local()
+                if local is not None:
+                    return self._set_snapshot(*local)
+
+        try:
+            df = self._fetch()
+        except Exception as e:
+            if self._snapshot is None:
+                raise
+            print(f"CPDB refresh failed, serving the previous snapshot: {e}")
+            count_fallback("cpdb_fetch", "error")
+            self._expires_at = time.time() + CPDB_RETRY_DELAY
+            return self._snapshot
+
+        previous = self._snapshot
+        snapshot = self._set_snapshot(df)
+        if snapshot is not previous:
+            # Stamped with the file time, so this worker does not mistake its own copy for a newer one
+            saved_at = self._save_local(df)
+            if saved_at is not None:
+                snapshot.loaded_at = saved_at
+                self._expires_at = saved_at + self.max_age
+        return snapshot
+
+    def open_local(self):
+        """
+        Purpose: Loads the local Arrow copy of the CPDB, if there is one, without touching the network.
+
+        Output: The loaded PolicySnapshot, or None if no usable local copy exists.
+        """
+        if not self.path or not os.path.exists(self.path):
+            return None
+        with self._lock:
+            if self._snapshot is not None:
+                return self._snapshot
+            local = self._read_local()
+            if local is None:
+                return None
+            return self._set_snapshot(*local)
+
+    def refresh(self, if_expired=False):
+        """
+        Purpose: Fetches a fresh copy of the CPDB and swaps it in for the current snapshot.
+
+        Input:
+            - if_expired: Only refresh if the current snapshot is still expired once the lock is held. The background
+              refresher uses it, so it does not download the CPDB again right after a request thread loaded it.
+
+        Output: The current PolicySnapshot.
+        """
+        with self._lock:
+            if if_expired and self._snapshot is not None and time.time() < self._expires_at:
+                return self._snapshot
+            return self._load()
+
+    def start_refresher(self):
+        """
+        Purpose: Starts the background thread that refreshes the snapshot whenever it is older than max_age.
+        From then on, snapshot() only waits for the CPDB if no snapshot was ever loaded.
+        """
+        with self._lock:
+            if self._refresher is not None:
+                return
+            self._stop.clear()
+            self._refresher = threading.Thread(target=self._refresh_loop, name="cpdb-refresher", daemon=True)
+            self._refresher.start()
+
+    def stop_refresher(self):
+        """
+        Purpose: Stops the background refresh thread.
+        """
+        refresher = self._refresher
+        if refresher is None:
+            return
+        self._stop.set()
+        refresher.join()
+        self._refresher = None
+
+    def _refresh_loop(self):
+        while True:
+            delay = max(0.0, self._expires_at - time.time())
+            if self._snapshot is not None:
+                delay += random.uniform(0, CPDB_REFRESH_JITTER)
+            if self._stop.wait(delay):
+                return
+            try:
+                self.refresh(if_expired=True)
+            except Exception as e:
+                # Nothing loaded yet and the download failed; try again later
+                print(f"CPDB download failed: {e}")
+                self._expires_at = time.time() + CPDB_RETRY_DELAY
+
+    def snapshot(self):
+        """
+        Purpose: Returns the current snapshot. Without the background refresher, it is loaded on first use
+        and whenever it is older than max_age.
+
+        Output: The current PolicySnapshot.
+        """
+        if self._snapshot is None:
+            self.open_local()
+        if self._snapshot is None or (self._refresher is None and time.time() > self._expires_at):
+            with self._lock:
+                # Another thread may have loaded it while we were waiting for the lock
+                if self._snapshot is None or (self._refresher is None and time.time() > self._expires_at):
+                    self._load()
+        return self._snapshot
+
+    def get_policy(self, policy_id):
+        """
+        Purpose: Looks up a single policy by its id in the current snapshot.
+
+        Input:
+            - policy_id: The ID of the policy to retrieve.
+
+        Output: A dictionary with the CPDB fields of the policy, or None if it does not exist.
+        """
+        return self.snapshot().get_policy(policy_id)
+
+
+# Shared store used by the Flask routes
+policy_store = PolicyStore()
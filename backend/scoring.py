@@ -0,0 +1,383 @@
+import numpy as np
+
+# Scoring of the categorical levers as (score, pressure) pairs.
+FFP_SCORES = {
+    "fast": (30, 20),       # Fast fossil fuel phaseout create the most immediate climate benefit but also created the most economic disruption.
+    "medium": (20, 10),     # Medium fossil fuel phaseout offers a balance between economic and climate benefits.
+    "slow": (15, 5),        # Slow fossil fuel phaseout minimizes the economic disruption but delays the climate benefits.
+}
+FFP_DEFAULT_SCORE = (5, 5)  # Status quo provides with minimal climate benefits and economic disruption.
+
+IR_SCORES = {
+    "high": (15, 10),       # High industry regulations drive innovation and emmisinos reduction but can be economically disruptive by increasing costs.
+    "medium": (10, 5),      # Medium industry regulations create incentives for innovation and emissions reduction
+}
+IR_DEFAULT_SCORE = (5, 0)   # Low industry regulations create minimal economic disruption but has limited climate benefits.
+
+# Lookup tables of the categorical levers for the vectorized scoring: row i holds the (score, pressure) of the i-th option,
+# and the last row the default for any other value
+FFP_OPTIONS = list(FFP_SCORES)
+FFP_TABLE = np.array([FFP_SCORES[o] for o in FFP_OPTIONS] + [FFP_DEFAULT_SCORE], dtype=float)
+IR_OPTIONS = list(IR_SCORES)
+IR_TABLE = np.array([IR_SCORES[o] for o in IR_OPTIONS] + [IR_DEFAULT_SCORE], dtype=float)
+
+# The ten policy levers sent by the frontend
+POLICY_LEVERS = [
+    "carbonTaxRate", "renewableSubsidy", "fossilFuelPhaseout",
+    "deforestationBan", "educationCampaigns", "greenJobsInitiative",
+    "industryRegulations", "justiceLensStrength", "adaptationInvestment",
+    "carbonCaptureRAndD"
+]
+
+# Allowed range of the numeric levers, the same limits as the sliders of the simulator and the clamps of suggest_policy
+LEVER_BOUNDS = {
+    "carbonTaxRate": (0, 200),
+    "renewableSubsidy": (0, 100),
+    "educationCampaigns": (0, 100),
+    "greenJobsInitiative": (0, 10),
+    "justiceLensStrength": (0, 100),
+    "adaptationInvestment": (0, 10),
+    "carbonCaptureRAndD": (0, 10),
+}
+
+# Options of the categorical levers
+LEVER_CHOICES = {
+    "fossilFuelPhaseout": ["slow", "medium", "fast"],
+    "deforestationBan": [False, True],
+    "industryRegulations": ["low", "medium", "high"],
+}
+
+
+class PolicySettings:
+    """
+    Purpose: Compact, validated form of the ten policy levers of one configuration.
+    Levers can be read as attributes or with policies["lever"], so it can be passed wherever a policy settings
+    dictionary is expected.
+    """
+    __slots__ = tuple(POLICY_LEVERS)
+
+    def __init__(self, carbonTaxRate, renewableSubsidy, fossilFuelPhaseout, deforestationBan, educationCampaigns,
+                 greenJobsInitiative, industryRegulations, justiceLensStrength, adaptationInvestment, carbonCaptureRAndD):
+        self.carbonTaxRate = carbonTaxRate
+        self.renewableSubsidy = renewableSubsidy
+        self.fossilFuelPhaseout = fossilFuelPhaseout
+        self.deforestationBan = deforestationBan
+        self.educationCampaigns = educationCampaigns
+        self.greenJobsInitiative = greenJobsInitiative
+        self.industryRegulations = industryRegulations
+        self.justiceLensStrength = justiceLensStrength
+        self.adaptationInvestment = adaptationInvestment
+        self.carbonCaptureRAndD = carbonCaptureRAndD
+
+    @classmethod
+    def from_dict(cls, policies):
+        """
+        Purpose: Builds the settings from a policy settings dictionary, as sent by the frontend.
+        Raises ValueError if a lever is missing, a numeric lever is not a number or a categorical lever is not
+        one of its LEVER_CHOICES.
+        """
+        if not isinstance(policies, dict):
+            raise ValueError("policies must be an object")
+        for lever in POLICY_LEVERS:
+            if lever not in policies:
+                raise ValueError(f"Missing required policy setting: {lever}")
+            value = policies[lever]
+            if lever in LEVER_BOUNDS and (not isinstance(value, (int, float)) or isinstance(value, bool)):
+                raise ValueError(f"{lever} must be a number")
+            # Compared with the type too, so 0 and 1 are not taken for False and True
+            if lever in LEVER_CHOICES and not any(type(value) is type(choice) and value == choice for choice in LEVER_CHOICES[lever]):
+                raise ValueError(f"{lever} must be one of {LEVER_CHOICES[lever]}")
+        return cls(*(policies[lever] for lever in POLICY_LEVERS))
+
+    def __getitem__(self, lever):
+        return getattr(self, lever)
+
+    def to_dict(self):
+        return {lever: getattr(self, lever) for lever in POLICY_LEVERS}
+
+
+def score_policy(policies):
+    """
+    Purpose: Calculates the carbon, economic pressure and justice scores of one set of policy settings.
+
+    Input:
+        - policies: The policy settings.
+
+    Output: A tuple (carbon_score, economic_pressure, justice_score), each normalized to the 0 - 100 range.
+    """
+    ffp_score, ffp_pressure = FFP_SCORES.get(policies["fossilFuelPhaseout"], FFP_DEFAULT_SCORE)
+    ir_score, ir_pressure = IR_SCORES.get(policies["industryRegulations"], IR_DEFAULT_SCORE)
+
+    # Carbon reduction score
+    carbon_score = (
+        policies["carbonTaxRate"] * 0.3 +       # Carbon tax is a strong incentive for emissions reduction
+        policies["renewableSubsidy"] * 0.25 +   # Renewable subsidies encourage investment in clean energy and accelerate the transition away from fossil fuels
+        ffp_score +                             # Fossil fuel phaseout directly reduces emissions
+        policies["carbonCaptureRAndD"] * 3 +    # Carbon capture technology is a key part of the solution
+        ir_score                                # Industry regulations drive innovation and emissions reduction
+    )
+
+    # Economic pressure score
+    economic_pressure = (
+        policies["carbonTaxRate"] * 0.25 +
+        ffp_pressure +
+        ir_pressure -
+        policies["greenJobsInitiative"] * 2
+    )
+
+    # Justice score
+    justice_score = (
+        policies["justiceLensStrength"] * 0.5 + # Justice lens strength ensures that the policies are equitable and inclusive
+        policies["deforestationBan"] * 0.2 +    # Deforestation ban protects carbon sinks and promotes biodiversity
+        policies["educationCampaigns"] * 0.3 +  # Education campaigns raise awareness and promote community engagement
+        policies["greenJobsInitiative"] * 4 +   # Green jobs initiative creates jobs in the clean energy sector
+        policies["adaptationInvestment"] * 2    # Adaptation investment is crucial for protecting vulnerable communities from climate impacts
+    )
+
+    # Normalize scores to 0 - 100 range
+    carbon_score = min(100, max(0, carbon_score))
+    economic_pressure = min(100, max(0, economic_pressure))
+    justice_score = min(100, max(0, justice_score))
+    return carbon_score, economic_pressure, justice_score
+
+
+def policy_arrays(policies_list):
+    """
+    Purpose: Turns a list of policy settings dictionaries into one array per lever.
+
+    Input:
+        - policies_list: A list of policy settings.
+
+    Output: A dictionary mapping each lever name to an array with its value in every policy.
+    """
+    arrays = {}
+    for lever in POLICY_LEVERS:
+        values = [p[lever] for p in policies_list]
+        if lever in ("fossilFuelPhaseout", "industryRegulations"):
+            arrays[lever] = np.array(values, dtype=object)
+        else:
+            arrays[lever] = np.array(values, dtype=float)
+    return arrays
+
+
+def category_codes(values, options):
+    """
+    Purpose: Maps the values of a categorical lever to their position in options, or len(options) for any other value.
+
+    Inputs:
+        - values: A scalar or array of lever values.
+        - options: The list of known options.
+
+    Output: An integer array of the same shape as values.
+    """
+    values = np.asarray(values, dtype=object)
+    codes = np.full(values.shape, len(options), dtype=np.intp)
+    for code, option in enumerate(options):
+        codes[values == option] = code
+    return codes
+
+
+def score_policies(levers):
+    """
+    Purpose: Vectorized version of score_policy, for many policy settings at once.
+    Gives the same scores as score_policy for every element.
+
+    Input:
+        - levers: A dictionary mapping each lever name to an array (or scalar) of values, e.g. from policy_arrays.
+                  Arrays of different levers are broadcast against each other.
+
+    Output: A tuple (carbon_score, economic_pressure, justice_score) of float arrays.
+    """
+    ffp_pairs = FFP_TABLE[category_codes(levers["fossilFuelPhaseout"], FFP_OPTIONS)]
+    ir_pairs = IR_TABLE[category_codes(levers["industryRegulations"], IR_OPTIONS)]
+
+    value = lambda lever: np.asarray(levers[lever], dtype=float)
+
+    carbon_score = (
+        value("carbonTaxRate") * 0.3 +
+        value("renewableSubsidy") * 0.25 +
+        ffp_pairs[..., 0] +
+        value("carbonCaptureRAndD") * 3 +
+        ir_pairs[..., 0]
+    )
+    economic_pressure = (
+        value("carbonTaxRate") * 0.25 +
+        ffp_pairs[..., 1] +
+        ir_pairs[..., 1] -
+        value("greenJobsInitiative") * 2
+    )
+    justice_score = (
+        value("justiceLensStrength") * 0.5 +
+        value("deforestationBan") * 0.2 +
+        value("educationCampaigns") * 0.3 +
+        value("greenJobsInitiative") * 4 +
+        value("adaptationInvestment") * 2
+    )
+    return np.clip(carbon_score, 0, 100), np.clip(economic_pressure, 0, 100), np.clip(justice_score, 0, 100)
+
+
+def determine_badge(carbon_score, justice_score):
+    """
+    Purpose: Determines the badge of a policy from its scores.
+    """
+    if carbon_score >= 85 and justice_score >= 85:      # Gold badge would require excellent performance in both carbon reduction and justice
+        return "Gold"
+    elif carbon_score >= 60 and justice_score >= 60:    # Silver badge would require good performance in both, while showcasing more space for improvement
+        return "Silver"
+    else:                                               # Bronze badge would be awarded for any other combination of scores, which requires significant improvement
+        return "Bronze"
+
+
+def summarize_policy(policies):
+    """
+    Purpose: Generates a one-sentence summary of the policy settings.
+    """
+    summary_components = []
+    if policies["carbonTaxRate"] > 80:
+        summary_components.append("Employs aggressive carbon pricing")
+    elif 80 >= policies["carbonTaxRate"] > 40:
+        summary_components.append("Uses moderate carbon pricing")
+    else:
+        summary_components.append("Has low carbon pricing")
+
+    if policies["renewableSubsidy"] > 70:
+        summary_components.append("strongly supports renewable energy")
+    elif 70 >= policies["renewableSubsidy"] > 30:
+        summary_components.append("moderately invests in renewables")
+
+    if policies["fossilFuelPhaseout"] == "fast":
+        summary_components.append("rapidly phases out fossil fuels")
+    elif policies["fossilFuelPhaseout"] == "medium":
+        summary_components.append("steadily reduces fossil fuel dependence")
+
+    if policies["justiceLensStrength"] > 70:
+        summary_components.append("prioritizes climate justice")
+
+    if policies["adaptationInvestment"] > 7:
+        summary_components.append("invests heavily in adaptation")
+
+    if not summary_components:
+        summary = "This policy takes a balanced approach to climate change mitigation and adaptation."
+    else:
+        summary = f"This policy {', '.join(summary_components[:-1])}"
+        if len(summary_components) > 1:
+            summary += f", and {summary_components[-1]}."
+        else:
+            summary += f"."
+    return summary
+
+
+def suggest_policy(policies, carbon_score, economic_pressure, justice_score):
+    """
+    Purpose: Suggests improvements to the policy settings based on its weakest score.
+
+    Output: A tuple (suggested_policy, suggestion_name).
+    """
+    if carbon_score < 60:
+        # The suggestions for improving a low carbon score
+        suggested_policy = {
+            "carbonTaxRate": min(200, policies["carbonTaxRate"] + 30),
+            "renewableSubsidy": min(100, policies["renewableSubsidy"] + 20),
+            "fossilFuelPhaseout": "fast",
+        }
+        suggestion_name = "Enhanced Climate Mitigation"
+    elif economic_pressure > 70:
+        # Suggestions for reducing economic pressure
+        suggested_policy = {
+            "carbonTaxRate": max(10, policies["carbonTaxRate"] - 20),
+            "renewableSubsidy": min(100, policies["renewableSubsidy"] + 10),
+            "adaptationInvestment": min(10, policies["adaptationInvestment"] + 1),
+        }
+        suggestion_name = "Economically Balanced Transition"
+    elif justice_score < 60:
+        # Suggestions for improving a low justice score
+        suggested_policy = {
+            "justiceLensStrength": min(100, policies["justiceLensStrength"] + 30),
+            "educationCampaigns": min(100, policies["educationCampaigns"] + 20),
+            "adaptationInvestment": min(10, policies["adaptationInvestment"] + 2),
+        }
+        suggestion_name = "Justice-Enhanced Climate Plan"
+    else:
+        # Balanced improvement
+        suggested_policy = {
+            "carbonTaxRate": min(200, policies["carbonTaxRate"] + 10),
+            "renewableSubsidy": min(100, policies["renewableSubsidy"] + 10),
+            "adaptationInvestment": min(10, policies["adaptationInvestment"] + 1),
+        }
+        suggestion_name = "Optimized Climate Strategy"
+    return suggested_policy, suggestion_name
+
+
+def calculate_policy_name(policies):
+    """
+    Purpose: Generates a policy name based on the policy settings.
+    
+    Input policies: The policy settings.
+        
+    Outputs: A descriptive name for the policy.
+    """
+    # Base cases for the policy name
+    speed = ""
+    focus = ""
+    approach = ""
+    
+    # Speed determining component
+    if policies["fossilFuelPhaseout"] == "fast":
+        speed = "Rapid "
+    elif policies["fossilFuelPhaseout"] == "slow":
+        speed = "Gradual "
+    
+    # Focus detremining component
+    if policies["justiceLensStrength"] >= 50:
+        focus = "Justice-Centered "
+    elif policies["renewableSubsidy"] >= 50:
+        focus = "Renewable-Focused "
+    elif policies["carbonTaxRate"] >= 100:
+        focus = "Carbon-Priced "
+    elif policies["adaptationInvestment"] >= 7:
+        focus = "Adaptation-Ready "
+    
+    # Approach determining component
+    if policies["carbonCaptureRAndD"] >= 7:
+        approach = "Tech-Driven "
+    elif policies["educationCampaigns"] >= 70:
+        approach = "Awareness-Driven "
+    elif policies["deforestationBan"] >= 7:
+        approach = "Conservation-Driven "
+    elif policies["greenJobsInitiative"] >= 7:
+        approach = "Jobs-Driven "
+    elif policies["industryRegulations"] == "high":
+        approach = "Regulation-Driven "
+    
+    policy_name = f"{speed}{focus}{approach}Climate Strategy"
+    
+    # Fallback if we don't have an empty name
+    if not policy_name.strip():
+        policy_name = "Balanced Climate Strategy"
+        
+    return policy_name
+
+
+def evaluate_policy(policies):
+    """
+    Purpose: Everything calculate_results derives from the policy settings alone: scores, badge, summary and suggestion.
+    It has no side effects and makes no network calls, so it can be called for many candidate settings.
+
+    Input:
+        - policies: The policy settings.
+
+    Output: A dictionary with the (unrounded) carbonScore, economicPressure and justiceScore, the badge, the summary,
+            the generated policyName, the suggestedPolicy and the suggestedPolicyName.
+    """
+    carbon_score, economic_pressure, justice_score = score_policy(policies)
+    suggested_policy, suggestion_name = suggest_policy(policies, carbon_score, economic_pressure, justice_score)
+    return {
+        "carbonScore": carbon_score,
+        "economicPressure": economic_pressure,
+        "justiceScore": justice_score,
+        "badge": determine_badge(carbon_score, justice_score),
+        "summary": summarize_policy(policies),
+        "policyName": calculate_policy_name(policies),
+        "suggestedPolicy": suggested_policy,
+        "suggestedPolicyName": suggestion_name,
+    }
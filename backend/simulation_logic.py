@@ -1,25 +1,180 @@
+import contextvars
+import hashlib
+import json
+import threading
 import time
-import requests
-import openmeteo_requests
-from retry_requests import retry
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed, wait
 from dotenv import load_dotenv
 import numpy as np
-from google import genai
-from google.genai import types
+from climate_model import climate_ensemble, climate_trajectories
+from scoring import (
+    POLICY_LEVERS, PolicySettings, calculate_policy_name, determine_badge, evaluate_policy, policy_arrays, score_policies, suggest_policy,
+    summarize_policy
+)
 import os
+from cachetools import LRUCache
+from cache import MISSING, DiskCache, TieredCache
+from circuit_breaker import CLOSED, CircuitBreaker, fallback_reason
+from metrics import count_fallback, observe_stage, span, track_fallbacks
+from sweep import encode_array, run_sweep
 
 # Configure the Gemini API with your token
 # Use the API key from an environment variable for security
 load_dotenv()
 api_key = os.getenv("API_KEY")
 gen_key = os.getenv("GEN_API")
-genai_client = genai.Client(api_key = gen_key)
+
+# The Gemini and HTTP clients are created on first use instead of at import time: importing google.genai alone takes
+# about half a second, which every worker process would otherwise pay before serving its first request
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+# Gemini responses are cached by a hash of (model, prompt, config) in a SQLite table shared by all
+# worker processes, for LLM_CACHE_TTL seconds and at most LLM_CACHE_MAX_ENTRIES entries
+GEMINI_MODEL = 'gemini-2.0-flash-001'
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 60 * 60))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 20000))
+llm_cache = TieredCache(DiskCache("llm", max_entries=LLM_CACHE_MAX_ENTRIES), maxsize=512)
+
+# Thread pool for the external calls of a simulation, and how long each one may take (seconds)
+executor = ThreadPoolExecutor(max_workers=int(os.getenv("SIMULATION_WORKERS", 32)))
+WEATHER_TIMEOUT = float(os.getenv("WEATHER_TIMEOUT", 10))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 20))
+
+# Longest a single request to each upstream may take (seconds). Failed and slower requests count against the
+# upstream's circuit breaker; once it opens, simulations use their fallback values without calling it (see circuit_breaker.py)
+GEOCODE_DEADLINE = float(os.getenv("GEOCODE_DEADLINE", 3))
+OPEN_METEO_DEADLINE = float(os.getenv("OPEN_METEO_DEADLINE", 3))
+GEMINI_DEADLINE = float(os.getenv("GEMINI_DEADLINE", LLM_TIMEOUT))
+geocode_breaker = CircuitBreaker("geocode", GEOCODE_DEADLINE)
+weather_breaker = CircuitBreaker("open_meteo", OPEN_METEO_DEADLINE)
+gemini_breaker = CircuitBreaker("gemini", GEMINI_DEADLINE)
+
+# Largest Monte Carlo ensemble a single simulation may request
+ENSEMBLE_MAX_SIZE = int(os.getenv("ENSEMBLE_MAX_SIZE", 20000))
+
+# Ask Gemini for all AI fields of a simulation in one request (set GEMINI_BATCHED=0 for separate requests)
+GEMINI_BATCHED = os.getenv("GEMINI_BATCHED", "1") != "0"
+
+# Shared HTTP sessions, so connections (and TLS handshakes) are reused across simulations
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 16))
+
+
+def shared_client(name, create):
+    """
+    Purpose: Returns the shared client called name, creating it with create() on first use.
+    """
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = create()
+    return client
+
+
+def genai_client():
+    """
+    Purpose: Returns the shared Gemini client.
+    """
+    def create():
+        from google import genai
+        from google.genai import types
+        # HttpOptions takes milliseconds
+        return genai.Client(api_key = gen_key, http_options = types.HttpOptions(timeout = int(GEMINI_DEADLINE * 1000)))
+    return shared_client("genai", create)
+
+
+def genai_types():
+    """
+    Purpose: Returns the google.genai.types module, imported on first use.
+    """
+    from google.genai import types
+    return types
+
+
+def geocode_session():
+    """
+    Purpose: Returns the shared HTTP session for the Google Geocoding API.
+    """
+    def create():
+        import requests
+        session = requests.Session()
+        session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE))
+        return session
+    return shared_client("geocode", create)
+
+
+def openmeteo_client(retries=True):
+    """
+    Purpose: Returns the shared Open-Meteo client, whose session retries failed requests, or with retries=False
+    the client without retries, used to probe whether Open-Meteo recovered after its circuit breaker opened.
+    """
+    def create():
+        import openmeteo_requests
+        import requests
+        from retry_requests import retry
+        weather_session = retry(requests.Session(), retries = 5 if retries else 0, backoff_factor = 0.2)
+        return openmeteo_requests.Client(session = weather_session)
+    return shared_client("openmeteo" if retries else "openmeteo_probe", create)
+
+
+def warm_up_clients():
+    """
+    Purpose: Creates the shared clients ahead of the first simulation.
+    """
+    genai_client()
+    genai_types()
+    geocode_session()
+    openmeteo_client()
+
+
+# Current temperatures are cached per rounded coordinates and time bucket (15 minutes by default)
+TEMPERATURE_BUCKET_SECONDS = int(os.getenv("TEMPERATURE_BUCKET_SECONDS", 15 * 60))
+TEMPERATURE_COORD_DECIMALS = 2
+temperature_cache = LRUCache(maxsize=4096)
+temperature_key_locks = LRUCache(maxsize=1024)
+temperature_lock = threading.Lock()
+
+# Geocoding results are cached per normalized address: found locations for GEOCODE_TTL seconds,
+# addresses Google has no result for (negative entries) for GEOCODE_NEGATIVE_TTL seconds.
+GEOCODE_TTL = int(os.getenv("GEOCODE_TTL", 30 * 24 * 60 * 60))
+GEOCODE_NEGATIVE_TTL = int(os.getenv("GEOCODE_NEGATIVE_TTL", 24 * 60 * 60))
+geocode_cache = TieredCache(DiskCache("geocode"), maxsize=2048)
+
+
+class GeocodeError(Exception):
+    """
+    Purpose: Raised when the Google Geocoding API answers with an error status, such as OVER_QUERY_LIMIT.
+    """
+
+
+def normalize_address(input_address):
+    """
+    Purpose: Normalizes an address into a cache key, so that "  United  States" and "united states" share an entry.
+    """
+    return " ".join(str(input_address).split()).casefold()
 
 
 def extract_lat_lng(input_address, data_type='json'):
     """
     Purpose: Extracts latitude and longitude from an address using Google Geocoding API.
+    Results are cached, so the common case makes no network round-trip.
+
+    Output:
+        A dictionary with "lat", "lon" and "name", or None if the address could not be geocoded.
     """
+    key = normalize_address(input_address)
+    if not key:
+        return None
+
+    cached = geocode_cache.get(key)
+    if cached is not MISSING:
+        if cached is None:
+            return None
+        return {"lat": cached["lat"], "lon": cached["lon"], "name": input_address}
+
     endpoint = f"https://maps.googleapis.com/maps/api/geocode/{data_type}" 
     params = {
         "address": input_address,
@@ -27,20 +182,69 @@ def extract_lat_lng(input_address, data_type='json'):
     }
 
     try:
-        response = requests.get(endpoint, params=params)
-        response.raise_for_status()
-
-        data = response.json()
-        if "results" in data and data["results"]:
-            latlng = data["results"][0]["geometry"]["location"]
-            return {"lat": latlng.get("lat"), 
-                    "lon": latlng.get("lng"),
-                    "name": input_address}
-        else:
-            return {"lat": 0.0, "lon": 0.0, "name": input_address}
+        with geocode_breaker.call(), span("geocode"):
+            response = geocode_session().get(endpoint, params=params, timeout=GEOCODE_DEADLINE)
+            response.raise_for_status()
+            # Quota and key errors raise here, so they count against the circuit breaker
+            return geocode_result(key, input_address, response.json())
         
     except Exception as e:
-        return {"lat": 0.0, "lon": 0.0, "name": input_address}
+        print(f"Geocoding failed for {input_address}: {e}")
+        count_fallback("geocode", fallback_reason(e))
+        return None
+
+def geocode_result(key, input_address, data):
+    """
+    Purpose: Reads a Google Geocoding API response and caches its outcome under the normalized address.
+
+    Inputs:
+        - key: The normalized address.
+        - input_address: The address as given.
+        - data: The decoded JSON response.
+
+    Output:
+        A dictionary with "lat", "lon" and "name", or None if the address does not exist.
+        Raises GeocodeError if the API answered with an error status.
+    """
+    if "results" in data and data["results"]:
+        latlng = data["results"][0]["geometry"]["location"]
+        location = {"lat": latlng.get("lat"), "lon": latlng.get("lng")}
+        geocode_cache.set(key, location, GEOCODE_TTL)
+        return {"lat": location["lat"], 
+                "lon": location["lon"],
+                "name": input_address}
+    elif data.get("status") == "ZERO_RESULTS":
+        # The address does not exist, remember that separately from real locations
+        geocode_cache.set(key, None, GEOCODE_NEGATIVE_TTL)
+        print(f"Geocoding found no results for: {input_address}")
+        return None
+    else:
+        # Quota or key problems (OVER_QUERY_LIMIT, REQUEST_DENIED, INVALID_REQUEST, ...) are not cached, the next
+        # call tries again
+        raise GeocodeError(f"Geocoding API status {data.get('status')}")
+
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+
+def weather_params(lat, lon):
+    """
+    Purpose: The Open-Meteo request parameters for the current temperature at the given coordinates.
+    """
+    return {
+        "latitude": lat,
+        "longitude": lon,
+        "current": ["temperature_2m"],
+        "timezone": "auto",
+        "wind_speed_unit": "mph",
+        "precipitation_unit": "inch"
+    }
+
+def temperature_key(location_data):
+    """
+    Purpose: The temperature cache key of a geocoded location: its rounded coordinates and the current time bucket.
+    """
+    lat = round(location_data["lat"], TEMPERATURE_COORD_DECIMALS)
+    lon = round(location_data["lon"], TEMPERATURE_COORD_DECIMALS)
+    return (lat, lon, int(time.time() // TEMPERATURE_BUCKET_SECONDS))
 
 def get_real_temperature(location):
     """
@@ -52,36 +256,52 @@ def get_real_temperature(location):
     Output:
         Current temperature at the specified location
     """
-    # Setting up the Open-Meteo API client
-    cache_session = requests.session()
-    retry_session = retry(cache_session, retries = 5, backoff_factor = 0.2)
-    openmeteo = openmeteo_requests.Client(session = retry_session)
     location_data = extract_lat_lng(location)
-    
-    # API request url and parameters
-    url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-        "latitude": location_data["lat"],
-        "longitude": location_data["lon"],
-        "current": ["temperature_2m"],
-        "timezone": "auto",
-        "wind_speed_unit": "mph",
-	    "precipitation_unit": "inch"
-    }
-    
-    try:
-        # Make the request
-        responses = openmeteo.weather_api(url, params = params)
-        response = responses[0]
-        current = response.Current()
-        current_temperature = current.Variables(0).Value()
+    if location_data is None:
+        # Without coordinates there is nothing to ask Open-Meteo for
+        return 0.0
+
+    # Nearby coordinates in the same time bucket share one upstream request
+    key = temperature_key(location_data)
+    lat, lon, _ = key
+
+    with temperature_lock:
+        if key in temperature_cache:
+            return temperature_cache[key]
+        key_lock = temperature_key_locks.get(key)
+        if key_lock is None:
+            key_lock = temperature_key_locks[key] = threading.Lock()
+
+    # Only one thread per key goes upstream, the others wait for its result
+    with key_lock:
+        with temperature_lock:
+            if key in temperature_cache:
+                return temperature_cache[key]
+
+        # API request url and parameters
+        url = OPEN_METEO_URL
+        params = weather_params(lat, lon)
+        
+        try:
+            # Make the request
+            with weather_breaker.call() as probe, span("open_meteo"):
+                # The probe of a recovering upstream is not retried
+                responses = openmeteo_client(retries = not probe).weather_api(url, params = params, timeout = OPEN_METEO_DEADLINE)
+            response = responses[0]
+            current = response.Current()
+            current_temperature = current.Variables(0).Value()
+        
+        except Exception as e:
+            print(f"Open-Meteo request failed: {e}")
+            count_fallback("weather", fallback_reason(e))
+            base_temp = 0.0
+            return base_temp
+
+        with temperature_lock:
+            temperature_cache[key] = current_temperature
         return current_temperature
-    
-    except:
-        base_temp = 0.0
-        return base_temp
 
-def climate_api(start_year, end_year, location, policies):
+def climate_api(start_year, end_year, location, policies, base_temperature=None, rng=None):
     """
     Generate temperature projections based on policy choices and location data.
     
@@ -94,85 +314,83 @@ def climate_api(start_year, end_year, location, policies):
         - end_year: The ending year for the simulation.
         - location: The address
         - policies: Policy settings that affect temperature trajectories.
+        - base_temperature: The current temperature at the location, if already known.
+        - rng: The np.random.Generator for the climate variability, e.g. np.random.default_rng(seed)
+               for a reproducible trajectory. A new unseeded generator is used if None.
         
     Output:
         A list of projected temperatures for each year.
     """
     # Fetches the current temperature data for the starting point
-    base_temperature = get_real_temperature(location)
-    
-    years = list(range(start_year, end_year + 1))
-    
-    # Calculate how policies affect temperature trajectory.
-    # NOTE: This is a simplified model made after referencing few research papers and should be replaced with a trained and complex model in the future.
-
-    ffp_multiplier = 0.00
-    if policies["fossilFuelPhaseout"] == "fast":
-        ffp_multiplier = 0.05
-    elif policies["fossilFuelPhaseout"] == "medium":
-        ffp_multiplier = 0.02
-    else:
-        ffp_multiplier = 0.01
+    if base_temperature is None:
+        base_temperature = get_real_temperature(location)
 
-    db_multiplier = 0.00
-    if policies["deforestationBan"]:
-        db_multiplier = 0.03
-    else:
-        db_multiplier = 0.00
-    mitigation_factor = (
-        policies["carbonTaxRate"] * 0.002 +                                 # Carbon tax reduces emissions
-        policies["renewableSubsidy"] * 0.001 +                              # Renewable subsidies encourages clean energy
-        ffp_multiplier +                                                    # The speed of fossil fuel phaseout matters
-        db_multiplier +                                                     # Forests are carbon sinks
-        policies["carbonCaptureRAndD"] * 0.004                              # Carbon capture technology helps remove CO2
-    )
+    # The model itself lives in climate_model.py, which can also project many policies at once
+    trajectories, years = climate_trajectories(start_year, end_year, base_temperature, [policies], rng=rng)
+    temperature_traj = [round(temp, 4) for temp in trajectories[0].tolist()]
     
+    return temperature_traj, years
+
+
+
+def generate_text(prompt, max_output_tokens=1024, temperature=0.2, response_schema=None):
     """
-    According to NASA's Earth Observatory, most of the global warming has occurred since 1975 at a rate of about 0.15 to 0.20°C per decade.
-    This translates to an approximate increase of 0.02°C per year, which is used as an estimated annual increase in temperature rate in this dataset.
+    Purpose: Generates text with Gemini, going through the LLM response cache.
+    The prompts are deterministic and run at a low temperature, so a cached answer is reused for the
+    same (model, prompt, config) instead of calling Gemini again. Failures are not cached.
+
+    Inputs:
+        - prompt: The prompt to send.
+        - max_output_tokens: The output token limit.
+        - temperature: The sampling temperature.
+        - response_schema: If given, a JSON schema the response must follow.
+
+    Output:
+        The stripped response text. Raises an exception if Gemini fails, or CircuitOpenError if its circuit
+        breaker is open.
     """
-    default_annual_increase = 0.02
-    
-    # Generate temperature trajectory with policy effects
-    temperature_traj = []
-    cumulative_miti = 0
-    
-    for i, year in enumerate(years):
-        
-        # Policies become more effective over time (cumulative effect)
-        if i > 0:
-            cumulative_miti += mitigation_factor * 0.02
-        max_mitigation_ratio = 0.9
-        year_increase = default_annual_increase - min(default_annual_increase * max_mitigation_ratio, cumulative_miti)
-
-        # Random variation to simulate climate variability:
-        # - Normal distribution adds realistic variability to the model
-        # - The "0" in the mean indicates no bias towards warming or cooling
-        # - The "0.34" in the standard deviation is chosen after referencing "https://www.soa.org/490646/globalassets/assets/files/resources/research-report/2024/cc212-actuarial-weather-extremes-2023-hottest-year.pdf"
-        random_variation = np.random.normal(0, 0.34)
-        
-        # Calculate temperature for this year
-        if i == 0:
-            """ 
-            For the first year:
-            - Start with the actual observed current temperature at the given location.
-            - Add a random variation to simulate natural climate variability and give it a realistic .
-            - No increase from the mitigation effects yet.
-            """
-            temp = base_temperature + random_variation
-        else:
-            """
-            For subsequent years:
-            - Start from the previous year's simulated temperature.
-            - Add the default yearly increase reduced by policy mitigation effects.
-            - Add a random variation to simulate natural climate variability and give it a realistic feel.
-            """
-            temp = temperature_traj[-1] + year_increase + random_variation
-    
-        temperature_traj.append(round(temp, 4))
-    
-    return temperature_traj, years
+    key, config = llm_request(prompt, max_output_tokens, temperature, response_schema)
+    cached = llm_cache.get(key)
+    if cached is not MISSING:
+        return cached
+
+    with gemini_breaker.call(), span("gemini"):
+        response = genai_client().models.generate_content(
+            model=GEMINI_MODEL,
+            contents=prompt,
+            config=genai_types().GenerateContentConfig(**config)
+        )
+    return store_generated_text(key, response.text, response_schema)
+
+
+def llm_request(prompt, max_output_tokens, temperature, response_schema):
+    """
+    Purpose: Builds the generation config of a Gemini request and its cache key.
+
+    Output: A tuple (key, config).
+    """
+    config = {"temperature": temperature, "max_output_tokens": max_output_tokens}
+    if response_schema is not None:
+        config["response_mime_type"] = "application/json"
+        config["response_schema"] = response_schema
+    key = hashlib.sha256(
+        json.dumps([GEMINI_MODEL, prompt, config], sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return key, config
+
+
+def store_generated_text(key, text, response_schema):
+    """
+    Purpose: Strips a Gemini answer and caches it under its request key.
 
+    Output: The stripped text. Raises an exception, without caching, if a structured answer is not valid JSON.
+    """
+    text = text.strip()
+    if response_schema is not None:
+        # Do not cache structured answers that are not valid JSON
+        json.loads(text)
+    llm_cache.set(key, text, LLM_CACHE_TTL)
+    return text
 
 
 def mock_gemini_api(scores):
@@ -185,8 +403,6 @@ def mock_gemini_api(scores):
     Output:
         A string containing an AI-generated comment on the policy.
     """
-    time.sleep(0.5)  # Simulate network delay
-    
     comments = [
         f"Your policy achieves a carbon score of {scores['carbon_score']}, an economic pressure of {scores['economic_pressure']} and a justice score of {scores['justice_score']}. ",
         "To reduce economic strain while preserving climate benefits consider balancing tax measures with increased investment in adaptation. ",
@@ -236,21 +452,11 @@ def gemini_api(policy_summary, scores, location):
         """
         
         # Generate response using the newer client format
-        response = genai_client.models.generate_content(
-            model='gemini-2.0-flash-001',
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.2,
-                max_output_tokens=1024,
-            )
-        )
+        return generate_text(prompt, max_output_tokens=1024)
         
-        # Extract text from response
-        analysis = response.text
-            
-        return analysis.strip()
-        
-    except:
+    except Exception as e:
+        print(f"Gemini comment failed: {e}")
+        count_fallback("aiComment", fallback_reason(e))
         return mock_gemini_api(scores)
 
 def analyze_policy_with_gemini(description, analysis_type):
@@ -275,21 +481,11 @@ def analyze_policy_with_gemini(description, analysis_type):
     {analysis_type.title()}s:
     """
     try:
-        response = genai_client.models.generate_content(
-            model='gemini-2.0-flash-001',
-            contents=prompt_text,
-            config=types.GenerateContentConfig(
-                temperature=0.2,
-                max_output_tokens=1024,
-            )
-        )
-        
-        # Extract text from response
-        analysis = response.text
-            
-        return analysis.strip()
+        return generate_text(prompt_text, max_output_tokens=1024)
 
-    except:
+    except Exception as e:
+        print(f"Gemini {analysis_type} analysis failed: {e}")
+        count_fallback(analysis_type, fallback_reason(e))
         return ""
 
 def gemini_improver(title, description):
@@ -317,68 +513,272 @@ def gemini_improver(title, description):
         )
 
     try:
-        response = genai_client.models.generate_content(
-            model='gemini-2.0-flash-001',
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.2,
-                max_output_tokens=500
-            )
-        )
-        return response.text.strip()
-    except:
+        return generate_text(prompt, max_output_tokens=500)
+    except Exception as e:
+        print(f"Gemini description improvement failed: {e}")
+        count_fallback("improver", fallback_reason(e))
         return ""
 
 
-def calculate_policy_name(policies):
+# JSON schema of the combined analysis, one field per AI output of a simulation
+ANALYSIS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "description": {"type": "STRING"},
+        "aiComment": {"type": "STRING"},
+        "strength": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "weakness": {"type": "ARRAY", "items": {"type": "STRING"}},
+    },
+    "required": ["description", "aiComment", "strength", "weakness"],
+}
+
+def gemini_combined_analysis(title, description, summary, scores, location):
     """
-    Purpose: Generates a policy name based on the policy settings.
-    
-    Input policies: The policy settings.
-        
-    Outputs: A descriptive name for the policy.
+    Purpose: Gets the improved description, the overall comment, the strengths and the weaknesses of a
+    policy from a single Gemini request with a JSON response schema, instead of four separate requests.
+
+    Inputs:
+        - title: The title or name of the policy.
+        - description: The description of the policy (may be empty).
+        - summary: The generated policy summary, used when there is no description.
+        - scores: Dictionary containing key performance metrics in the format (Dict[str, int]).
+        - location: The location name for which the policy is being evaluated.
+
+    Output:
+        A dictionary with "description", "aiComment", "strength" and "weakness" in the same format as
+        gemini_improver, gemini_api and analyze_policy_with_gemini, or None if the request failed or the
+        answer was incomplete.
     """
-    # Base cases for the policy name
-    speed = ""
-    focus = ""
-    approach = ""
-    
-    # Speed determining component
-    if policies["fossilFuelPhaseout"] == "fast":
-        speed = "Rapid "
-    elif policies["fossilFuelPhaseout"] == "slow":
-        speed = "Gradual "
-    
-    # Focus detremining component
-    if policies["justiceLensStrength"] >= 50:
-        focus = "Justice-Centered "
-    elif policies["renewableSubsidy"] >= 50:
-        focus = "Renewable-Focused "
-    elif policies["carbonTaxRate"] >= 100:
-        focus = "Carbon-Priced "
-    elif policies["adaptationInvestment"] >= 7:
-        focus = "Adaptation-Ready "
-    
-    # Approach determining component
-    if policies["carbonCaptureRAndD"] >= 7:
-        approach = "Tech-Driven "
-    elif policies["educationCampaigns"] >= 70:
-        approach = "Awareness-Driven "
-    elif policies["deforestationBan"] >= 7:
-        approach = "Conservation-Driven "
-    elif policies["greenJobsInitiative"] >= 7:
-        approach = "Jobs-Driven "
-    elif policies["industryRegulations"] == "high":
-        approach = "Regulation-Driven "
-    
-    policy_name = f"{speed}{focus}{approach}Climate Strategy"
-    
-    # Fallback if we don't have an empty name
-    if not policy_name.strip():
-        policy_name = "Balanced Climate Strategy"
-        
-    return policy_name
+    prompt, has_description = combined_analysis_prompt(title, description, summary, scores, location)
+    try:
+        text = generate_text(prompt, max_output_tokens=2048, response_schema=ANALYSIS_SCHEMA)
+        return parse_combined_analysis(text, has_description, summary)
+    except Exception as e:
+        print(f"Combined Gemini analysis failed: {e}")
+        count_fallback("analysis", fallback_reason(e))
+        return None
+
+def combined_analysis_prompt(title, description, summary, scores, location):
+    """
+    Purpose: Builds the prompt of the combined analysis.
 
+    Output: A tuple (prompt, has_description).
+    """
+    has_description = bool(description and description.strip() and description.lower() != "none")
+    if has_description:
+        description_task = (
+            "description: Improve the clarity, grammar, and conciseness of the policy description. "
+            "Keep the meaning intact and provide only the improved description."
+        )
+    else:
+        description_task = "description: Repeat the policy summary unchanged."
+
+    prompt = f"""
+    Analyze this climate policy and answer in JSON.
+
+    Location: {location}
+
+    Policy Title: {title}
+
+    Policy Description: {description if has_description else summary}
+
+    Performance Metrics:
+    - Carbon Reduction Score: {scores['carbon_score']}/100
+    - Climate Justice Score: {scores['justice_score']}/100
+    - Economic Pressure: {scores['economic_pressure']}/100
+
+    Fields:
+    - {description_task}
+    - aiComment: A concise analysis (3-5 sentences) that evaluates the effectiveness of this policy approach,
+      identifies strengths and weaknesses, makes 1-2 specific recommendations for improvement and considers
+      the specific challenges of the location.
+    - strength: The main strengths of the policy description, at most 3, each a concise point (max 90 characters)
+      without symbols like "*".
+    - weakness: The main weaknesses of the policy description, at most 3, each a concise point (max 90 characters)
+      without symbols like "*".
+    """
+    return prompt, has_description
+
+def parse_combined_analysis(text, has_description, summary):
+    """
+    Purpose: Converts the JSON answer of the combined analysis into the simulation result fields.
+
+    Output: A dictionary with "description", "aiComment", "strength" and "weakness", or None if a field is empty.
+            Raises an exception if the answer is malformed.
+    """
+    analysis = json.loads(text)
+    result = {
+        "description": str(analysis["description"]).strip() if has_description else summary,
+        "aiComment": str(analysis["aiComment"]).strip(),
+        "strength": "\n".join(str(item).strip() for item in analysis["strength"]),
+        "weakness": "\n".join(str(item).strip() for item in analysis["weakness"]),
+    }
+    if not all(result.values()):
+        return None
+    return result
+
+def start_separate_analysis(policy_name, description, timings, deadline=None):
+    """
+    Purpose: Starts the per-call Gemini pipeline, used when the combined analysis is disabled or failed.
+    The improver, strength and weakness calls start right away; the overall comment needs the improved
+    description and is started by stream_separate_analysis.
+
+    Inputs:
+        - deadline: The time.perf_counter() value by which every call must finish, e.g. what is left of the
+          combined analysis' deadline. Without one, each call gets LLM_TIMEOUT.
+
+    Output: A dictionary with the start time, the deadline and the futures of the started calls.
+    """
+    improver_future = None
+    if description != "":
+        improver_future = submit(timed_call, timings, "improver", gemini_improver, policy_name, description)
+    return {
+        "started": time.perf_counter(),
+        "deadline": deadline,
+        "improver": improver_future,
+        "strength": submit(timed_call, timings, "strength", analyze_policy_with_gemini, description, "strength"),
+        "weakness": submit(timed_call, timings, "weakness", analyze_policy_with_gemini, description, "weakness"),
+    }
+
+def stream_separate_analysis(pending, description, summary, scores, location, timings):
+    """
+    Purpose: Waits for the per-call Gemini pipeline started by start_separate_analysis, yielding every field as soon
+    as its call finishes. Calls that miss their deadline are replaced by their fallback.
+
+    Output: A generator of (field, value) pairs for "description", "aiComment", "strength" and "weakness".
+    """
+    started = pending["started"]
+    fallbacks = {
+        "description": lambda: description,
+        "aiComment": lambda: mock_gemini_api(scores),
+        "strength": lambda: "",
+        "weakness": lambda: "",
+    }
+
+    def call_deadline(call_started):
+        if pending["deadline"] is None:
+            return call_started + LLM_TIMEOUT
+        return min(call_started + LLM_TIMEOUT, pending["deadline"])
+
+    futures = {pending["strength"]: "strength", pending["weakness"]: "weakness"}
+    deadlines = {"strength": call_deadline(started), "weakness": call_deadline(started)}
+
+    def start_comment(new_description):
+        # The overall comment needs the improved description
+        futures[submit(timed_call, timings, "aiComment", gemini_api, new_description, scores, location)] = "aiComment"
+        deadlines["aiComment"] = call_deadline(time.perf_counter())
+
+    # Add description if provided
+    if pending["improver"] is None:
+        yield "description", summary
+        start_comment(summary)
+    else:
+        futures[pending["improver"]] = "description"
+        deadlines["description"] = call_deadline(started)
+
+    while futures:
+        timeout = max(0.0, min(deadlines[name] for name in futures.values()) - time.perf_counter())
+        done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+        if done:
+            finished = [(future, future.result()) for future in done]
+        else:
+            # The call keeps running in its worker thread, but the simulation does not wait for it
+            finished = []
+            for future, name in futures.items():
+                if deadlines[name] <= time.perf_counter():
+                    print(f"{name} did not finish in time, using the fallback")
+                    count_fallback(name, "timeout")
+                    timings[name] = "timeout"
+                    finished.append((future, fallbacks[name]()))
+        for future, value in finished:
+            name = futures.pop(future)
+            yield name, value
+            if name == "description":
+                start_comment(value)
+
+
+def fallback_analysis(description, summary, scores, timings):
+    """
+    Purpose: The AI fields used when no Gemini call can give them in time: the description as entered (or the
+    summary), the template comment and no strengths or weaknesses. The analysis is marked as a fallback in timings.
+    """
+    if timings.get("analysis") != "timeout":
+        timings["analysis"] = "fallback"
+    return {
+        "description": description if description != "" else summary,
+        "aiComment": mock_gemini_api(scores),
+        "strength": "",
+        "weakness": "",
+    }
+
+
+def retry_analysis_separately(timings, deadline):
+    """
+    Purpose: Whether the per-call pipeline should be tried after the combined analysis returned nothing.
+    It is not if the combined call timed out or no time is left before the deadline, since the separate calls
+    would be given up on too, or if the Gemini breaker is not closed, since they would be rejected.
+    """
+    return (
+        timings.get("analysis") != "timeout"
+        and deadline > time.perf_counter()
+        and gemini_breaker.state == CLOSED
+    )
+
+
+def mark_fallbacks(timings, fallbacks):
+    """
+    Purpose: Marks the stages of a simulation that used a fallback value as "fallback" in its timings (stages that
+    timed out stay "timeout"), so results built from fallbacks are not stored (see policy_results.cacheable_result).
+    """
+    for stage, _ in fallbacks:
+        if timings.get(stage) != "timeout":
+            timings[stage] = "fallback"
+
+
+def submit(func, *args):
+    """
+    Purpose: Runs func(*args) on the thread pool in a copy of the caller's context, so the stages it times
+    are reported with the caller's request (see metrics.py).
+
+    Output: The Future of the call.
+    """
+    return executor.submit(contextvars.copy_context().run, func, *args)
+
+
+def timed_call(timings, name, func, *args):
+    """
+    Purpose: Calls func(*args) and records how long it took in timings[name] (milliseconds) and in the stage metrics.
+    """
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        seconds = time.perf_counter() - start
+        timings[name] = round(seconds * 1000, 1)
+        observe_stage(name, seconds)
+
+
+def wait_for(future, deadline, fallback, timings, name):
+    """
+    Purpose: Waits for a background call until the given deadline.
+
+    Inputs:
+        - future: The Future of the call.
+        - deadline: The time.perf_counter() value after which the call is given up on.
+        - fallback: A function returning the value to use if the call did not finish in time.
+        - timings: The latency breakdown, where a timed out call is recorded.
+        - name: The name of the call in timings.
+
+    Output: The result of the call, or the fallback value.
+    """
+    try:
+        return future.result(timeout=max(0.0, deadline - time.perf_counter()))
+    except FutureTimeout:
+        # The call keeps running in its worker thread, but the simulation does not wait for it
+        print(f"{name} did not finish in time, using the fallback")
+        count_fallback(name, "timeout")
+        timings[name] = "timeout"
+        return fallback()
 
 
 def calculate_results(input_data):
@@ -390,6 +790,27 @@ def calculate_results(input_data):
 
     Output: A dictionary containing the simulation results.
     """
+    results = {}
+    for _, data in stream_results(input_data):
+        results.update(data)
+    return results
+
+def stream_results(input_data):
+    """
+    Purpose: Calculates the results of the policy simulation, yielding each part as soon as it is ready, so that the
+    scores and trajectory do not wait for Gemini.
+
+    Input: 
+        - input_data: A dictionary containing the input parameters from the frontend.
+
+    Output: A generator of (event, data) pairs, where data holds some of the fields of the simulation result:
+        - "scores": policyName, the scores, badge and suggestions (no network calls).
+        - "trajectory": years and temperatureTrajectory (and the ensemble, if requested), once the weather is known.
+        - "analysis": AI fields (description, aiComment, strength, weakness) as their calls finish. The combined
+          analysis sends all four at once; the per-call pipeline sends one per event.
+        - "done": the timings.
+        Merging the data of every event gives the result of handle_simulation.
+    """
     start_year = input_data["startYear"]
     end_year = input_data["endYear"]
     location = input_data["location"]
@@ -397,163 +818,34 @@ def calculate_results(input_data):
     policy_naming = input_data["policyName"]
     description = input_data["description"]
 
+    # The external calls run in parallel:
+    #   geocode + weather -> trajectory
+    #   one combined Gemini analysis, or if it is disabled or fails, the separate calls:
+    #       gemini_improver -> gemini_api
+    #       analyze_policy_with_gemini (strength), analyze_policy_with_gemini (weakness)
+    # while the scores are computed on this thread.
+    started = time.perf_counter()
+    timings = {}
+    fallbacks = track_fallbacks()
+    weather_future = submit(timed_call, timings, "weather", get_real_temperature, location)
 
+    # Scores, badge, name, summary and suggestions are pure functions of the policy settings
+    evaluation = evaluate_policy(policies)
 
-
-    ffp_score = 0       # Fossil fuel phaseout scoring
-    ffp_pressure = 0    # Fossil fuel phaseout pressure
-    if policies["fossilFuelPhaseout"] == "fast": # Fast fossil fuel phaseout create the most immediate climate benefit but also created the most economic disruption.
-        ffp_score = 30
-        ffp_pressure = 20
-    elif policies["fossilFuelPhaseout"] == "medium": # Medium fossil fuel phaseout offers a balance between economic and climate benefits.
-        ffp_score = 20
-        ffp_pressure = 10
-    elif policies["fossilFuelPhaseout"] == "slow": # Slow fossil fuel phaseout minimizes the economic disruption but delays the climate benefits.
-        ffp_score = 15
-        ffp_pressure = 5
-    else: # Status quo provides with minimal climate benefits and economic disruption.
-        ffp_score = 5 
-        ffp_pressure = 5
-
-    
-    ir_score = 0    # Industry regulations scoring
-    ir_pressure = 0 # Industry regulations pressure
-    if policies["industryRegulations"] == "high": # High industry regulations drive innovation and emmisinos reduction but can be economically disruptive by increasing costs.
-        ir_score = 15
-        ir_pressure = 10
-    elif policies["industryRegulations"] == "medium": # Medium industry regulations create incentives for innovation and emissions reduction
-        ir_score = 10
-        ir_pressure = 5
-    else: # Low industry regulations create minimal economic disruption but has limited climate benefits.
-        ir_score = 5
-        ir_pressure = 0
-
-    # Carbon reduction score
-    carbon_score = (
-        policies["carbonTaxRate"] * 0.3 +       # Carbon tax is a strong incentive for emissions reduction 
-        policies["renewableSubsidy"] * 0.25 +   # Renewable subsidies encourage investment in clean energy and accelerate the transition away from fossil fuels
-        ffp_score +                             # Fossil fuel phaseout directly reduces emissions
-        policies["carbonCaptureRAndD"] * 3 +    # Carbon capture technology is a key part of the solution
-        ir_score                                # Industry regulations drive innovation and emissions reduction
-    )
-
-    # Economic pressure score
-    economic_pressure = (
-        policies["carbonTaxRate"] * 0.25 +
-        ffp_pressure +
-        ir_pressure -
-        policies["greenJobsInitiative"] * 2
-    )
-    
-    # Justice score
-    justice_score = (
-        policies["justiceLensStrength"] * 0.5 + # Justice lens strength ensures that the policies are equitable and inclusive
-        policies["deforestationBan"] * 0.2 +    # Deforestation ban protects carbon sinks and promotes biodiversity
-        policies["educationCampaigns"] * 0.3 +  # Education campaigns raise awareness and promote community engagement
-        policies["greenJobsInitiative"] * 4 +   # Green jobs initiative creates jobs in the clean energy sector
-        policies["adaptationInvestment"] * 2    # Adaptation investment is crucial for protecting vulnerable communities from climate impacts
-    )
-    
-    # Normalize scores to 0 - 100 range
-    carbon_score = min(100, max(0, carbon_score))
-    economic_pressure = min(100, max(0, economic_pressure))
-    justice_score = min(100, max(0, justice_score))
-    
-    # Temperature trajectory
-    temperature_traj, years = climate_api(start_year, end_year, location, policies)
-    
-    # Determining badge
-    if carbon_score >= 85 and justice_score >= 85:      # Gold badge would require excellent performance in both carbon reduction and justice
-        badge = "Gold"
-    elif carbon_score >= 60 and justice_score >= 60:    # Silver badge would require good performance in both, while showcasing more space for improvement
-        badge = "Silver"
-    else:                                               # Bronze badge would be awarded for any other combination of scores, which requires significant improvement
-        badge = "Bronze"
-    
-    # Policy summary generation
-    summary_components = []
-    if policies["carbonTaxRate"] > 80:
-        summary_components.append("Employs aggressive carbon pricing")
-    elif 80 >= policies["carbonTaxRate"] > 40:
-        summary_components.append("Uses moderate carbon pricing")
-    else: 
-        summary_components.append("Has low carbon pricing")
-        
-    if policies["renewableSubsidy"] > 70:
-        summary_components.append("strongly supports renewable energy")
-    elif 70 >= policies["renewableSubsidy"] > 30:
-        summary_components.append("moderately invests in renewables")
-        
-    if policies["fossilFuelPhaseout"] == "fast":
-        summary_components.append("rapidly phases out fossil fuels")
-    elif policies["fossilFuelPhaseout"] == "medium":
-        summary_components.append("steadily reduces fossil fuel dependence")
-        
-    if policies["justiceLensStrength"] > 70:
-        summary_components.append("prioritizes climate justice")
-        
-    if policies["adaptationInvestment"] > 7:
-        summary_components.append("invests heavily in adaptation")
-        
-    if not summary_components:
-        summary = "This policy takes a balanced approach to climate change mitigation and adaptation."
-    else:
-        summary = f"This policy {', '.join(summary_components[:-1])}"
-        if len(summary_components) > 1:
-            summary += f", and {summary_components[-1]}."
-        else:
-            summary += f"."
-    
-       # Ferched Policy name
+    # Fetched policy name, needed by the improver
     if policy_naming == "" or policy_naming == "None":
-        policy_name = calculate_policy_name(policies)
+        policy_name = evaluation["policyName"]
     else:
         policy_name = policy_naming
 
-    # Add description if provided
-    new_description = ""
-    if description == "":
-        new_description = summary
-    else:
-        new_description = gemini_improver(policy_name ,description)
-    
-    # Suggested policy improvements generation
-    suggested_policy = {}
-    suggestion_name = ""
-    
-    ### Logic for suggesting improvements
-    if carbon_score < 60:
-        # The suggestions for improving a low carbon score
-        suggested_policy = {
-            "carbonTaxRate": min(200, policies["carbonTaxRate"] + 30),
-            "renewableSubsidy": min(100, policies["renewableSubsidy"] + 20),
-            "fossilFuelPhaseout": "fast",
-        }
-        suggestion_name = "Enhanced Climate Mitigation"
-    elif economic_pressure > 70:
-        # Suggestions for reducing economic pressure
-        suggested_policy = {
-            "carbonTaxRate": max(10, policies["carbonTaxRate"] - 20),
-            "renewableSubsidy": min(100, policies["renewableSubsidy"] + 10),
-            "adaptationInvestment": min(10, policies["adaptationInvestment"] + 1),
-        }
-        suggestion_name = "Economically Balanced Transition"
-    elif justice_score < 60:
-        # Suggestions for improving a low justice score
-        suggested_policy = {
-            "justiceLensStrength": min(100, policies["justiceLensStrength"] + 30),
-            "educationCampaigns": min(100, policies["educationCampaigns"] + 20),
-            "adaptationInvestment": min(10, policies["adaptationInvestment"] + 2),
-        }
-        suggestion_name = "Justice-Enhanced Climate Plan"
-    else:
-        # Balanced improvement
-        suggested_policy = {
-            "carbonTaxRate": min(200, policies["carbonTaxRate"] + 10),
-            "renewableSubsidy": min(100, policies["renewableSubsidy"] + 10),
-            "adaptationInvestment": min(10, policies["adaptationInvestment"] + 1),
-        }
-        suggestion_name = "Optimized Climate Strategy"
+    pending_analysis = None
+    if not GEMINI_BATCHED:
+        pending_analysis = start_separate_analysis(policy_name, description, timings)
+
+    carbon_score = evaluation["carbonScore"]
+    economic_pressure = evaluation["economicPressure"]
+    justice_score = evaluation["justiceScore"]
+    summary = evaluation["summary"]
     
     # Fetches AI comments
     scores = {
@@ -561,27 +853,135 @@ def calculate_results(input_data):
         "justice_score": round(justice_score), 
         "economic_pressure": round(economic_pressure)
     }
-    ai_comment = gemini_api(new_description, scores, location)
-    
-    # Output format
-    results = {
+    scoring_done = time.perf_counter()
+    timings["scoring"] = round((scoring_done - started) * 1000, 1)
+    observe_stage("scoring", scoring_done - started)
+
+    # The combined analysis needs the scores
+    analysis_future = None
+    if GEMINI_BATCHED:
+        analysis_future = submit(
+            timed_call, timings, "analysis", gemini_combined_analysis, policy_name, description, summary, scores, location
+        )
+    yield "scores", score_fields(policy_name, evaluation)
+
+    # Temperature trajectory
+    base_temperature = wait_for(weather_future, started + WEATHER_TIMEOUT, lambda: 0.0, timings, "weather")
+    rng = np.random.default_rng(input_data.get("seed"))
+    temperature_traj, years = timed_call(
+        timings, "trajectory", climate_api, start_year, end_year, location, policies, base_temperature, rng
+    )
+
+    # Monte Carlo uncertainty bands, if requested
+    ensemble = None
+    if input_data.get("ensemble"):
+        ensemble = timed_call(
+            timings, "ensemble", climate_ensemble, start_year, end_year, base_temperature, policies,
+            input_data["ensemble"], input_data.get("ensembleStep", 1), rng
+        )
+    yield "trajectory", trajectory_fields(years, temperature_traj, ensemble)
+
+    # AI analysis
+    analysis = None
+    if analysis_future is not None:
+        analysis_deadline = started + LLM_TIMEOUT
+        analysis = wait_for(analysis_future, analysis_deadline, lambda: None, timings, "analysis")
+        if analysis is None:
+            if retry_analysis_separately(timings, analysis_deadline):
+                pending_analysis = start_separate_analysis(policy_name, description, timings, analysis_deadline)
+            else:
+                analysis = fallback_analysis(description, summary, scores, timings)
+    if analysis is not None:
+        yield "analysis", analysis
+    else:
+        for field, value in stream_separate_analysis(pending_analysis, description, summary, scores, location, timings):
+            yield "analysis", {field: value}
+    total = time.perf_counter() - started
+    timings["total"] = round(total * 1000, 1)
+    observe_stage("simulation", total)
+    mark_fallbacks(timings, fallbacks)
+    yield "done", {"timings": dict(timings)}
+
+def score_fields(policy_name, evaluation):
+    """
+    Purpose: The fields of the simulation result that only depend on the policy settings.
+    """
+    return {
         "policyName": policy_name,
-        "description": new_description,
-        "years": years,
-        "temperatureTrajectory": temperature_traj,
-        "carbonScore": round(carbon_score),
-        "justiceScore": round(justice_score),
-        "economicPressure": round(economic_pressure),
-        "badge": badge,
-        "suggestedPolicy": suggested_policy,
-        "suggestedPolicyName": suggestion_name,
-        "aiComment": ai_comment,
-        "strength": analyze_policy_with_gemini(description, "strength"),
-        "weakness": analyze_policy_with_gemini(description, "weakness"),
+        "carbonScore": round(evaluation["carbonScore"]),
+        "justiceScore": round(evaluation["justiceScore"]),
+        "economicPressure": round(evaluation["economicPressure"]),
+        "badge": evaluation["badge"],
+        "suggestedPolicy": evaluation["suggestedPolicy"],
+        "suggestedPolicyName": evaluation["suggestedPolicyName"],
     }
-    
+
+def trajectory_fields(years, temperature_traj, ensemble=None):
+    """
+    Purpose: The fields of the simulation result that hold the temperature trajectory.
+    """
+    fields = {"years": years, "temperatureTrajectory": temperature_traj}
+    if ensemble is not None:
+        fields["ensemble"] = ensemble
+    return fields
+
+def compact_results(results, start_year):
+    """
+    Purpose: Converts a simulation result to the compact format. The "years" list is replaced by "startYear", as the
+    trajectory has one value per year from there, and the trajectory and the ensemble bands are sent as base64 strings
+    of little-endian float32 values, like the "float32" encoding of /sweep.
+
+    Inputs:
+        - results: The simulation result, changed in place.
+        - start_year: The starting year of the simulation.
+
+    Output: The compact result.
+    """
+    results.pop("years", None)
+    results["startYear"] = start_year
+    results["encoding"] = "float32"
+    results["temperatureTrajectory"] = encode_array(results["temperatureTrajectory"], "float32")
+    ensemble = results.get("ensemble")
+    if ensemble is not None:
+        for band in ensemble:
+            if band not in ("size", "years"):
+                ensemble[band] = encode_array(ensemble[band], "float32")
     return results
 
+def validate_simulation_input(input_data):
+    """
+    Purpose: Checks that a simulation request has every required field and valid optional settings.
+
+    Input:
+        - input_data: A dictionary containing the data sent from the React frontend.
+
+    Output: An error message, or None if the input is valid.
+    """
+    required_fields = ["location", "startYear", "endYear", "policies"]
+    for i in required_fields:
+        if i not in input_data:
+            return f"Missing required field: {i}"
+
+    if not isinstance(input_data["policies"], dict):
+        return "policies must be an object"
+    for p in POLICY_LEVERS:
+        if p not in input_data["policies"]:
+            return f"Missing required policy setting: {p}"
+
+    # Optional Monte Carlo ensemble settings
+    for field, low, high in [("ensemble", 1, ENSEMBLE_MAX_SIZE), ("ensembleStep", 1, None), ("seed", 0, None)]:
+        value = input_data.get(field)
+        if value is None:
+            continue
+        if not isinstance(value, int) or isinstance(value, bool) or value < low or (high is not None and value > high):
+            limit = f"between {low} and {high}" if high is not None else f"at least {low}"
+            return f"{field} must be an integer {limit}"
+
+    # Response format: "compact" sends the start year and float32 arrays instead of the years and trajectory lists
+    if input_data.get("format", "json") not in ("json", "compact"):
+        return 'format must be "json" or "compact"'
+    return None
+
 def handle_simulation(input_data):
     """
     Purpose: Handles the simulation request. This is the main entry point for the backend when called from the frontend.
@@ -593,24 +993,264 @@ def handle_simulation(input_data):
     Returns:
         A dictionary containing the results of the simulation.
     """
-    required_fields = ["location", "startYear", "endYear", "policies"]
-    for i in required_fields:
-        if i not in input_data:
-            print(f"Missing required field: {i}")
-            return {"error": f"Missing required field: {i}"}
-        
-    required_policies = [
-        "carbonTaxRate", "renewableSubsidy", "fossilFuelPhaseout", 
-        "deforestationBan", "educationCampaigns", "greenJobsInitiative", 
-        "industryRegulations", "justiceLensStrength", "adaptationInvestment", 
-        "carbonCaptureRAndD"
-    ]
-        
-    for p in required_policies:
-        if p not in input_data["policies"]:
-            print(f"Missing required policy setting: {p}")
-            return {"error": f"Missing required policy setting: {p}"}
+    error = validate_simulation_input(input_data)
+    if error:
+        print(error)
+        return {"error": error}
         
     # Run simulation
     results = calculate_results(input_data)
+    if input_data.get("format") == "compact":
+        compact_results(results, input_data["startYear"])
     return results
+
+def handle_simulation_stream(input_data):
+    """
+    Purpose: Handles a streamed simulation request: like handle_simulation, but the results are sent in parts
+    as soon as they are ready (see stream_results).
+
+    Args:
+        input_data: A dictionary containing the data sent from the
+                   React frontend.
+
+    Returns:
+        A generator of (event, data) pairs. Invalid input gives a single "error" event.
+    """
+    error = validate_simulation_input(input_data)
+    if error:
+        print(error)
+        yield "error", {"error": error}
+        return
+
+    for event, data in stream_results(input_data):
+        if event == "trajectory" and input_data.get("format") == "compact":
+            compact_results(data, input_data["startYear"])
+        yield event, data
+
+def handle_score(input_data):
+    """
+    Purpose: Handles a scores-only request: the scores, badge, name and suggestions of the policy settings,
+    without the trajectory or the AI analysis, so it makes no network calls.
+
+    Args:
+        input_data: A dictionary with the "policies" settings (and optionally "policyName"), as sent to /simulate.
+
+    Returns:
+        A dictionary with the same score fields as a simulation result. Raises ValueError if the settings are invalid.
+    """
+    if not isinstance(input_data, dict):
+        raise ValueError("Expected a JSON object")
+    policies = PolicySettings.from_dict(input_data.get("policies"))
+    evaluation = evaluate_policy(policies)
+
+    policy_naming = input_data.get("policyName", "")
+    return {
+        "policyName": evaluation["policyName"] if policy_naming in ("", "None", None) else policy_naming,
+        "summary": evaluation["summary"],
+        "carbonScore": round(evaluation["carbonScore"]),
+        "justiceScore": round(evaluation["justiceScore"]),
+        "economicPressure": round(evaluation["economicPressure"]),
+        "badge": evaluation["badge"],
+        "suggestedPolicy": evaluation["suggestedPolicy"],
+        "suggestedPolicyName": evaluation["suggestedPolicyName"],
+    }
+
+def batch_item_error(input_data):
+    """
+    Purpose: The checks of a batch item on top of validate_simulation_input. The items of a batch are scored and
+    simulated together, so a bad lever or year must be caught before that instead of failing the whole batch.
+
+    Output: An error message, or None if the item is valid.
+    """
+    try:
+        PolicySettings.from_dict(input_data["policies"])
+    except ValueError as e:
+        return str(e)
+    for field in ("startYear", "endYear"):
+        if not isinstance(input_data[field], int) or isinstance(input_data[field], bool):
+            return f"{field} must be an integer"
+    if input_data["startYear"] > input_data["endYear"]:
+        return "startYear must not be after endYear"
+    return None
+
+def handle_batch_simulation(inputs, include_analysis=False, seed=None):
+    """
+    Purpose: Simulates many policy configurations at once.
+    Each distinct location is geocoded and looked up in the weather API once, the scores of all configurations
+    are computed in one vectorized pass, and the trajectories in one vectorized pass per simulated period.
+    Configurations with their own "seed" get the same trajectory and ensemble as /simulate would give them.
+
+    Inputs:
+        - inputs: A list of simulation requests, each in the format accepted by handle_simulation.
+        - include_analysis: Also run the (combined) Gemini analysis of every configuration.
+        - seed: Seed for the climate variability of the configurations without their own seed.
+
+    Output:
+        A generator of (index, result) pairs, where index is the position of the request in inputs.
+        Results come in the order they finish; invalid requests get {"error": ...} as their result.
+    """
+    valid = []
+    for index, input_data in enumerate(inputs):
+        if not isinstance(input_data, dict):
+            yield index, {"error": "Each simulation must be an object"}
+            continue
+        input_data = {"policyName": "", "description": "", **input_data}
+        error = validate_simulation_input(input_data) or batch_item_error(input_data)
+        if error:
+            yield index, {"error": error}
+            continue
+        valid.append((index, input_data))
+    if not valid:
+        return
+
+    # One weather lookup per distinct location
+    started = time.perf_counter()
+    weather_futures = {}
+    for _, input_data in valid:
+        key = normalize_address(input_data["location"])
+        if key not in weather_futures:
+            weather_futures[key] = submit(get_real_temperature, input_data["location"])
+    base_temperatures = {
+        key: wait_for(future, started + WEATHER_TIMEOUT, lambda: 0.0, {}, "weather")
+        for key, future in weather_futures.items()
+    }
+    bases = [base_temperatures[normalize_address(input_data["location"])] for _, input_data in valid]
+
+    # Scores of every configuration in one pass
+    carbon_scores, economic_pressures, justice_scores = score_policies(
+        policy_arrays([input_data["policies"] for _, input_data in valid])
+    )
+
+    # Trajectories, one pass per simulated period. A configuration with its own seed is simulated like in
+    # stream_results, its ensemble drawing from the same generator after the trajectory
+    rng = np.random.default_rng(seed)
+    trajectories = [None] * len(valid)
+    seeded_rngs = {}
+    periods = {}
+    for position, (_, input_data) in enumerate(valid):
+        if input_data.get("seed") is not None:
+            seeded_rngs[position] = np.random.default_rng(input_data["seed"])
+            trajectories[position] = climate_api(
+                input_data["startYear"], input_data["endYear"], input_data["location"], input_data["policies"],
+                bases[position], seeded_rngs[position]
+            )
+        else:
+            periods.setdefault((input_data["startYear"], input_data["endYear"]), []).append(position)
+    for (start_year, end_year), positions in periods.items():
+        matrix, years = climate_trajectories(
+            start_year, end_year, [bases[p] for p in positions], [valid[p][1]["policies"] for p in positions], rng=rng
+        )
+        for row, position in enumerate(positions):
+            trajectories[position] = ([round(temp, 4) for temp in matrix[row].tolist()], years)
+
+    # Assemble the results
+    ready = []
+    for position, (index, input_data) in enumerate(valid):
+        policies = input_data["policies"]
+        carbon_score = float(carbon_scores[position])
+        economic_pressure = float(economic_pressures[position])
+        justice_score = float(justice_scores[position])
+        suggested_policy, suggestion_name = suggest_policy(policies, carbon_score, economic_pressure, justice_score)
+
+        policy_naming = input_data["policyName"]
+        if policy_naming == "" or policy_naming == "None":
+            policy_name = calculate_policy_name(policies)
+        else:
+            policy_name = policy_naming
+
+        summary = summarize_policy(policies)
+        temperature_traj, years = trajectories[position]
+        result = {
+            "policyName": policy_name,
+            "description": input_data["description"] or summary,
+            "years": years,
+            "temperatureTrajectory": temperature_traj,
+            "carbonScore": round(carbon_score),
+            "justiceScore": round(justice_score),
+            "economicPressure": round(economic_pressure),
+            "badge": determine_badge(carbon_score, justice_score),
+            "suggestedPolicy": suggested_policy,
+            "suggestedPolicyName": suggestion_name,
+        }
+        if input_data.get("ensemble"):
+            result["ensemble"] = climate_ensemble(
+                input_data["startYear"], input_data["endYear"], bases[position], policies,
+                input_data["ensemble"], input_data.get("ensembleStep", 1), seeded_rngs.get(position, rng)
+            )
+        if input_data.get("format") == "compact":
+            compact_results(result, input_data["startYear"])
+        ready.append((index, input_data, result, summary))
+
+    if not include_analysis:
+        for index, _, result, _ in ready:
+            yield index, result
+        return
+
+    # AI analysis of every configuration, returned as each one finishes
+    futures = {}
+    for index, input_data, result, summary in ready:
+        scores = {
+            "carbon_score": result["carbonScore"],
+            "justice_score": result["justiceScore"],
+            "economic_pressure": result["economicPressure"]
+        }
+        future = submit(
+            gemini_combined_analysis, result["policyName"], input_data["description"], summary, scores, input_data["location"]
+        )
+        futures[future] = (index, result, summary, scores)
+
+    def with_analysis(future, analysis):
+        index, result, summary, scores = futures[future]
+        if analysis is None:
+            analysis = {"description": result["description"], "aiComment": mock_gemini_api(scores), "strength": "", "weakness": ""}
+        result.update(analysis)
+        return index, result
+
+    remaining = set(futures)
+    try:
+        for future in as_completed(futures, timeout=LLM_TIMEOUT):
+            remaining.discard(future)
+            yield with_analysis(future, future.result())
+    except FutureTimeout:
+        print(f"{len(remaining)} batch analyses did not finish in time, using the fallback")
+    for future in remaining:
+        yield with_analysis(future, None)
+
+def handle_sweep(input_data):
+    """
+    Purpose: Handles a parameter sweep request: evaluates the scores and the mean temperature trajectory over every
+    combination of the given lever values, plus the sensitivity of each metric to each swept lever.
+
+    Args:
+        input_data: A dictionary with:
+            - sweep: The swept levers, e.g. {"carbonTaxRate": {"min": 0, "max": 200, "steps": 21}, "fossilFuelPhaseout": null}.
+            - policies: The settings of the other levers (optional).
+            - location or baseTemperature: Where the trajectory starts. The temperature is looked up once for the whole sweep.
+            - startYear, endYear: The simulated period (default 2020 - 2100).
+            - sensitivity, trajectories, encoding: See sweep.run_sweep.
+
+    Returns:
+        A dictionary containing the sweep grid. Raises ValueError if the request is invalid.
+    """
+    if not isinstance(input_data, dict):
+        raise ValueError("Expected a JSON object")
+    start_year = input_data.get("startYear", 2020)
+    end_year = input_data.get("endYear", 2100)
+    if not all(isinstance(y, int) and not isinstance(y, bool) for y in (start_year, end_year)):
+        raise ValueError("startYear and endYear must be integers")
+
+    base_temperature = input_data.get("baseTemperature")
+    if base_temperature is None:
+        if not input_data.get("location"):
+            raise ValueError("Missing required field: location (or baseTemperature)")
+        base_temperature = get_real_temperature(input_data["location"])
+    elif not isinstance(base_temperature, (int, float)) or isinstance(base_temperature, bool):
+        raise ValueError("baseTemperature must be a number")
+
+    return run_sweep(
+        input_data.get("sweep"), float(base_temperature), start_year, end_year,
+        policies=input_data.get("policies"),
+        sensitivity=bool(input_data.get("sensitivity", True)),
+        trajectories=bool(input_data.get("trajectories")),
+        encoding=input_data.get("encoding", "json")
+    )
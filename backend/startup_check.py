@@ -0,0 +1,96 @@
+import json
+import os
+import subprocess
+import sys
+
+# Import-time budget of the backend. Every worker process (and every autoscaled instance) imports the app before it
+# can serve, so heavy clients and modules are only loaded on first use or in the warm_up hook of app.py.
+#
+#     cd backend
+#     python startup_check.py
+#
+# exits with status 1 if importing the app takes longer than the budget or loads one of the lazy modules.
+
+# Longest acceptable time to import the app in a fresh interpreter (seconds)
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", 1.0))
+
+# Modules that must not be imported with the app, only on first use
+LAZY_MODULES = ("google.genai", "openmeteo_requests", "retry_requests", "cpdb_api", "pandas")
+
+# Fresh interpreters started; the fastest run is compared with the budget, so a busy machine does not fail the check
+IMPORT_RUNS = 3
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure_import(module="app"):
+    """
+    Purpose: Imports a module in a fresh interpreter.
+
+    Output: A dictionary with:
+        - seconds: How long the import took.
+        - loaded: The LAZY_MODULES that were imported with it.
+        - slowest: The slowest modules imported by it directly, as (module, seconds), slowest first.
+    """
+    code = (
+        "import json, sys, time\n"
+        "started = time.perf_counter()\n"
+        f"import {module}\n"
+        "seconds = time.perf_counter() - started\n"
+        f"print(json.dumps({{'seconds': seconds, 'modules': sorted(sys.modules)}}))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+
+    # -X importtime lines: "import time: self [us] | cumulative [us] | <indent>package", where a module is listed
+    # after the modules it imported, two spaces deeper
+    children, imported = [], []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        depth = len(parts[2]) - len(parts[2].lstrip()) - 1
+        if depth == 2:
+            children.append((parts[2].strip(), int(parts[1]) / 1e6))
+        elif depth == 0:
+            if parts[2].strip() == module:
+                imported = children
+            children = []
+    imported.sort(key=lambda item: item[1], reverse=True)
+
+    modules = set(measured["modules"])
+    return {
+        "seconds": measured["seconds"],
+        "loaded": [name for name in LAZY_MODULES if name in modules],
+        "slowest": imported[:5],
+    }
+
+
+def check_import_budget(module="app", budget=IMPORT_TIME_BUDGET, runs=IMPORT_RUNS):
+    """
+    Purpose: Checks that a module imports within the budget and without loading the LAZY_MODULES.
+
+    Output: A tuple (problems, measurement), where problems is a list of messages (empty if the check passed)
+    and measurement the fastest run of measure_import.
+    """
+    measurement = min((measure_import(module) for _ in range(runs)), key=lambda run: run["seconds"])
+    problems = []
+    if measurement["seconds"] > budget:
+        problems.append(f"Importing {module} took {measurement['seconds']:.2f}s, over the budget of {budget:.2f}s")
+    for name in measurement["loaded"]:
+        problems.append(f"Importing {module} loaded {name}, which should only be imported on first use")
+    return problems, measurement
+
+
+if __name__ == "__main__":
+    module = sys.argv[1] if len(sys.argv) > 1 else "app"
+    problems, measurement = check_import_budget(module)
+    print(f"import {module}: {measurement['seconds']:.3f}s (budget {IMPORT_TIME_BUDGET:.2f}s)")
+    for name, seconds in measurement["slowest"]:
+        print(f"    {name}: {seconds:.3f}s")
+    for problem in problems:
+        print(problem)
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,307 @@
+import base64
+import os
+import numpy as np
+from climate_model import DEFAULT_ANNUAL_INCREASE, MAX_MITIGATION_RATIO, MITIGATION_RAMP, mitigation_factors, yearly_increases
+from scoring import LEVER_BOUNDS, LEVER_CHOICES, POLICY_LEVERS, PolicySettings, score_policies
+
+# Parameter sweeps over the policy levers. Every point of the grid is scored with the deterministic scoring and the
+# mean (noise-free) temperature trajectory, so a sweep makes no network calls once the base temperature is known.
+
+# Largest number of grid points in one sweep
+SWEEP_MAX_POINTS = int(os.getenv("SWEEP_MAX_POINTS", 1_000_000))
+
+# Largest number of values (points x years) when the full mean trajectories are requested
+SWEEP_MAX_TRAJECTORY_VALUES = int(os.getenv("SWEEP_MAX_TRAJECTORY_VALUES", 1_000_000))
+
+# Number of values of a numeric range when no "steps" are given
+DEFAULT_STEPS = 11
+
+# The outputs reported for every grid point
+SWEEP_METRICS = ["carbonScore", "economicPressure", "justiceScore", "endTemperature"]
+
+# Settings of the levers that are not swept, when the request does not give them (the defaults of the simulator)
+DEFAULT_POLICIES = {
+    "carbonTaxRate": 20,
+    "renewableSubsidy": 50,
+    "fossilFuelPhaseout": "medium",
+    "deforestationBan": True,
+    "educationCampaigns": 50,
+    "greenJobsInitiative": 5,
+    "industryRegulations": "medium",
+    "justiceLensStrength": 50,
+    "adaptationInvestment": 5,
+    "carbonCaptureRAndD": 5,
+}
+
+
+def lever_values(lever, spec):
+    """
+    Purpose: Expands the sweep specification of one lever into the list of values to evaluate.
+
+    Inputs:
+        - lever: The lever name.
+        - spec: Either a list of values, or a range {"min", "max", "steps"} for a numeric lever.
+                For a categorical lever, null (or an empty object) selects every option.
+
+    Output: A list with the values of the lever.
+    """
+    if lever in LEVER_CHOICES:
+        choices = LEVER_CHOICES[lever]
+        if spec is None or spec == {}:
+            return list(choices)
+        if not isinstance(spec, list) or not spec:
+            raise ValueError(f"{lever} must be a list of options")
+        unknown = [v for v in spec if v not in choices]
+        if unknown:
+            raise ValueError(f"{lever} options must be among {choices}")
+        return list(dict.fromkeys(spec))
+
+    if lever not in LEVER_BOUNDS:
+        raise ValueError(f"Unknown policy lever: {lever}")
+    low, high = LEVER_BOUNDS[lever]
+
+    if isinstance(spec, dict):
+        start = spec.get("min", low)
+        stop = spec.get("max", high)
+        steps = spec.get("steps", DEFAULT_STEPS)
+        if not isinstance(steps, int) or isinstance(steps, bool) or steps < 1:
+            raise ValueError(f"{lever} steps must be an integer at least 1")
+        if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (start, stop)):
+            raise ValueError(f"{lever} min and max must be numbers")
+        if start > stop:
+            raise ValueError(f"{lever} min must not be greater than max")
+        values = np.linspace(start, stop, steps).tolist()
+    elif isinstance(spec, list) and spec:
+        if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in spec):
+            raise ValueError(f"{lever} values must be numbers")
+        values = list(dict.fromkeys(float(v) for v in spec))
+    else:
+        raise ValueError(f"{lever} must be a list of values or a range with min, max and steps")
+
+    if min(values) < low or max(values) > high:
+        raise ValueError(f"{lever} must be between {low} and {high}")
+    return values
+
+
+def end_temperatures(base_temperature, mitigation, n_years):
+    """
+    Purpose: Calculates the last temperature of the mean trajectory of many policies, without building the trajectories.
+
+    The mean trajectory is the base temperature plus the mitigated yearly increases (the random variation averages out).
+    The cumulative mitigation of year i is i * ramp until it reaches the cap, so the sum of the increases has a closed
+    form and the cost does not grow with the number of years.
+
+    Inputs:
+        - base_temperature: The current temperature at the location.
+        - mitigation: The mitigation factors, any shape.
+        - n_years: The number of simulated years.
+
+    Output: An array of the same shape as mitigation.
+    """
+    mitigation = np.asarray(mitigation, dtype=float)
+    n = max(n_years - 1, 0)                             # Years with an increase
+    ramp = mitigation * MITIGATION_RAMP
+    cap = DEFAULT_ANNUAL_INCREASE * MAX_MITIGATION_RATIO
+
+    # Number of years before the cumulative mitigation reaches the cap
+    with np.errstate(divide="ignore", invalid="ignore"):
+        uncapped = np.where(ramp > 0, np.floor(cap / ramp), n)
+    uncapped = np.minimum(uncapped, n)
+
+    mitigated = ramp * uncapped * (uncapped + 1) / 2 + cap * (n - uncapped)
+    return base_temperature + DEFAULT_ANNUAL_INCREASE * n - mitigated
+
+
+def mean_trajectories(base_temperature, mitigation, n_years):
+    """
+    Purpose: Builds the full mean trajectory of many policies.
+
+    Inputs:
+        - base_temperature: The current temperature at the location.
+        - mitigation: The mitigation factors, shape (k,).
+        - n_years: The number of simulated years.
+
+    Output: A float32 array of shape (k, n_years).
+    """
+    increases = yearly_increases(mitigation, n_years)
+    increases[:, 0] = 0.0
+    return (base_temperature + np.cumsum(increases, axis=1)).astype(np.float32)
+
+
+def evaluate_levers(levers, base_temperature, n_years):
+    """
+    Purpose: Evaluates every metric for lever arrays that broadcast against each other.
+
+    Inputs:
+        - levers: A dictionary mapping each of the ten lever names to a scalar or an array.
+        - base_temperature: The current temperature at the location.
+        - n_years: The number of simulated years.
+
+    Output: A dictionary mapping each SWEEP_METRICS name to a float array of the broadcast shape.
+    """
+    carbon_score, economic_pressure, justice_score = score_policies(levers)
+    mitigation = mitigation_factors(
+        levers["carbonTaxRate"], levers["renewableSubsidy"], levers["fossilFuelPhaseout"],
+        levers["deforestationBan"], levers["carbonCaptureRAndD"]
+    )
+    metrics = {
+        "carbonScore": carbon_score,
+        "economicPressure": economic_pressure,
+        "justiceScore": justice_score,
+        "endTemperature": end_temperatures(base_temperature, mitigation, n_years),
+    }
+    shape = np.broadcast_shapes(*(np.shape(m) for m in metrics.values()))
+    return {name: np.broadcast_to(values, shape) for name, values in metrics.items()}
+
+
+def _lever_array(lever, values):
+    # The categorical levers with string options stay object arrays, the others (deforestationBan included) are floats
+    return np.asarray(values, dtype=object if lever in ("fossilFuelPhaseout", "industryRegulations") else float)
+
+
+def grid_levers(base_policies, axes):
+    """
+    Purpose: Lays the swept levers out as an open grid: the values of the i-th swept lever vary along axis i only,
+    so a categorical lever is looked up once per option rather than once per grid point.
+
+    Inputs:
+        - base_policies: The settings of the levers that are not swept.
+        - axes: A list of (lever, values) pairs, one per grid axis.
+
+    Output: A dictionary mapping each of the ten lever names to a scalar or an array.
+    """
+    levers = {lever: _lever_array(lever, base_policies[lever]) for lever in POLICY_LEVERS}
+    for axis, (lever, values) in enumerate(axes):
+        shape = [1] * len(axes)
+        shape[axis] = len(values)
+        levers[lever] = _lever_array(lever, values).reshape(shape)
+    return levers
+
+
+def one_at_a_time(base_policies, axes, base_temperature, n_years):
+    """
+    Purpose: One-at-a-time sensitivity: every swept lever is moved over its values while the others stay at their base setting.
+
+    Output: A dictionary {lever: {metric: {"min", "max", "swing"}}}, where swing is max - min.
+    """
+    results = {}
+    for lever, values in axes:
+        metrics = evaluate_levers(grid_levers(base_policies, [(lever, values)]), base_temperature, n_years)
+        results[lever] = {
+            name: {"min": round(float(v.min()), 4), "max": round(float(v.max()), 4), "swing": round(float(v.max() - v.min()), 4)}
+            for name, v in metrics.items()
+        }
+    return results
+
+
+def sobol_indices(metrics, axes):
+    """
+    Purpose: Sobol-style variance decomposition over the full grid, treating every grid point as equally likely.
+    As the grid is a full factorial design the indices are exact for it, so no extra sampling is needed.
+
+    - first: Var(E[Y | lever]) / Var(Y), the share of the variance explained by the lever alone.
+    - total: E[Var(Y | other levers)] / Var(Y), the share that disappears if the lever is fixed (interactions included).
+
+    Inputs:
+        - metrics: The metric arrays of the grid, with one axis per swept lever.
+        - axes: A list of (lever, values) pairs, one per grid axis.
+
+    Output: A dictionary {lever: {metric: {"first", "total"}}}. The indices are 0 when a metric does not vary at all.
+    """
+    results = {lever: {} for lever, _ in axes}
+    for name, values in metrics.items():
+        total_variance = values.var()
+        for axis, (lever, _) in enumerate(axes):
+            others = tuple(a for a in range(values.ndim) if a != axis)
+            if total_variance > 0:
+                first = values.mean(axis=others).var() / total_variance
+                total = values.var(axis=axis).mean() / total_variance
+            else:
+                first = total = 0.0
+            results[lever][name] = {"first": round(float(first), 6), "total": round(float(total), 6)}
+    return results
+
+
+def encode_array(values, encoding):
+    """
+    Purpose: Serializes a grid array, flattened in row-major order.
+
+    Output: A list of numbers for the "json" encoding, or a base64 string of little-endian float32 values for "float32".
+    """
+    flat = np.ascontiguousarray(values, dtype="<f4").ravel()
+    if encoding == "float32":
+        return base64.b64encode(flat.tobytes()).decode("ascii")
+    return np.round(flat.astype(float), 4).tolist()
+
+
+def run_sweep(sweep, base_temperature, start_year, end_year, policies=None, sensitivity=True, trajectories=False, encoding="json"):
+    """
+    Purpose: Evaluates the Cartesian product of the given lever values.
+
+    Inputs:
+        - sweep: A dictionary mapping the swept levers to their specification (see lever_values). Its order is the axis order.
+        - base_temperature: The current temperature at the location.
+        - start_year: The starting year for the simulation.
+        - end_year: The ending year for the simulation.
+        - policies: The settings of the levers that are not swept (DEFAULT_POLICIES for the missing ones).
+        - sensitivity: Also compute the one-at-a-time and Sobol-style sensitivity indices.
+        - trajectories: Also return the full mean trajectory of every grid point, flattened from shape (*grid shape, years).
+        - encoding: "json" for lists of numbers, "float32" for base64-encoded float32 arrays.
+
+    Output:
+        A dictionary with the grid axes and shape, and one flattened (row-major) array per metric.
+    """
+    if not isinstance(sweep, dict) or not sweep:
+        raise ValueError("sweep must map at least one policy lever to its values")
+    if encoding not in ("json", "float32"):
+        raise ValueError('encoding must be "json" or "float32"')
+    n_years = end_year - start_year + 1
+    if n_years < 1:
+        raise ValueError("endYear must not be before startYear")
+
+    # The base settings are checked like the policies of /score, so a bad lever is named instead of failing in numpy
+    if policies is None:
+        policies = {}
+    if not isinstance(policies, dict):
+        raise ValueError("policies must be an object")
+    for lever in policies:
+        if lever not in POLICY_LEVERS:
+            raise ValueError(f"Unknown policy lever: {lever}")
+    base_policies = PolicySettings.from_dict({**DEFAULT_POLICIES, **policies}).to_dict()
+    axes = [(lever, lever_values(lever, spec)) for lever, spec in sweep.items()]
+    shape = [len(values) for _, values in axes]
+    points = int(np.prod(shape))
+    if points > SWEEP_MAX_POINTS:
+        raise ValueError(f"The sweep has {points} points, at most {SWEEP_MAX_POINTS} are allowed")
+    if trajectories and points * n_years > SWEEP_MAX_TRAJECTORY_VALUES:
+        raise ValueError(f"Trajectories are limited to {SWEEP_MAX_TRAJECTORY_VALUES} values (points x years)")
+
+    metrics = evaluate_levers(grid_levers(base_policies, axes), base_temperature, n_years)
+
+    results = {
+        "levers": [{"name": lever, "values": values} for lever, values in axes],
+        "shape": shape,
+        "points": points,
+        "startYear": start_year,
+        "endYear": end_year,
+        "baseTemperature": base_temperature,
+        "policies": base_policies,
+        "encoding": encoding,
+        "metrics": {name: encode_array(values, encoding) for name, values in metrics.items()},
+    }
+
+    if trajectories:
+        levers = {lever: np.broadcast_to(values, shape).ravel() for lever, values in grid_levers(base_policies, axes).items()}
+        mitigation = mitigation_factors(
+            levers["carbonTaxRate"], levers["renewableSubsidy"], levers["fossilFuelPhaseout"],
+            levers["deforestationBan"], levers["carbonCaptureRAndD"]
+        )
+        results["years"] = list(range(start_year, end_year + 1))
+        results["meanTrajectory"] = encode_array(mean_trajectories(base_temperature, mitigation, n_years), encoding)
+
+    if sensitivity:
+        results["sensitivity"] = {
+            "oneAtATime": one_at_a_time(base_policies, axes, base_temperature, n_years),
+            "sobol": sobol_indices(metrics, axes),
+        }
+    return results
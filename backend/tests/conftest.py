@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+# The backend modules are imported as top-level modules, like app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the tests offline and away from the real caches: the settings are read when the modules are imported
+_data_dir = tempfile.mkdtemp(prefix="policysim-tests-")
+os.environ.setdefault("GEN_API", "test")
+os.environ.setdefault("CACHE_DB_PATH", os.path.join(_data_dir, "cache.sqlite"))
+os.environ.setdefault("CPDB_SNAPSHOT_PATH", os.path.join(_data_dir, "cpdb_snapshot.arrow"))
+os.environ.setdefault("CPDB_BACKGROUND_REFRESH", "0")
+os.environ.setdefault("PRECOMPUTE_POLICIES", "0")
+os.environ.setdefault("CPDB_PRELOAD", "0")
+os.environ.setdefault("WARM_UP_CLIENTS", "0")
@@ -0,0 +1,90 @@
+import pytest
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, fallback_reason
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+
+def fail(breaker):
+    with pytest.raises(RuntimeError):
+        with breaker.call():
+            raise RuntimeError("upstream failed")
+
+
+def test_breaker_opens_after_failures_in_a_row(clock):
+    breaker = CircuitBreaker("test", deadline=1, failure_threshold=3, reset_timeout=30)
+    fail(breaker)
+    fail(breaker)
+    # A success resets the count
+    with breaker.call():
+        pass
+    fail(breaker)
+    fail(breaker)
+    assert breaker.state == CLOSED
+    fail(breaker)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError) as error:
+        with breaker.call():
+            pytest.fail("an open breaker must not run the call")
+    assert fallback_reason(error.value) == "circuit_open"
+    assert fallback_reason(RuntimeError()) == "error"
+
+
+def test_half_open_probe_closes_breaker(clock):
+    breaker = CircuitBreaker("test", deadline=1, failure_threshold=1, reset_timeout=30)
+    fail(breaker)
+    assert breaker.state == OPEN
+
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.now += 1
+    with breaker.call() as probe:
+        assert probe
+        assert breaker.state == HALF_OPEN
+        # Only one probe is let through at a time
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+    assert breaker.state == CLOSED
+    with breaker.call() as probe:
+        assert not probe
+
+
+def test_failed_probe_opens_breaker_again(clock):
+    breaker = CircuitBreaker("test", deadline=1, failure_threshold=2, reset_timeout=30)
+    fail(breaker)
+    fail(breaker)
+    clock.now += 30
+    fail(breaker)
+    assert breaker.state == OPEN
+
+    # The reset timeout starts again from the failed probe
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.now += 1
+    assert breaker.before_call()
+
+
+def test_call_over_deadline_counts_as_failure(clock, monkeypatch):
+    breaker = CircuitBreaker("test", deadline=1, failure_threshold=1, reset_timeout=30)
+    times = iter([0.0, 2.0])
+    monkeypatch.setattr(circuit_breaker.time, "perf_counter", lambda: next(times))
+    with breaker.call():
+        pass
+    assert breaker.state == OPEN
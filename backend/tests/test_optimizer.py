@@ -0,0 +1,45 @@
+import numpy as np
+from optimizer import optimize_policies, pareto_front
+
+
+def brute_force_front(objectives):
+    front = set()
+    for i, row in enumerate(objectives):
+        dominated = np.all(objectives <= row, axis=1) & np.any(objectives < row, axis=1)
+        if not dominated.any():
+            front.add(i)
+    return front
+
+
+def test_pareto_front_of_small_example():
+    objectives = np.array([
+        [1.0, 5.0],
+        [2.0, 2.0],
+        [3.0, 3.0],  # dominated by [2, 2]
+        [5.0, 1.0],
+        [2.0, 4.0],  # dominated by [2, 2]
+    ])
+    assert sorted(pareto_front(objectives).tolist()) == [0, 1, 3]
+
+
+def test_pareto_front_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        # Few distinct values, so ties and duplicate rows are common
+        objectives = rng.integers(0, 5, size=(60, 3)).astype(float)
+        assert set(pareto_front(objectives).tolist()) == brute_force_front(objectives)
+
+
+def test_optimize_policies_returns_feasible_front():
+    targets = {"carbonScore": {"min": 60}, "justiceScore": {"min": 60}}
+    results = optimize_policies(targets, max_results=100, seed=1)
+    assert results["feasible"]
+
+    rows = []
+    for result in results["results"]:
+        assert result["carbonScore"] >= 60 and result["justiceScore"] >= 60
+        rows.append([result["economicPressure"], -result["carbonScore"], -result["justiceScore"], result["temperatureIncrease"]])
+    objectives = np.array(rows)
+    # No returned configuration is dominated by another, and they are sorted by economic pressure
+    assert brute_force_front(objectives) == set(range(len(rows)))
+    assert list(objectives[:, 0]) == sorted(objectives[:, 0])
@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+from app import app
+from policy_store import policy_store
+
+SECTORS = ["Energy", "Transport", "Buildings"]
+
+
+def cpdb_frame(size, title="Policy"):
+    return pd.DataFrame({
+        "policy_id": list(range(1000, 1000 + size)),
+        "policy_title": [f"{title} {i}" for i in range(size)],
+        "country_iso": ["DEU"] * size,
+        "sector": [SECTORS[i % len(SECTORS)] for i in range(size)],
+    })
+
+
+def load_snapshot(df):
+    with policy_store._lock:
+        return policy_store._set_snapshot(df)
+
+
+@pytest.fixture
+def client():
+    load_snapshot(cpdb_frame(100))
+    return app.test_client()
+
+
+def load_all(client, query):
+    ids = []
+    cursor = None
+    while True:
+        response = client.get(f"/api/policies?{query}" + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200
+        ids += [row["policy_id"] for row in response.get_json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids
+
+
+def test_cursor_round_trip_visits_every_policy_once(client):
+    assert load_all(client, "limit=7") == list(range(1000, 1100))
+
+
+def test_cursor_round_trip_with_filter(client):
+    assert load_all(client, "limit=5&sector=Transport") == list(range(1001, 1100, 3))
+
+
+def test_stale_cursor_gets_conflict(client):
+    cursor = client.get("/api/policies?limit=10").headers["X-Next-Cursor"]
+    load_snapshot(cpdb_frame(100, title="Updated policy"))
+    response = client.get(f"/api/policies?limit=10&cursor={cursor}")
+    assert response.status_code == 409
+    assert "error" in response.get_json()
+
+
+@pytest.mark.parametrize("cursor", ["nodot", ".1005", "abc."])
+def test_malformed_cursor_is_rejected(client, cursor):
+    response = client.get(f"/api/policies?limit=10&cursor={cursor}")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Invalid cursor"}
+
+
+def test_cursor_of_unknown_policy_is_rejected(client):
+    fingerprint = client.get("/api/policies?limit=10").headers["X-Next-Cursor"].partition(".")[0]
+    response = client.get(f"/api/policies?limit=10&cursor={fingerprint}.999999")
+    assert response.status_code == 400
@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+from policy_store import PolicySnapshot, PolicyStore
+
+
+def cpdb_frame(rows):
+    return pd.DataFrame(rows, columns=["policy_id", "policy_title", "country_iso", "sector", "decision_date"])
+
+
+BASE_ROWS = [
+    (1, "Carbon tax", "DEU", "Energy, Transport", 2015),
+    (2, "Feed-in tariff", "DEU", "Energy", 2010),
+    (3, "Forest law", "BRA", "Land use", 2012),
+    (4, "Vehicle standards", "USA", "Transport", 2019),
+]
+
+
+def test_first_snapshot_has_no_diff():
+    snapshot = PolicySnapshot(cpdb_frame(BASE_ROWS), 1)
+    assert snapshot.changed_ids is None
+    assert snapshot.removed_ids == set()
+
+
+def test_snapshot_diff_lists_changed_new_and_removed_ids():
+    previous = PolicySnapshot(cpdb_frame(BASE_ROWS), 1)
+    rows = [
+        (1, "Carbon tax", "DEU", "Energy, Transport", 2015),   # unchanged
+        (2, "Feed-in tariff", "DEU", "Energy, Buildings", 2010),  # changed
+        (4, "Vehicle standards", "USA", "Transport", 2019),    # unchanged, moved up a row
+        (5, "Methane rules", "CAN", "Energy", 2021),           # new
+    ]
+    snapshot = PolicySnapshot(cpdb_frame(rows), 2, previous=previous)
+
+    assert snapshot.changed_ids == {"2", "5"}
+    assert snapshot.removed_ids == {"3"}
+    assert snapshot.fingerprint != previous.fingerprint
+
+    # The index entries are correct for reused and re-parsed rows alike
+    assert snapshot.get_policy("4")["policy_title"] == "Vehicle standards"
+    assert snapshot.get_policy("3") is None
+    assert snapshot.filter_index["sector"]["buildings"].tolist() == [False, True, False, False]
+    assert snapshot.filter_index["sector"]["transport"].tolist() == [True, False, True, False]
+
+
+def test_unchanged_data_keeps_the_current_snapshot(tmp_path):
+    store = PolicyStore(path=str(tmp_path / "cpdb.arrow"))
+    first = store._set_snapshot(cpdb_frame(BASE_ROWS))
+    again = store._set_snapshot(cpdb_frame(BASE_ROWS))
+    assert again is first
+
+    changed = store._set_snapshot(cpdb_frame(BASE_ROWS[:3]))
+    assert changed is not first
+    assert changed.changed_ids == set()
+    assert changed.removed_ids == {"4"}
+
+
+@pytest.mark.parametrize("if_expired, fetches", [(False, 1), (True, 0)])
+def test_refresh_of_fresh_snapshot(tmp_path, monkeypatch, if_expired, fetches):
+    store = PolicyStore(path=str(tmp_path / "cpdb.arrow"))
+    store._set_snapshot(cpdb_frame(BASE_ROWS))
+    calls = []
+    monkeypatch.setattr(store, "_fetch", lambda: calls.append(1) or cpdb_frame(BASE_ROWS))
+    store.refresh(if_expired=if_expired)
+    # A scheduled refresh skips a snapshot that another caller has just loaded
+    assert len(calls) == fetches
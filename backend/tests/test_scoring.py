@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from scoring import LEVER_BOUNDS, LEVER_CHOICES, POLICY_LEVERS, PolicySettings, policy_arrays, score_policies, score_policy
+from sweep import DEFAULT_POLICIES
+
+
+def random_policies(rng, size):
+    policies_list = []
+    for _ in range(size):
+        policies = {}
+        for lever in POLICY_LEVERS:
+            if lever in LEVER_BOUNDS:
+                low, high = LEVER_BOUNDS[lever]
+                policies[lever] = float(rng.uniform(low, high))
+            else:
+                choices = LEVER_CHOICES[lever]
+                policies[lever] = choices[rng.integers(len(choices))]
+        policies_list.append(policies)
+    return policies_list
+
+
+def test_from_dict_accepts_valid_settings():
+    settings = PolicySettings.from_dict(DEFAULT_POLICIES)
+    assert settings.to_dict() == DEFAULT_POLICIES
+    assert settings["carbonTaxRate"] == DEFAULT_POLICIES["carbonTaxRate"]
+
+
+def test_from_dict_rejects_missing_lever():
+    policies = dict(DEFAULT_POLICIES)
+    del policies["carbonTaxRate"]
+    with pytest.raises(ValueError, match="Missing required policy setting: carbonTaxRate"):
+        PolicySettings.from_dict(policies)
+
+
+@pytest.mark.parametrize("value", ["20", None, True])
+def test_from_dict_rejects_non_numeric_lever(value):
+    with pytest.raises(ValueError, match="carbonTaxRate must be a number"):
+        PolicySettings.from_dict({**DEFAULT_POLICIES, "carbonTaxRate": value})
+
+
+@pytest.mark.parametrize("lever, value", [
+    ("fossilFuelPhaseout", "very fast"),
+    ("industryRegulations", None),
+    ("deforestationBan", 1),
+    ("deforestationBan", "true"),
+])
+def test_from_dict_rejects_unknown_choice(lever, value):
+    with pytest.raises(ValueError, match=f"{lever} must be one of"):
+        PolicySettings.from_dict({**DEFAULT_POLICIES, lever: value})
+
+
+def test_from_dict_rejects_non_dict():
+    with pytest.raises(ValueError, match="policies must be an object"):
+        PolicySettings.from_dict([DEFAULT_POLICIES])
+
+
+def test_score_policies_matches_score_policy():
+    policies_list = random_policies(np.random.default_rng(0), 500)
+    # Settings past the bounds exercise the clipping to 0 - 100
+    policies_list.append({**DEFAULT_POLICIES, "carbonTaxRate": 1000, "greenJobsInitiative": 0})
+    policies_list.append({**DEFAULT_POLICIES, "carbonTaxRate": 0, "greenJobsInitiative": 50})
+
+    carbon, pressure, justice = score_policies(policy_arrays(policies_list))
+    for i, policies in enumerate(policies_list):
+        assert (carbon[i], pressure[i], justice[i]) == pytest.approx(score_policy(policies), abs=1e-9)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from sweep import run_sweep
+
+# Low settings of the other carbon levers keep carbonScore inside 0 - 100, where it is linear in the swept levers
+BASE_POLICIES = {"carbonCaptureRAndD": 0, "fossilFuelPhaseout": "slow", "industryRegulations": "low"}
+
+
+def sweep_sobol(sweep):
+    results = run_sweep(sweep, 15.0, 2020, 2050, policies=BASE_POLICIES)
+    return results, results["sensitivity"]["sobol"]
+
+
+def test_sobol_indices_of_additive_linear_levers():
+    results, sobol = sweep_sobol({
+        "carbonTaxRate": {"min": 0, "max": 100, "steps": 11},
+        "renewableSubsidy": {"min": 0, "max": 100, "steps": 5},
+    })
+    tax_values = np.array(results["levers"][0]["values"], dtype=float)
+    subsidy_values = np.array(results["levers"][1]["values"], dtype=float)
+
+    # carbonScore = 0.3 * carbonTaxRate + 0.25 * renewableSubsidy + constant, so each lever explains its own share
+    # of the variance and there are no interactions
+    tax_variance = np.var(0.3 * tax_values)
+    subsidy_variance = np.var(0.25 * subsidy_values)
+    expected = tax_variance / (tax_variance + subsidy_variance)
+
+    tax = sobol["carbonTaxRate"]["carbonScore"]
+    subsidy = sobol["renewableSubsidy"]["carbonScore"]
+    assert tax["first"] == pytest.approx(expected, abs=1e-5)
+    assert subsidy["first"] == pytest.approx(1 - expected, abs=1e-5)
+    assert tax["total"] == pytest.approx(tax["first"], abs=1e-5)
+    assert subsidy["total"] == pytest.approx(subsidy["first"], abs=1e-5)
+
+
+def test_sobol_indices_of_single_lever():
+    _, sobol = sweep_sobol({"carbonTaxRate": {"min": 0, "max": 100, "steps": 21}})
+    assert sobol["carbonTaxRate"]["carbonScore"] == {"first": 1.0, "total": 1.0}
+
+
+def test_sobol_indices_of_lever_without_effect():
+    # renewableSubsidy does not enter the justice score, which therefore does not vary over the grid
+    _, sobol = sweep_sobol({"renewableSubsidy": {"min": 0, "max": 100, "steps": 5}})
+    assert sobol["renewableSubsidy"]["justiceScore"] == {"first": 0.0, "total": 0.0}
+
+
+def test_sweep_rejects_unknown_base_lever():
+    with pytest.raises(ValueError, match="Unknown policy lever: carbonTax"):
+        run_sweep({"carbonTaxRate": {"min": 0, "max": 100}}, 15.0, 2020, 2050, policies={"carbonTax": 5})
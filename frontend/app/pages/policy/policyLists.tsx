@@ -37,6 +37,13 @@ export interface Policy {
   country_iso: string;
 }
 
+// A distinct value of a filterable field, as returned by /api/policies/facets
+export interface FacetOption {
+  value: string;
+  label: string;
+  count: number;
+}
+
 // PolicyBadge component: Displays a styled badge for policy status
 const PolicyBadge = ({ type }: { type: string }) => {
   const badgeVariants: Record<string, { bg: string, text: string }> = {
@@ -63,13 +70,28 @@ const PolicyBadge = ({ type }: { type: string }) => {
   );
 };
 
+// Columns needed to render the policy cards
+const LIST_FIELDS = 'policy_id,policy_name,country,country_iso,decision_date,policy_status';
+
+// Largest page the backend serves (MAX_PAGE_SIZE in app.py)
+const MAX_PAGE_SIZE = 1000;
+
+// Builds the query string for the active filters
+const buildFilterParams = (filters: Record<string, string>) => {
+  const queryParams = new URLSearchParams();
+  Object.entries(filters).forEach(([key, value]) => {
+    if (value && value !== 'all') queryParams.append(key, value);
+  });
+  return queryParams;
+};
+
 export function PolicyLists() {
-  const [policies, setPolicies] = useState<Policy[]>([]);
   const [displayedPolicies, setDisplayedPolicies] = useState<Policy[]>([]);
+  const [totalPolicies, setTotalPolicies] = useState(0);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
   const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
-  const [page, setPage] = useState(1);
   const policiesPerPage = 15;
   const [showFilters, setShowFilters] = useState(false);
 
@@ -83,15 +105,55 @@ export function PolicyLists() {
 
   // Lists for filter options
   const [filterOptions, setFilterOptions] = useState({
-    countries: new Map<string, string>(), // Map of country_iso -> country name
-    statuses: new Set<string>(),
-    sectors: new Set<string>(),
-    instruments: new Set<string>()
+    countries: [] as FacetOption[], // value is the country_iso, label the country name
+    statuses: [] as FacetOption[],
+    sectors: [] as FacetOption[],
+    instruments: [] as FacetOption[]
   });
 
-  // Reset pagination when filters change
+  // Fetches one page of policies, starting after the given cursor.
+  // Returns null if the cursor belongs to an older CPDB snapshot (409), so the list has to be loaded again.
+  const fetchPage = async (cursor: string | null, limit: number = policiesPerPage) => {
+    const queryParams = buildFilterParams(filters);
+    queryParams.append('limit', String(limit));
+    queryParams.append('fields', LIST_FIELDS);
+    if (cursor) queryParams.append('cursor', cursor);
+
+    const response = await fetch(`http://localhost:5000/api/policies?${queryParams.toString()}`);
+    if (response.status === 409) {
+      return null;
+    }
+    if (!response.ok) {
+      throw new Error(`Failed to fetch policies: ${response.status}`);
+    }
+
+    const data: Policy[] = await response.json();
+    setTotalPolicies(Number(response.headers.get('X-Total-Count') ?? data.length));
+    setNextCursor(response.headers.get('X-Next-Cursor'));
+    return data;
+  };
+
+  // Load the filter options with counts that reflect the other active filters
   useEffect(() => {
-    setPage(1);
+    const fetchFilterOptions = async () => {
+      try {
+        const queryString = buildFilterParams(filters).toString();
+        const response = await fetch(`http://localhost:5000/api/policies/facets${queryString ? `?${queryString}` : ''}`);
+        if (!response.ok) return;
+
+        const { facets } = await response.json();
+        setFilterOptions({
+          countries: facets.country_iso ?? [],
+          statuses: facets.policy_status ?? [],
+          sectors: facets.sector ?? [],
+          instruments: facets.policy_instrument ?? []
+        });
+      } catch (err) {
+        // The list still works without filter options
+      }
+    };
+
+    fetchFilterOptions();
   }, [filters]);
 
   useEffect(() => {
@@ -99,50 +161,9 @@ export function PolicyLists() {
       try {
         setLoading(true);
 
-        // Build query string from filters
-        const queryParams = new URLSearchParams();
-        if (filters.country_iso && filters.country_iso !== 'all') queryParams.append('country_iso', filters.country_iso);
-        if (filters.policy_status && filters.policy_status !== 'all') queryParams.append('policy_status', filters.policy_status);
-        if (filters.sector && filters.sector !== 'all') queryParams.append('sector', filters.sector);
-        if (filters.policy_instrument && filters.policy_instrument !== 'all') queryParams.append('policy_instrument', filters.policy_instrument);
-
-        const queryString = queryParams.toString();
-        const endpoint = `http://localhost:5000/api/policies${queryString ? `?${queryString}` : ''}`;
-
-        const response = await fetch(endpoint);
-        if (!response.ok) {
-          setError(`Failed to fetch policies: ${response.status}`);
-          setLoading(false);
-          return;
-        }
-
-        const data: Policy[] = await response.json();
-        setPolicies(data);
-
-        // Initially display the first batch of policies
-        setDisplayedPolicies(data.slice(0, policiesPerPage));
-
-        // Extract unique values for filters
-        const countries = new Map<string, string>();
-        const statuses = new Set<string>();
-        const sectors = new Set<string>();
-        const instruments = new Set<string>();
-
-        data.forEach(policy => {
-          if (policy.country_iso && policy.country) {
-            countries.set(policy.country_iso, policy.country);
-          }
-          if (policy.policy_status) statuses.add(policy.policy_status);
-          if (policy.sector) sectors.add(policy.sector);
-          if (policy.policy_instrument) instruments.add(policy.policy_instrument);
-        });
-
-        setFilterOptions({
-          countries,
-          statuses,
-          sectors,
-          instruments
-        });
+        // Initially display the first page of policies
+        const data = await fetchPage(null);
+        setDisplayedPolicies(data ?? []);
 
         setLoading(false);
       } catch (err: any) {
@@ -154,13 +175,20 @@ export function PolicyLists() {
     fetchPolicies();
   }, [filters]);
 
-  const loadMorePolicies = () => {
+  const loadMorePolicies = async () => {
     setLoadingMore(true);
-    const startIndex = page * policiesPerPage;
-    const endIndex = startIndex + policiesPerPage;
-    const nextBatch = policies.slice(startIndex, endIndex);
-    setDisplayedPolicies(prev => [...prev, ...nextBatch]);
-    setPage(prev => prev + 1);
+    try {
+      const nextBatch = await fetchPage(nextCursor);
+      if (nextBatch === null) {
+        // The policies were refreshed since the last page: reload as many rows as are shown, plus the next page
+        const limit = Math.min(displayedPolicies.length + policiesPerPage, MAX_PAGE_SIZE);
+        setDisplayedPolicies((await fetchPage(null, limit)) ?? []);
+      } else {
+        setDisplayedPolicies(prev => [...prev, ...nextBatch]);
+      }
+    } catch (err: any) {
+      setError(err.message || "An error occurred while fetching policies.");
+    }
     setLoadingMore(false);
   };
 
@@ -218,7 +246,7 @@ export function PolicyLists() {
     );
   }
 
-  const hasMorePolicies = displayedPolicies.length < policies.length;
+  const hasMorePolicies = nextCursor !== null;
 
   return (
     <div className="container mx-auto p-4">
@@ -265,13 +293,12 @@ export function PolicyLists() {
                 </SelectTrigger>
                 <SelectContent>
                   <SelectItem value="all">All countries</SelectItem>
-                  {/* Sort countries alphabetically by name */}
-                  {Array.from(filterOptions.countries.entries())
-                    .sort((a, b) => a[1].localeCompare(b[1]))
-                    .map(([iso, country]) => (
-                      <SelectItem key={iso} value={iso}>{country} ({iso})</SelectItem>
-                    ))
-                  }
+                  {/* Countries come sorted alphabetically by name */}
+                  {filterOptions.countries.map(country => (
+                    <SelectItem key={country.value} value={country.value}>
+                      {country.label} ({country.value}) · {country.count}
+                    </SelectItem>
+                  ))}
                 </SelectContent>
               </Select>
             </div>
@@ -287,8 +314,8 @@ export function PolicyLists() {
                 </SelectTrigger>
                 <SelectContent>
                   <SelectItem value="all">All statuses</SelectItem>
-                  {Array.from(filterOptions.statuses).sort().map(status => (
-                    <SelectItem key={status} value={status}>{status}</SelectItem>
+                  {filterOptions.statuses.map(status => (
+                    <SelectItem key={status.value} value={status.value}>{status.label} · {status.count}</SelectItem>
                   ))}
                 </SelectContent>
               </Select>
@@ -305,8 +332,8 @@ export function PolicyLists() {
                 </SelectTrigger>
                 <SelectContent>
                   <SelectItem value="all">All sectors</SelectItem>
-                  {Array.from(filterOptions.sectors).sort().map(sector => (
-                    <SelectItem key={sector} value={sector}>{sector}</SelectItem>
+                  {filterOptions.sectors.map(sector => (
+                    <SelectItem key={sector.value} value={sector.value}>{sector.label} · {sector.count}</SelectItem>
                   ))}
                 </SelectContent>
               </Select>
@@ -323,8 +350,8 @@ export function PolicyLists() {
                 </SelectTrigger>
                 <SelectContent>
                   <SelectItem value="all">All instruments</SelectItem>
-                  {Array.from(filterOptions.instruments).sort().map(instrument => (
-                    <SelectItem key={instrument} value={instrument}>{instrument}</SelectItem>
+                  {filterOptions.instruments.map(instrument => (
+                    <SelectItem key={instrument.value} value={instrument.value}>{instrument.label} · {instrument.count}</SelectItem>
                   ))}
                 </SelectContent>
               </Select>
@@ -334,7 +361,7 @@ export function PolicyLists() {
       )}
 
       <div className="mb-4">
-        <p className="text-gray-600">Showing {displayedPolicies.length} of {policies.length} policies</p>
+        <p className="text-gray-600">Showing {displayedPolicies.length} of {totalPolicies} policies</p>
         {activeFilterCount > 0 && (
           <div className="mt-2 flex flex-wrap gap-2">
             {Object.entries(filters).map(([key, value]) => {
@@ -342,8 +369,9 @@ export function PolicyLists() {
                 let displayValue = value;
 
                 // If this is a country_iso filter, show the country name instead
-                if (key === 'country_iso' && filterOptions.countries.has(value)) {
-                  displayValue = `${filterOptions.countries.get(value)} (${value})`;
+                const country = filterOptions.countries.find(option => option.value === value);
+                if (key === 'country_iso' && country) {
+                  displayValue = `${country.label} (${value})`;
                 }
 
                 return (
@@ -366,7 +394,7 @@ export function PolicyLists() {
         )}
       </div>
 
-      {policies.length === 0 ? (
+      {totalPolicies === 0 ? (
         <div className="flex flex-col items-center justify-center p-12 text-center bg-gray-50 rounded-lg border border-gray-200">
           <AlertCircle className="h-10 w-10 text-gray-400 mb-4" />
           <h3 className="text-lg font-semibold mb-2">No policies found</h3>
@@ -1,4 +1,4 @@
-import React, { useState, useCallback } from "react";
+import React, { useState, useCallback, useEffect } from "react";
 import { Button } from "../../components/ui/button";
 import { Slider } from "../../components/ui/slider";
 import { Switch } from "../../components/ui/switch";
@@ -38,6 +38,17 @@ import {
   ResponsiveContainer,
 } from "recharts";
 
+// Decodes an array sent in the compact simulation format (base64 of little-endian float32 values)
+const decodeFloat32 = (encoded: string): number[] => {
+  const bytes = Uint8Array.from(atob(encoded), (c) => c.charCodeAt(0));
+  const view = new DataView(bytes.buffer);
+  const values: number[] = [];
+  for (let offset = 0; offset < bytes.length; offset += 4) {
+    values.push(Math.round(view.getFloat32(offset, true) * 10000) / 10000);
+  }
+  return values;
+};
+
 // Helper for policy sliders
 const PolicySlider = ({
   label,
@@ -229,12 +240,54 @@ export function Simulator() {
     []
   );
 
+  // Once a simulation has run, keep its scores in sync with the sliders using the fast /score endpoint
+  const hasResult = result !== null;
+  useEffect(() => {
+    if (!hasResult) return;
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const response = await fetch("http://localhost:5000/score", {
+          method: "POST",
+          headers: {
+            "Content-Type": "application/json",
+          },
+          body: JSON.stringify({ policies }),
+          signal: controller.signal,
+        });
+        if (!response.ok) return;
+        const scores = await response.json();
+        setResult((prev) =>
+          prev
+            ? {
+                ...prev,
+                policyName: scores.policyName,
+                carbonScore: scores.carbonScore,
+                justiceScore: scores.justiceScore,
+                economicPressure: scores.economicPressure,
+                badge: scores.badge,
+                suggestedPolicy: scores.suggestedPolicy,
+                suggestedPolicyName: scores.suggestedPolicyName,
+              }
+            : prev
+        );
+      } catch {
+        // Aborted by a newer slider change, or the backend is unreachable; the last scores stay on screen
+      }
+    }, 150);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [policies, hasResult]);
+
   const runSimulation = useCallback(async () => {
     setLoading(true);
     setError(null);
     try {
-      const inputData = { location, startYear, endYear, policies };
-      const response = await fetch("http://localhost:5000/simulate", {
+      const inputData = { location, startYear, endYear, policies, format: "compact" };
+      // The results arrive in parts (scores, trajectory, then each AI field) as NDJSON lines
+      const response = await fetch("http://localhost:5000/simulate/stream?format=ndjson", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -242,12 +295,36 @@ export function Simulator() {
         body: JSON.stringify(inputData),
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         const errorData = await response.json().catch(() => ({ message: `HTTP error! status: ${response.status}` }));
-        throw new Error(errorData.message || `HTTP error! status: ${response.status}`);
+        throw new Error(errorData.error || errorData.message || `HTTP error! status: ${response.status}`);
+      }
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let first = true;
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop() ?? "";
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const { event, ...data } = JSON.parse(line);
+          if (event === "error") throw new Error(data.error);
+          if (data.encoding === "float32") {
+            data.temperatureTrajectory = decodeFloat32(data.temperatureTrajectory);
+          }
+          // The first part replaces the previous result, the others are merged into it
+          const replace = first;
+          setResult((prev) => ({ ...(replace ? {} : prev), ...data } as SimulationResult));
+          if (first) {
+            first = false;
+            setLoading(false);
+          }
+        }
       }
-      const data = await response.json();
-      setResult(data);
     } catch (err: any) {
       setError(err.message || "An error occurred during simulation.");
     } finally {